@@ -1,11 +1,24 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from chromadb.utils import embedding_functions
 from chromadb import Client
 from app.schemas import DocumentCreate, DocumentOut
 import logging
-from app.schemas import QueryRequest, QueryResponse
-from app.utils import ask_hybrid_llm  # a helper to query OpenAI/Ollama
+from typing import List, Optional, Tuple
+from app.schemas import BatchQueryRequest, BatchQueryResult, ChatSessionOut, ChatTurn, QueryRequest, QueryResponse
+from app.utils import answer_batch, ask_hybrid_llm, ask_in_session, retrieve_batch  # helpers to query OpenAI/Ollama
+from app.services.chat_sessions import ChatSession, chat_sessions
+from app.services.metrics import metrics
+from app.services.prompts import estimate_tokens
+from app.services.rate_limit import charge_tokens, check_request
+from app.services.resilience import deadline
+from app.routers.auth_router import get_optional_user, get_principal
+from app.crud import resolve_document_scope
+from app.models import User
+from app.database import get_db
+from app.services.singleflight import SingleFlight, query_key
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -13,6 +26,9 @@ logging.basicConfig(level=logging.INFO)
 
 router = APIRouter()
 
+# Identical questions arriving together share one retrieval + generation
+query_flight = SingleFlight("chat_query")
+
 # Initialize ChromaDB client
 client = Client()
 
@@ -69,10 +85,99 @@ async def add_document(doc: DocumentCreate):
         )
 
 
+def _session_or_404(session_id: str, principal: str) -> ChatSession:
+    # another principal's session is reported as missing, not forbidden, so ids can't be probed
+    session = chat_sessions.get(session_id, principal)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found or expired")
+    return session
+
+
+def _session_out(session: ChatSession) -> ChatSessionOut:
+    return ChatSessionOut(
+        session_id=session.id,
+        summary=session.summary,
+        turns=[ChatTurn(question=question, answer=answer) for question, answer, _ in session.turns],
+        history_tokens=session.tokens,
+    )
+
+
+@router.post("/sessions", response_model=ChatSessionOut)
+async def create_session(principal: str = Depends(get_principal)):
+    """Start a conversation; pass its session_id with /chat/query for follow-up questions."""
+    return _session_out(chat_sessions.create(principal))
+
+
+@router.get("/sessions/{session_id}", response_model=ChatSessionOut)
+async def get_session(session_id: str, principal: str = Depends(get_principal)):
+    return _session_out(_session_or_404(session_id, principal))
+
+
+@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_session(session_id: str, principal: str = Depends(get_principal)):
+    if not chat_sessions.delete(session_id, principal):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found or expired")
+
+
+async def _document_scope(db: AsyncSession, request, user: Optional[User]) -> Tuple[dict, Optional[List[int]]]:
+    """The request's filters (limited to the caller's own documents when signed in) and the ids they match."""
+    scope = request.scope()
+    if not scope:
+        return scope, None
+    if user is not None:
+        scope = dict(scope, user_id=user.id)
+    return scope, await resolve_document_scope(db, **scope)
+
+
 @router.post("/query", response_model=QueryResponse)
-async def query_docs(request: QueryRequest):
+async def query_docs(
+    request: QueryRequest,
+    db: AsyncSession = Depends(get_db),
+    principal: str = Depends(get_principal),
+    user: Optional[User] = Depends(get_optional_user),
+):
     """
     Ask a question about uploaded documents using selected LLM (Ollama or OpenAI).
+    Optional filters narrow the search to matching documents before retrieval.
     """
-    answer, sources, llm_used = await ask_hybrid_llm(request.query, request.model)
+    await check_request(principal)
+    session = _session_or_404(request.session_id, principal) if request.session_id else None
+    with deadline(settings.request_timeout_seconds):  # bounds every call made for this question
+        scope, document_ids = await _document_scope(db, request, user)
+        if session is not None:
+            # answers depend on the conversation, so session questions are never coalesced
+            answer, sources, llm_used = await ask_in_session(session, request.query, request.model, document_ids)
+        else:
+            key = query_key(request.query, request.model, scope)
+            answer, sources, llm_used = await query_flight.do(key, ask_hybrid_llm, request.query, request.model, document_ids)
+    await charge_tokens(principal, estimate_tokens(answer))
     return {"answer": answer, "source_documents": sources, "llm_used": llm_used}
+
+
+@router.post("/query_batch", response_class=StreamingResponse)
+async def query_docs_batch(
+    request: BatchQueryRequest,
+    db: AsyncSession = Depends(get_db),
+    principal: str = Depends(get_principal),
+    user: Optional[User] = Depends(get_optional_user),
+):
+    """
+    Answer many questions in one request: one embedding call and one vectorized search
+    for all of them, then generations with bounded concurrency. Streams one JSON line
+    (BatchQueryResult) per question, in the order the answers complete.
+    """
+    limit = settings.query_batch_max_questions
+    if len(request.queries) > limit:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"At most {limit} questions per batch")
+    await check_request(principal, len(request.queries))  # each question counts as a request
+    _, document_ids = await _document_scope(db, request, user)
+    hits = await retrieve_batch(request.queries, document_ids)
+    metrics.inc("query_batch_questions_total", len(request.queries))
+
+    async def results():
+        async for i, (answer, sources, llm_used) in answer_batch(request.queries, hits):
+            await charge_tokens(principal, estimate_tokens(answer))
+            result = BatchQueryResult(index=i, query=request.queries[i], answer=answer, source_documents=sources, llm_used=llm_used)
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
@@ -0,0 +1,212 @@
+"""
+Bulk ingestion of a directory or archive of documents, without going through /upload/.
+
+    python -m app.cli.bulk_ingest /data/customer-docs --user-email admin@customer.com
+    python -m app.cli.bulk_ingest customer-docs.zip --user-email admin@customer.com --workers 8
+
+Text is extracted in parallel, each file in its own sandboxed worker process with the
+same limits as the upload router (a runaway PDF is cut short, and whatever text it
+yielded before is kept), and files are then stored in batches: one multi-row INSERT and
+commit for the batch's Document rows, then one embedding/upsert pass over all of its
+chunks (so embedding batches stay full even for small files). Extraction of the next
+batch overlaps with storing the current one.
+
+Every stored file is appended to a JSON-lines checkpoint (by default next to the
+source). Re-running the same command skips the files recorded as done, so an
+interrupted run resumes where it stopped; files that failed to extract are retried.
+Document rows are committed before their chunks are upserted, and chunk ids derive from
+the document id, so a crash anywhere in a batch is repaired by resuming: files whose
+Document already exists reuse it, and their chunks are upserted again over any that
+made it into the store, never next to them.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import document_ids_by_blob_url, get_user_by_email
+from app.database import async_session, engine, upgrade_schema
+from app.models import Base, Document, DocumentContent
+from app.services import extraction_sandbox
+from app.services import embeddings_service
+from app.services.extraction import SourceFile, iter_sources
+from app.services.extraction_sandbox import extract_sandboxed
+
+logger = logging.getLogger(__name__)
+
+DONE = "done"
+FAILED = "failed"
+
+class Checkpoint:
+    """Append-only JSON-lines record of processed files; the last record per key wins."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.status: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by a crash; that batch is simply redone
+                    self.status[record["key"]] = record["status"]
+
+    @property
+    def done(self) -> set:
+        return {key for key, status in self.status.items() if status == DONE}
+
+    def record(self, records: List[dict]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+                self.status[record["key"]] = record["status"]
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# Stores one batch of extracted files; returns (document_id, chunk count) per file.
+StoreBatch = Callable[[List[Tuple[SourceFile, str]]], Awaitable[List[Tuple[int, int]]]]
+
+
+def bulk_blob_url(key: str) -> str:
+    return f"local://bulk/{key}"
+
+
+async def store_documents(db: AsyncSession, user_id: int, files: List[Tuple[SourceFile, str]]) -> List[Tuple[int, int]]:
+    """Commit the batch's Document rows (reusing those left by an interrupted run), then upsert their chunks."""
+    urls = [bulk_blob_url(f.key) for f, _ in files]
+    ids = await document_ids_by_blob_url(db, user_id, urls)
+    new = [(f, text) for (f, text), url in zip(files, urls) if url not in ids]
+    if new:
+        contents = await asyncio.to_thread(lambda: [DocumentContent.from_text(text) for _, text in new])
+        docs = [
+            Document(user_id=user_id, filename=f.filename, blob_url=bulk_blob_url(f.key), content=content)
+            for (f, _), content in zip(new, contents)
+        ]
+        db.add_all(docs)
+        await db.flush()  # one multi-row INSERT ... RETURNING id
+        ids.update((doc.blob_url, doc.id) for doc in docs)
+        await db.commit()
+    if len(new) < len(files):
+        logger.info(f"Reusing {len(files) - len(new)} documents stored by an interrupted run")
+    documents = [(ids[url], text, {"doc_id": ids[url], "filename": f.filename}) for (f, text), url in zip(files, urls)]
+    counts = await embeddings_service.embed_and_upsert_many(documents)
+    return [(doc_id, count) for (doc_id, _, _), count in zip(documents, counts)]
+
+
+def _batched(items: Iterator, size: int) -> Iterator[list]:
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+async def ingest(
+    source: str,
+    checkpoint: Checkpoint,
+    store_batch: StoreBatch,
+    batch_files: int = 32,
+    workers: Optional[int] = None,
+) -> Dict[str, int]:
+    """Extract and store every file of ``source`` not yet done in the checkpoint."""
+    loop = asyncio.get_running_loop()
+    done = checkpoint.done
+    stats = {"done": 0, "failed": 0, "chunks": 0, "skipped": 0}
+
+    workers = workers or os.cpu_count() or 1
+    extraction_sandbox.set_max_workers(workers)
+    # Each thread just waits on its own sandboxed extraction process.
+    with tempfile.TemporaryDirectory(prefix="bulk-ingest-") as scratch, ThreadPoolExecutor(max_workers=workers) as pool:
+
+        def submit(batch: List[SourceFile]):
+            return [(f, loop.run_in_executor(pool, extract_sandboxed, f.path)) for f in batch]
+
+        sources = iter_sources(source, scratch, skip=done)
+        batches = _batched(sources, batch_files)
+        current = submit(next(batches, []))
+        while current:
+            upcoming = submit(next(batches, []))  # extract ahead while this batch is stored
+
+            extracted, errors, records = [], {}, []
+            for f, future in current:
+                result = await future
+                if result.complete or result.text.strip():
+                    extracted.append((f, result.text))
+                    if result.error:
+                        errors[f.key] = result.error  # stored with the text salvaged before the limit
+                else:
+                    logger.warning(f"Could not extract {f.key}: {result.error}")
+                    records.append({"key": f.key, "status": FAILED, "error": result.error})
+
+            if extracted:
+                for (f, _), (document_id, chunks) in zip(extracted, await store_batch(extracted)):
+                    record = {"key": f.key, "status": DONE, "document_id": document_id, "chunks": chunks}
+                    if f.key in errors:
+                        record["partial"] = errors[f.key]
+                    records.append(record)
+                    stats["chunks"] += chunks
+            checkpoint.record(records)
+
+            for f, _ in current:
+                if f.temporary:
+                    os.remove(f.path)
+            for record in records:
+                stats[record["status"]] += 1
+            print(f"📄 {stats['done']} files ingested ({stats['chunks']} chunks), {stats['failed']} failed")
+            current = upcoming
+
+    stats["skipped"] = len(done)
+    return stats
+
+
+async def run(args) -> int:
+    engine.sync_engine.echo = False  # one line per INSERT is too much for a bulk load
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
+    async with async_session() as db:
+        user = await get_user_by_email(db, args.user_email)
+    if user is None:
+        print(f"❌ No user with email {args.user_email}")
+        return 1
+
+    async def store(files: List[Tuple[SourceFile, str]]) -> List[Tuple[int, int]]:
+        async with async_session() as db:
+            return await store_documents(db, user.id, files)
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.source.rstrip('/')}.ingest-checkpoint.jsonl")
+    try:
+        stats = await ingest(args.source, checkpoint, store, args.batch_files, args.workers)
+    finally:
+        await engine.dispose()
+    print(
+        f"✅ Ingested {stats['done']} files ({stats['chunks']} chunks), "
+        f"{stats['skipped']} already done, {stats['failed']} failed; checkpoint: {checkpoint.path}"
+    )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory, .zip or .tar[.gz|.bz2|.xz] archive")
+    parser.add_argument("--user-email", required=True, help="owner of the ingested documents")
+    parser.add_argument("--workers", type=int, default=None, help="concurrent extraction workers (default: CPU count)")
+    parser.add_argument("--batch-files", type=int, default=32, help="files per DB insert / embedding pass")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <source>.ingest-checkpoint.jsonl)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
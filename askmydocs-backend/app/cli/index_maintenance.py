@@ -0,0 +1,78 @@
+"""
+Vector index stats and compaction from the command line (same as the /admin/index endpoints).
+
+    python -m app.cli.index_maintenance stats
+    python -m app.cli.index_maintenance stats --json
+    python -m app.cli.index_maintenance compact --remove-orphans --vacuum
+
+Compaction works on the store files directly, so run it while the API is stopped (or
+use POST /admin/index/compact, which compacts the API's own open store online).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from typing import List, Optional
+
+from app.database import async_session, engine
+from app.services import index_maintenance
+from app.services.vector_store import BACKENDS, open_vector_store
+
+
+def _mb(nbytes: int) -> str:
+    return f"{nbytes / 2**20:.1f} MB"
+
+
+def print_stats(stats: dict):
+    print(f"📦 {stats['backend']} store: {stats['chunks']} chunks of {stats['documents']} documents, "
+          f"{stats['dimensions'] or '-'} dims, {_mb(stats['disk_bytes'])} on disk")
+    if stats["orphaned_chunks"] or stats["untracked_chunks"]:
+        print(f"⚠️  {stats['orphaned_chunks']} orphaned chunks ({stats['orphaned_documents']} deleted documents), "
+              f"{stats['untracked_chunks']} chunks without a doc_id")
+    for user in stats["users"]:
+        print(f"   user {user['user_id']}: {user['documents']} documents, {user['chunks']} chunks")
+    if stats["largest_documents"]:
+        print("   largest documents: " + ", ".join(f"{d['doc_id']} ({d['chunks']})" for d in stats["largest_documents"]))
+
+
+async def run(args) -> int:
+    store = open_vector_store(args.persist_dir, args.backend)
+    try:
+        async with async_session() as db:
+            if args.command == "stats":
+                stats = await index_maintenance.index_stats(db, store, top=args.top)
+                if args.json:
+                    print(json.dumps(stats, indent=2))
+                else:
+                    print_stats(stats)
+            else:
+                result = await index_maintenance.compact_index(db, store, remove_orphans=args.remove_orphans, vacuum=args.vacuum)
+                print(f"✅ Compacted in {result['seconds']:.1f}s: {_mb(result['disk_bytes_before'])} -> "
+                      f"{_mb(result['disk_bytes_after'])}, {result['orphaned_chunks_removed']} orphaned chunks removed")
+    finally:
+        close = getattr(store, "close", None)
+        if close is not None:
+            close()
+        await engine.dispose()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="vector store backend (default: VECTOR_STORE_BACKEND)")
+    parser.add_argument("--persist-dir", default=None, help="store directory (default: the configured one)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats = commands.add_parser("stats", help="chunk counts per user and document, disk size, orphans")
+    stats.add_argument("--top", type=int, default=20, help="largest documents to list")
+    stats.add_argument("--json", action="store_true", help="print the full report as JSON")
+    compact = commands.add_parser("compact", help="rewrite the store without dead entries")
+    compact.add_argument("--remove-orphans", action="store_true", help="first delete chunks of documents that no longer exist")
+    compact.add_argument("--vacuum", action="store_true", help="also vacuum the SQLite files")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
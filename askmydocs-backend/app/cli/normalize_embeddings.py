@@ -0,0 +1,45 @@
+"""
+Rescale the vectors of an existing Chroma store to unit length.
+
+    python -m app.cli.normalize_embeddings
+    python -m app.cli.normalize_embeddings --persist-dir ./chroma_db
+
+Embeddings are computed through Ollama's /api/embed, which returns unit-length vectors.
+Stores filled through the older /api/embeddings hold unnormalized vectors; Chroma
+searches by L2 distance, so those would rank wrongly against the new query vectors
+(and sit on another scale than newly added chunks). Normalizing keeps each vector's
+direction, so the documents don't need to be re-embedded. Run it with the API stopped;
+the API refuses to start on a store that still needs it. The NumPy store always stores
+normalized vectors.
+"""
+import argparse
+import logging
+import sys
+import time
+from typing import List, Optional
+
+from app.services.vector_store import CHROMA, open_vector_store
+
+
+def run(args) -> int:
+    store = open_vector_store(args.persist_dir, CHROMA)
+    if not store.has_unnormalized_vectors():
+        print("✅ The stored vectors are already unit-length, nothing to do.")
+        return 0
+    print(f"Normalizing {store.count()} chunks...")
+    start = time.monotonic()
+    store.normalize_vectors()
+    print(f"✅ Done in {time.monotonic() - start:.1f}s.")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persist-dir", default=None, help="Chroma directory (default: CHROMA_PERSIST_DIR)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
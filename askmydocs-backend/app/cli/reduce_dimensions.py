@@ -0,0 +1,61 @@
+"""
+Convert an existing vector store to truncated embeddings.
+
+    python -m app.cli.reduce_dimensions --dims 256
+    python -m app.cli.reduce_dimensions --dims 256 --backend chroma --persist-dir ./chroma_db
+
+Every stored vector is cut to its first ``--dims`` components and renormalized, which
+is exactly what ingestion and queries do once ``EMBEDDING_DIMENSIONS`` is set, so the
+documents don't need to be re-embedded. Run it with the API stopped, then start the API
+with ``EMBEDDING_DIMENSIONS`` set to the same value (it refuses a store that doesn't
+match). Going back to more dimensions means re-ingesting the documents.
+"""
+import argparse
+import logging
+import sys
+import time
+from typing import List, Optional
+
+from app.services.vector_store import BACKENDS, open_vector_store
+
+logger = logging.getLogger(__name__)
+
+
+def run(args) -> int:
+    store = open_vector_store(args.persist_dir, args.backend)
+    current = store.dimensions()
+    if current is None:
+        print("The vector store is empty; set EMBEDDING_DIMENSIONS and ingest as usual.")
+        return 0
+    if current == args.dims:
+        print(f"✅ Already {current}-dimensional, nothing to do.")
+        return 0
+    if args.dims > current:
+        print(f"❌ The store holds {current}-dim vectors; they can't be grown to {args.dims}.", file=sys.stderr)
+        return 1
+
+    chunks = store.count()
+    print(f"Reducing {chunks} chunks from {current} to {args.dims} dimensions...")
+    start = time.monotonic()
+    store.reduce_dimensions(args.dims)
+    close = getattr(store, "close", None)
+    if close is not None:
+        close()
+    print(f"✅ Done in {time.monotonic() - start:.1f}s. Set EMBEDDING_DIMENSIONS={args.dims} before starting the API.")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", type=int, required=True, help="dimensions to keep (e.g. 512, 256)")
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="vector store backend (default: VECTOR_STORE_BACKEND)")
+    parser.add_argument("--persist-dir", default=None, help="store directory (default: the configured one)")
+    args = parser.parse_args(argv)
+    if args.dims <= 0:
+        parser.error("--dims must be positive")
+    logging.basicConfig(level=logging.INFO)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Snapshot and restore the vector store from the command line.
+
+    python -m app.cli.snapshots create
+    python -m app.cli.snapshots list
+    python -m app.cli.snapshots restore 20261019T101500Z
+
+Restore swaps the snapshot in for the store directory, so stop the API first (or set
+VECTOR_RESTORE_SNAPSHOT and restart it). Snapshots taken with another backend,
+embedding model or vector size are refused. The replaced store is kept next to it as
+<dir>.before-<snapshot>.
+"""
+import argparse
+import logging
+import sys
+from typing import List, Optional
+
+from app.services import snapshots
+from app.services.vector_store import BACKENDS, open_vector_store
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="vector store backend (default: VECTOR_STORE_BACKEND)")
+    parser.add_argument("--persist-dir", default=None, help="store directory (default: the configured one)")
+    parser.add_argument("--snapshot-dir", default=None, help="snapshot directory (default: VECTOR_SNAPSHOT_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create", help="take a snapshot of the store")
+    commands.add_parser("list", help="list the snapshots, newest first")
+    restore = commands.add_parser("restore", help="replace the store with a snapshot")
+    restore.add_argument("snapshot_id")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "list":
+        manifests = snapshots.list_snapshots(args.snapshot_dir)
+        if not manifests:
+            print("📭 No snapshots")
+        for m in manifests:
+            print(f"📸 {m['id']}  {m['backend']}  {m['embedding_model']} ({m['dimensions'] or '-'} dims)  {m['chunks']} chunks")
+        return 0
+
+    if args.command == "create":
+        store = open_vector_store(args.persist_dir, args.backend)
+        try:
+            manifest = snapshots.create_snapshot(store, args.backend, args.persist_dir, args.snapshot_dir)
+        finally:
+            close = getattr(store, "close", None)
+            if close is not None:
+                close()
+        print(f"✅ Snapshot {manifest['id']}: {manifest['chunks']} chunks")
+        return 0
+
+    try:
+        manifest = snapshots.restore_snapshot(args.snapshot_id, args.backend, args.persist_dir, args.snapshot_dir)
+    except (FileNotFoundError, snapshots.SnapshotMismatch) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ Restored snapshot {manifest['id']}: {manifest['chunks']} chunks")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,7 +11,90 @@ class Settings(BaseSettings):
     ollama_host: str = "ollama"
     ollama_port: int = 11434
     ollama_model: str = "nomic-embed-text"
+    ollama_llm_model: str = "llama3"
+    ollama_generation_urls: str = ""   # comma-separated pool of Ollama endpoints for generation (default: ollama_api_url)
+    ollama_embedding_urls: str = ""    # comma-separated pool of Ollama endpoints for embeddings (default: ollama_host:ollama_port)
+
+    # Embedding lanes
+    embedding_batch_size: int = 32            # texts per /api/embed call during ingestion
+    embedding_ingest_concurrency: int = 1     # ingestion batches in flight per embedding endpoint
+
+    # Backend pool health
+    backend_failure_threshold: int = 3          # consecutive failures before an endpoint is ejected
+    backend_ejection_seconds: float = 30.0      # how long an ejected endpoint sits out before it is retried
+    backend_health_interval_seconds: float = 10.0
+
+    # Model warm-up / keep-alive
+    model_warmup_enabled: bool = True
+    model_keep_alive: str = "30m"                # how long Ollama keeps a model resident after a call
+    model_keepalive_interval_seconds: int = 300  # how often the manager re-touches the models
+
+    # LLM admission control (per backend concurrency limit + bounded wait queue)
+    llm_max_concurrency_ollama: int = 2      # per endpoint in the generation pool
+    llm_max_queue_ollama: int = 32
+    llm_max_concurrency_openai: int = 8
+    llm_max_queue_openai: int = 64
+    llm_queue_timeout_seconds: float = 30.0  # give up waiting for a slot after this long (503)
+    llm_retry_after_seconds: int = 5         # Retry-After sent with 429/503 rejections
+
+    # Hedged requests: no first token from Ollama within the delay -> also ask the alternate backend
+    llm_hedging: bool = False
+    llm_hedge_delay_seconds: float = 2.0
+    llm_hedge_backend: str = "openai"        # "openai" or "ollama" (another generation pool endpoint)
+
+    # Deadlines and circuit breakers for external calls
+    request_timeout_seconds: float = 180.0   # whole /chat/query (and each batch question)
+    ollama_timeout_seconds: float = 120.0
+    openai_timeout_seconds: float = 30.0
+    embeddings_timeout_seconds: float = 120.0
+    vector_store_timeout_seconds: float = 30.0
+    blob_timeout_seconds: float = 120.0
+    circuit_failure_threshold: int = 5       # consecutive failures before failing fast
+    circuit_reset_seconds: float = 30.0      # then let one probe call through
+
+    # Per-user rate limits (token buckets): requests and generated answer tokens
+    rate_limit_enabled: bool = True
+    rate_limit_requests_per_minute: float = 60.0
+    rate_limit_request_burst: int = 20
+    rate_limit_tokens_per_minute: float = 20000.0
+    rate_limit_token_burst: int = 40000
+    rate_limit_redis_url: str = ""           # share buckets across workers, e.g. redis://redis:6379/0
+
+    # /chat/query_batch
+    query_batch_max_questions: int = 500
+    query_batch_concurrency: int = 4         # generations in flight per batch
+
+    # Chat sessions: recent turns verbatim + a rolling summary, within a token budget
+    chat_session_max: int = 10000            # LRU-evicted beyond this
+    chat_session_idle_seconds: float = 3600.0
+    chat_history_token_budget: int = 1024    # summary + recent turns put into each prompt
+    chat_summary_token_budget: int = 256
+    chat_max_recent_turns: int = 8
+
+    # Adaptive retrieval: over-fetch, keep hits close to the best one, within bounds
+    retrieval_candidates: int = 20           # hits fetched per question before selection
+    retrieval_min_k: int = 2
+    retrieval_max_k: int = 8
+    retrieval_score_margin: float = 0.08     # keep hits scoring within this of the best hit
+    retrieval_token_budget: int = 2000       # estimated tokens of retrieved context per prompt
     
+    # Vector store
+    vector_store_backend: str = "chroma"    # "chroma" or "numpy"
+    embedding_dimensions: int = 0           # 0 = the model's full size; else keep this many leading dims (renormalized)
+    chroma_persist_dir: str = "./chroma_db"
+    vector_index_dir: str = "./vector_index"  # numpy backend
+    vector_quantization: str = "none"       # numpy backend: "none", "float16" or "int8"
+    vector_rescore_factor: int = 4          # candidates re-scored exactly = k * factor
+    vector_ann_index: str = "none"          # numpy backend: "none" or "ivf"
+    vector_ann_min_chunks: int = 100000     # build the IVF index once the store is this large
+    vector_ivf_nlist: int = 0               # 0 = about 2 * sqrt(chunks), re-sized at each rebuild
+    vector_ivf_nprobe: int = 16             # lists scanned per query (recall vs latency)
+    vector_ann_rebuild_growth: float = 2.0  # rebuild once the corpus grew by this factor
+    vector_hnsw_ef_search: int = 0          # chroma backend: HNSW ef_search, 0 = Chroma's default
+    vector_snapshot_dir: str = "./vector_snapshots"
+    vector_snapshot_keep: int = 5           # newest snapshots kept, 0 = all
+    vector_restore_snapshot: str = ""       # snapshot id restored at startup (once)
+
     # JWT Settings
     jwt_secret_key: str = "your-secret-key-change-in-production"
     jwt_algorithm: str = "HS256"
@@ -19,7 +102,28 @@ class Settings(BaseSettings):
     
     # Azure Storage
     azure_storage_connection_string: str = ""
+    blob_storage_backend: str = "auto"   # "azure", "local", "none", or "auto" (azure with a connection string, else none)
+    blob_container: str = "documents"
+    blob_local_dir: str = "./uploads"      # local backend: a copy of every upload
+    blob_max_concurrency: int = 4          # parallel block uploads per file
+    blob_block_size_mb: int = 4            # files above this are uploaded in blocks
+
+    # Uploads
+    upload_batch_max_files: int = 1000   # files per /upload/batch request, archive members included
+
+    # Document extraction (each document is extracted in its own sandboxed worker process)
+    extraction_cpu_seconds: int = 60          # CPU time per document
+    extraction_timeout_seconds: float = 120.0 # wall-clock time per document
+    extraction_memory_mb: int = 1024          # address space per worker
+    extraction_max_workers: int = 4           # concurrent extraction workers per API process
+    extraction_plugins: str = ""              # comma-separated modules registering extra formats
+
+    # Full document text (document_contents table): auto = zstd if installed, else zlib
+    document_compression: str = "auto"        # auto | zstd | zlib | none
     
+    # Admin endpoints (/admin/...): comma-separated emails of the users allowed to call them
+    admin_emails: str = ""
+
     # CORS
     cors_origins: str = "http://localhost:3000,http://localhost:5173"
 
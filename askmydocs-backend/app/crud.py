@@ -1,6 +1,11 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+
 from sqlalchemy.future import select
 
-from app.models import User, Document
+from app.models import User, Document, DocumentContent
 from sqlalchemy.ext.asyncio import AsyncSession
 import bcrypt
 
@@ -27,3 +32,83 @@ async def create_user(db: AsyncSession, name: str, email: str, password: str):
 async def get_user_by_email(db: AsyncSession, email: str):
     result = await db.execute(select(User).where(User.email == email))
     return result.scalars().first()
+
+def documents_page_query(user_id: int, limit: int, before_id: Optional[int] = None):
+    """
+    One page of a user's documents, newest first, by keyset (no OFFSET): served from
+    the (user_id, id) index whatever the page depth. Never touches the document text.
+    """
+    query = select(Document.id, Document.filename, Document.blob_url, Document.title).where(Document.user_id == user_id)
+    if before_id is not None:
+        query = query.where(Document.id < before_id)
+    return query.order_by(Document.id.desc()).limit(limit + 1)
+
+async def list_documents(db: AsyncSession, user_id: int, limit: int, before_id: Optional[int] = None) -> Tuple[List, Optional[int]]:
+    """Returns (rows, cursor of the next page or None)."""
+    rows = (await db.execute(documents_page_query(user_id, limit, before_id))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+async def get_document_content(db: AsyncSession, user_id: int, document_id: int) -> Optional[Tuple[Document, Optional[bytes]]]:
+    """
+    A user's document with its compressed text (None if nothing was extracted),
+    or None if the user has no such document. Decompress with decompress_text.
+    """
+    row = (await db.execute(
+        select(Document, DocumentContent.data)
+        .outerjoin(DocumentContent, DocumentContent.document_id == Document.id)
+        .where(Document.id == document_id, Document.user_id == user_id)
+    )).first()
+    return None if row is None else (row[0], row[1])
+
+async def document_ids_by_blob_url(db: AsyncSession, user_id: int, blob_urls: List[str]) -> Dict[str, int]:
+    """Ids of the user's documents stored under the given blob URLs (missing URLs are left out)."""
+    if not blob_urls:
+        return {}
+    rows = (await db.execute(
+        select(Document.blob_url, Document.id).where(Document.user_id == user_id, Document.blob_url.in_(blob_urls))
+    )).all()
+    return {row[0]: row[1] for row in rows}
+
+def glob_to_like(pattern: str) -> str:
+    """Filename glob (* and ?) as a LIKE pattern, escaping LIKE's own wildcards."""
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_")
+
+def document_scope_query(
+    document_ids: Optional[List[int]] = None,
+    filename_patterns: Optional[List[str]] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+):
+    """Ids of the documents matching all the given query filters (via the id, filename and date indexes)."""
+    query = select(Document.id)
+    if user_id is not None:
+        query = query.where(Document.user_id == user_id)
+    if document_ids is not None:
+        query = query.where(Document.id.in_(document_ids))
+    if filename_patterns:
+        query = query.where(or_(*(Document.filename.ilike(glob_to_like(p), escape="\\") for p in filename_patterns)))
+    if uploaded_after is not None:
+        query = query.where(Document.uploaded_at >= uploaded_after)
+    if uploaded_before is not None:
+        query = query.where(Document.uploaded_at < uploaded_before)
+    return query
+
+async def resolve_document_scope(db: AsyncSession, user_id: Optional[int] = None, **filters) -> List[int]:
+    """Resolve QueryRequest filters to document ids, for pushing into the vector search."""
+    return list((await db.execute(document_scope_query(user_id=user_id, **filters))).scalars().all())
+
+async def document_owners(db: AsyncSession, document_ids: List[int], batch: int = 1000) -> Dict[int, int]:
+    """user_id of each given document that still exists (missing ids are left out)."""
+    owners = {}
+    for i in range(0, len(document_ids), batch):
+        rows = (await db.execute(select(Document.id, Document.user_id).where(Document.id.in_(document_ids[i:i + batch])))).all()
+        owners.update((row[0], row[1]) for row in rows)
+    return owners
+
+async def max_document_id(db: AsyncSession) -> int:
+    return (await db.execute(select(func.max(Document.id)))).scalar() or 0
@@ -1,7 +1,13 @@
 # app/database.py
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import logging
+from sqlalchemy import Connection, inspect, insert, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncConnection
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.models import DocumentContent
+from app.services.text_compression import compress_text
+
+logger = logging.getLogger(__name__)
 
 engine = create_async_engine(settings.database_url, echo=True)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
@@ -9,3 +15,40 @@ async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False
 async def get_db():
     async with async_session() as session:
         yield session
+
+# create_all() only creates missing tables, so indexes added to existing tables are
+# created here at startup (idempotent; run after create_all).
+SCHEMA_UPGRADES = [
+    "CREATE INDEX IF NOT EXISTS ix_documents_user_id_id ON documents (user_id, id)",
+    # documents uploaded before this column existed count as uploaded when it was added
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS uploaded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()",
+    "CREATE INDEX IF NOT EXISTS ix_documents_uploaded_at ON documents (uploaded_at)",
+]
+
+MIGRATION_BATCH_ROWS = 500
+
+def move_inline_content(conn: Connection):
+    """
+    Move text from the old inline documents.content column into document_contents
+    (compressed), then drop the column. A no-op once the column is gone.
+    """
+    if "content" not in {column["name"] for column in inspect(conn).get_columns("documents")}:
+        return
+    moved, last_id = 0, 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, content FROM documents WHERE id > :last_id AND content IS NOT NULL ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": MIGRATION_BATCH_ROWS},
+        ).all()
+        if not rows:
+            break
+        conn.execute(insert(DocumentContent), [{"document_id": id, "data": compress_text(content)} for id, content in rows])
+        moved += len(rows)
+        last_id = rows[-1].id
+    conn.execute(text("ALTER TABLE documents DROP COLUMN content"))
+    logger.info(f"Moved the text of {moved} documents to document_contents")
+
+async def upgrade_schema(conn: AsyncConnection):
+    for statement in SCHEMA_UPGRADES:
+        await conn.execute(text(statement))
+    await conn.run_sync(move_inline_content)
@@ -12,12 +12,22 @@ Purpose: Showcase advanced technical skills in modern AI application development
 Tech Stack: Python, FastAPI, PostgreSQL, ChromaDB, Docker, Ollama, OpenAI
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api import auth, chat
-from app.routers import auth_router, upload_router, chat_router
-from app.database import engine
+from app.routers import auth_router, upload_router, chat_router, health_router, metrics_router, documents_router, usage_router, admin_router
+from app.database import engine, upgrade_schema
 from app.models import Base
+from app.services.model_manager import model_manager
+from app.services.admission import AdmissionRejected
+from app.services.rate_limit import RateLimited, get_rate_limiter
+from app.services.resilience import CircuitOpen, DeadlineExceeded, DependencyTimeout
+from app.services.backend_pool import generation_pool
+from app.services.embedding_pool import embedding_pool
+from app.services.blob_storage import get_blob_storage
+from app.services.snapshots import restore_at_startup
+import asyncio
 import os
 
 app = FastAPI(
@@ -70,10 +80,60 @@ app.add_middleware(
 # Include routers
 app.include_router(auth_router.router)
 app.include_router(upload_router.router) 
+app.include_router(documents_router.router)
 app.include_router(chat.router, prefix="/chat")
+app.include_router(health_router.router)
+app.include_router(metrics_router.router)
+app.include_router(usage_router.router)
+app.include_router(admin_router.router)
+
+# Overloaded LLM backends fail fast instead of piling up requests
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Callers over their rate limit are told when to come back
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "limit": exc.limit.name},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Unhealthy dependencies fail fast (503); questions that run out of time give up (504)
+@app.exception_handler(CircuitOpen)
+async def circuit_open_handler(request: Request, exc: CircuitOpen):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(DeadlineExceeded)
+@app.exception_handler(DependencyTimeout)
+async def timeout_handler(request: Request, exc: Exception):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
 
 # Create tables on startup
 @app.on_event("startup")
 async def startup():
+    # VECTOR_RESTORE_SNAPSHOT swaps a snapshot in before anything opens the vector store
+    await asyncio.to_thread(restore_at_startup)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
+    # Blob container / upload directory is checked once here, not on every upload
+    await get_blob_storage().start()
+    # Warm the Ollama models in the background; /health/ready reports when they are resident.
+    await model_manager.start()
+    await generation_pool.start()
+    await embedding_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await model_manager.stop()
+    await generation_pool.stop()
+    await embedding_pool.stop()
+    await get_blob_storage().close()
+    await get_rate_limiter().close()
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Index, LargeBinary, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from app.services.text_compression import compress_text, decompress_text
 
 Base = declarative_base()
 
@@ -20,9 +21,34 @@ class Document(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     filename = Column(String, nullable=False)
     blob_url = Column(String, nullable=False)
-    # Optionally keep title/content for future use
+    # Optionally keep title for future use
     title = Column(String, nullable=True)
-    content = Column(Text, nullable=True)
+    uploaded_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
     # Relationship to user
     user = relationship("User", back_populates="documents")
+
+    # Full text lives in its own table so loading documents never pulls it in;
+    # lazy="raise" makes an accidental load an error instead of a hidden query
+    content = relationship("DocumentContent", uselist=False, lazy="raise", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # keyset pagination of a user's documents: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_documents_user_id_id", "user_id", "id"),
+        # query filters on upload date
+        Index("ix_documents_uploaded_at", "uploaded_at"),
+    )
+
+class DocumentContent(Base):
+    __tablename__ = "document_contents"
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    data = Column(LargeBinary, nullable=False)  # codec byte + compressed UTF-8 text
+
+    @classmethod
+    def from_text(cls, text: str, **kwargs) -> "DocumentContent":
+        """Compresses the text; call it from a thread for large documents."""
+        return cls(data=compress_text(text), **kwargs)
+
+    @property
+    def text(self) -> str:
+        return decompress_text(self.data)
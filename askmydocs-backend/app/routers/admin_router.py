@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app.models import User
+from app.routers.auth_router import get_admin_user
+from app.services import index_maintenance
+from app.services.snapshots import list_snapshots
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/index/stats")
+async def index_stats(
+    top: int = Query(50, ge=0, le=1000),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Vector store size, chunks per user and per document (the largest `top`), and orphaned chunks."""
+    return await index_maintenance.index_stats(db, top=top)
+
+@router.post("/index/compact")
+async def compact_index(
+    remove_orphans: bool = False,
+    vacuum: bool = False,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Compact the vector store online (queries keep being served, uploads wait)."""
+    if index_maintenance.is_running():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Index maintenance is already running")
+    return await index_maintenance.compact_index(db, remove_orphans=remove_orphans, vacuum=vacuum)
+
+@router.get("/index/snapshots")
+async def index_snapshots(admin: User = Depends(get_admin_user)):
+    """Snapshots of the vector store, newest first."""
+    return [{key: value for key, value in m.items() if key != "files"} for m in list_snapshots()]
+
+@router.post("/index/snapshots")
+async def snapshot_index(admin: User = Depends(get_admin_user)):
+    """Snapshot the vector store online; restore one with VECTOR_RESTORE_SNAPSHOT at startup."""
+    if index_maintenance.is_running():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Index maintenance is already running")
+    return await index_maintenance.snapshot_index()
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
@@ -6,10 +6,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import UserCreate, Token
 from app.models import User
 from app.database import get_db
-from app.config import JWT_SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import JWT_SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, settings
 from app.crud import hash_password, verify_password
+from app.services.rate_limit import principal_for
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+from typing import Optional
 
 def create_access_token(subject: str) -> str:
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -17,6 +19,7 @@ def create_access_token(subject: str) -> str:
     return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_db)) -> User:
     """Get current authenticated user from JWT token"""
@@ -34,6 +37,25 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
 
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security), db: AsyncSession = Depends(get_db)
+) -> Optional[User]:
+    """The authenticated user, or None for anonymous calls (a token that is sent must still be valid)"""
+    if credentials is None:
+        return None
+    return await get_current_user(credentials, db)
+
+async def get_admin_user(user: User = Depends(get_current_user)) -> User:
+    """The current user, if their email is listed in ADMIN_EMAILS"""
+    admins = {email.strip().lower() for email in settings.admin_emails.split(",") if email.strip()}
+    if user.email.lower() not in admins:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
+
+async def get_principal(request: Request, user: Optional[User] = Depends(get_optional_user)) -> str:
+    """Who a call is charged to for rate limits: the user, else the client address"""
+    return principal_for(user, request)
+
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=Token)
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import get_document_content, list_documents
+from app.database import get_db
+from app.models import User
+from app.routers.auth_router import get_current_user
+from app.schemas import DocumentPage, DocumentSummary, DocumentText
+from app.services.text_compression import decompress_text
+
+router = APIRouter(prefix="/documents", tags=["documents"])
+
+@router.get("", response_model=DocumentPage)
+async def get_documents(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List the current user's documents, newest first, one page at a time."""
+    rows, next_cursor = await list_documents(db, current_user.id, limit, before_id=cursor)
+    return DocumentPage(
+        documents=[DocumentSummary(id=r.id, filename=r.filename, blob_url=r.blob_url, title=r.title) for r in rows],
+        next_cursor=next_cursor,
+    )
+
+@router.get("/{document_id}/content", response_model=DocumentText)
+async def get_document_text(
+    document_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Full extracted text of one document, loaded and decompressed on demand."""
+    found = await get_document_content(db, current_user.id, document_id)
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    doc, data = found
+    text = await asyncio.to_thread(decompress_text, data) if data is not None else ""
+    return DocumentText(id=doc.id, filename=doc.filename, text=text)
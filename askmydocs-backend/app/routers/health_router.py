@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.model_manager import model_manager
+from app.services.resilience import breaker_status
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/live")
+async def liveness():
+    """The process is up and serving requests."""
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def readiness():
+    """Ready only once the generation and embedding models are resident in Ollama."""
+    status = model_manager.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@router.get("/circuits")
+async def circuits():
+    """Circuit breaker state of each external dependency called so far."""
+    return {"circuits": breaker_status()}
@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from app.services.metrics import metrics
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics")
+async def get_metrics():
+    """Snapshot of the in-process counters, gauges and summaries."""
+    return metrics.snapshot()
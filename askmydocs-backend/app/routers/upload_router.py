@@ -1,19 +1,21 @@
-import uuid
+import os
+import shutil
+import tarfile
+import zipfile
+from typing import List, NamedTuple, Optional, Tuple
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models import Document, User
-from app.schemas import UploadResponse
+from app.models import Document, DocumentContent, User
+from app.schemas import BatchUploadItem, BatchUploadResponse, UploadResponse
 from app.routers.auth_router import get_current_user
-try:
-    from azure.storage.blob import BlobServiceClient
-    AZURE_AVAILABLE = True
-except ImportError:
-    AZURE_AVAILABLE = False
-    
-from app.config import AZURE_STORAGE_CONNECTION_STRING
-from app.services.embeddings_service import embed_and_upsert_from_text
-import aiofiles
+from app.config import settings
+from app.services.blob_storage import get_blob_storage
+from app.services.embeddings_service import embed_and_upsert_from_text, embed_and_upsert_many
+from app.services.extraction import file_suffix, is_archive, iter_sources
+from app.services.extraction_sandbox import ExtractionResult, extract_sandboxed
+from app.services.rate_limit import check_request, principal_for
+import asyncio
 import tempfile
 
 router = APIRouter(prefix="/upload", tags=["upload"])
@@ -24,31 +26,18 @@ async def upload_file(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    await check_request(principal_for(current_user))
     user_id = current_user.id
 
-    # store file temporarily and optionally upload to Azure Blob Storage
-    blob_url = f"local://uploads/{file.filename}"
-
-    suffix = file.filename.split(".")[-1].lower()
+    # store file temporarily, then keep the original in blob storage (Azure or local)
+    suffix = file_suffix(file.filename)
     with tempfile.NamedTemporaryFile(delete=False, suffix=f".{suffix}") as tmp:
         content = await file.read()
         tmp.write(content)
         tmp.flush()
         tmp_path = tmp.name
 
-    if AZURE_AVAILABLE and AZURE_STORAGE_CONNECTION_STRING:
-        blob_service = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-        container_name = "documents"
-        try:
-            blob_service.create_container(container_name)
-        except Exception:
-            pass
-
-        unique_name = f"{uuid.uuid4()}_{file.filename}"
-        blob_client = blob_service.get_blob_client(container=container_name, blob=unique_name)
-        with open(tmp_path, "rb") as data:
-            blob_client.upload_blob(data, overwrite=True)
-        blob_url = blob_client.url
+    blob_url = await get_blob_storage().upload_file(tmp_path, file.filename)
 
     # save metadata to DB
     doc = Document(user_id=user_id, filename=file.filename, blob_url=blob_url)
@@ -56,26 +45,123 @@ async def upload_file(
     await db.commit()
     await db.refresh(doc)
 
-    # extract text from file (basic for txt; for PDF you'd use pdfplumber or PyPDF2)
-    text = ""
-    if suffix in ("txt", "md"):
-        async with aiofiles.open(tmp_path, mode="r", encoding="utf-8", errors="ignore") as f:
-            text = await f.read()
-    elif suffix in ("pdf",):
-        # lightweight example: use PyPDF2 to extract text
-        from PyPDF2 import PdfReader
-        reader = PdfReader(tmp_path)
-        pages = []
-        for p in reader.pages:
-            pages.append(p.extract_text() or "")
-        text = "\n".join(pages)
-    else:
-        # fallback: treat as binary -> no text
-        text = ""
+    # extract text in a sandboxed worker process (CPU, memory and time limits);
+    # if a limit is hit we index whatever was extracted before it
+    result = await asyncio.to_thread(extract_sandboxed, tmp_path, suffix)
+    text = result.text
+    if text:
+        db.add(await asyncio.to_thread(DocumentContent.from_text, text, document_id=doc.id))
+        await db.commit()
 
     # send text for embedding (non-blocking: can be made background task)
     if text.strip():
         metadata = {"doc_id": doc.id, "filename": file.filename}
         await embed_and_upsert_from_text(doc.id, text, metadata)
 
-    return UploadResponse(document_id=doc.id, filename=file.filename, blob_url=blob_url)
+    return UploadResponse(document_id=doc.id, filename=file.filename, blob_url=blob_url, extraction_error=result.error)
+
+
+
+class ExtractedFile(NamedTuple):
+    name: str                # reported name; archive members are "<archive>/<member path>"
+    filename: str            # Document.filename
+    member: Optional[str]    # path inside the archive, None for plain files
+    text: Optional[str]      # None when nothing could be extracted
+    error: Optional[str]     # set with text too when extraction was cut short
+
+class TooManyFiles(Exception):
+    pass
+
+def _save_upload(file: UploadFile, path: str):
+    file.file.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file.file, out)
+
+def _extracted(name: str, filename: str, member: Optional[str], result: ExtractionResult) -> ExtractedFile:
+    salvaged = result.complete or bool(result.text.strip())
+    return ExtractedFile(name, filename, member, result.text if salvaged else None, result.error)
+
+def _extract_upload(path: str, filename: str, scratch: str, limit: int) -> List[ExtractedFile]:
+    """
+    Extract one uploaded file, or every supported member of an uploaded archive.
+    Members are unpacked and extracted one at a time, so only one is on disk at once.
+    """
+    if not is_archive(filename):
+        return [_extracted(filename, filename, None, extract_sandboxed(path, file_suffix(filename)))]
+
+    results = []
+    try:
+        for member in iter_sources(path, scratch):
+            if len(results) >= limit:
+                raise TooManyFiles()
+            try:
+                result = extract_sandboxed(member.path)
+            finally:
+                os.remove(member.path)
+            results.append(_extracted(f"{filename}/{member.key}", member.filename, member.key, result))
+    except (ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+        return [ExtractedFile(filename, filename, None, None, f"unreadable archive: {e}")]
+    return results
+
+@router.post("/batch", response_model=BatchUploadResponse)
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Upload many files and/or zip/tar archives in one request. All Document rows are
+    inserted in one transaction and the chunks of every file share embedding batches.
+    Files that can't be extracted are reported as failed; the others are still stored,
+    including the salvaged text of files whose extraction hit a limit ("partial").
+    """
+    limit = settings.upload_batch_max_files
+    too_many = HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"At most {limit} files per batch")
+    if len(files) > limit:
+        raise too_many
+    await check_request(principal_for(current_user), len(files))  # each file counts as a request
+
+    items: List[BatchUploadItem] = []
+    stored: List[Tuple[BatchUploadItem, Document, str]] = []
+    with tempfile.TemporaryDirectory(prefix="upload-batch-") as scratch:
+        for index, file in enumerate(files):
+            path = os.path.join(scratch, f"{index}_{os.path.basename(file.filename)}")
+            await asyncio.to_thread(_save_upload, file, path)
+            try:
+                extracted = await asyncio.to_thread(_extract_upload, path, file.filename, scratch, limit - len(items))
+            except TooManyFiles:
+                raise too_many
+            if len(items) + len(extracted) > limit:
+                raise too_many
+
+            blob_url = None
+            if any(f.text is not None for f in extracted):
+                blob_url = await get_blob_storage().upload_file(path, file.filename)
+            for f in extracted:
+                outcome = "failed" if f.text is None else ("partial" if f.error else "stored")
+                item = BatchUploadItem(filename=f.name, status=outcome, error=f.error)
+                items.append(item)
+                if f.text is not None:
+                    # archive members point into the stored archive
+                    url = blob_url if f.member is None else f"{blob_url}#{f.member}"
+                    stored.append((item, Document(user_id=current_user.id, filename=f.filename, blob_url=url), f.text))
+
+    if stored:
+        # compress off the event loop; the texts are inserted with their documents
+        contents = await asyncio.to_thread(lambda: [DocumentContent.from_text(text) if text else None for _, _, text in stored])
+        for (_, doc, _), content in zip(stored, contents):
+            doc.content = content
+        db.add_all([doc for _, doc, _ in stored])
+        await db.flush()  # one multi-row INSERT ... RETURNING id
+        with_text = [(item, doc, text) for item, doc, text in stored if text.strip()]
+        counts = await embed_and_upsert_many(
+            [(doc.id, text, {"doc_id": doc.id, "filename": doc.filename}) for _, doc, text in with_text]
+        )
+        await db.commit()
+        for item, doc, _ in stored:
+            item.document_id = doc.id
+        for (item, _, _), count in zip(with_text, counts):
+            item.chunks = count
+
+    stored_count = len(stored)
+    return BatchUploadResponse(documents=items, stored=stored_count, failed=len(items) - stored_count)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Depends
+from app.routers.auth_router import get_principal
+from app.schemas import UsageOut
+from app.services.rate_limit import usage_report
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+@router.get("", response_model=UsageOut)
+async def get_usage(principal: str = Depends(get_principal)):
+    """Requests and generated tokens used by the caller, and what their rate limits allow right now."""
+    return await usage_report(principal)
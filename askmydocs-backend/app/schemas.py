@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
 
 
 class UserCreate(BaseModel):
@@ -22,9 +23,25 @@ class DocumentCreate(BaseModel):
 class DocumentOut(DocumentCreate):
     id: str
 
-class QueryRequest(BaseModel):
+class QueryFilters(BaseModel):
+    # Optional filters: only chunks of matching documents are searched
+    document_ids: Optional[List[int]] = None
+    filename_patterns: Optional[List[str]] = None   # globs, e.g. "*.pdf", "report-2024*"; any may match
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+    def scope(self) -> Dict[str, Any]:
+        """The filters that were set (empty = whole collection)."""
+        return self.model_dump(include={"document_ids", "filename_patterns", "uploaded_after", "uploaded_before"}, exclude_none=True)
+
+class QueryRequest(QueryFilters):
     query: str
     model: str = 'ollama'  # Default to local Ollama
+    session_id: Optional[str] = None   # from POST /chat/sessions: answer with the conversation so far
+
+class BatchQueryRequest(QueryFilters):
+    queries: List[str] = Field(..., min_length=1)   # the filters apply to every question
+    model: str = 'ollama'
 
 class SourceDoc(BaseModel):
     doc_id: str
@@ -37,6 +54,33 @@ class QueryResponse(BaseModel):
     source_documents: List[SourceDoc]
     llm_used: str
 
+class BatchQueryResult(QueryResponse):
+    """One line of the /chat/query_batch NDJSON stream, sent as soon as the answer is ready."""
+    index: int   # position of the question in the request
+    query: str
+
+class ChatTurn(BaseModel):
+    question: str
+    answer: str
+
+class ChatSessionOut(BaseModel):
+    session_id: str
+    summary: str = ""                       # older turns, folded into a rolling summary
+    turns: List[ChatTurn] = []              # recent turns, verbatim
+    history_tokens: int = 0                 # estimated size of the stored history
+
+class BucketState(BaseModel):
+    available: float                        # what can be spent right now (negative = in debt)
+    burst: float
+    per_minute: float
+
+class UsageOut(BaseModel):
+    principal: str                          # user:<id>, or ip:<address> for anonymous calls
+    requests: int = 0
+    generated_tokens: int = 0
+    rejected: int = 0                       # calls refused with 429
+    limits: Dict[str, BucketState] = {}
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -47,4 +91,32 @@ class ChatRequest(BaseModel):
 class UploadResponse(BaseModel):
     document_id: int
     filename: str
-    blob_url: str
\ No newline at end of file
+    blob_url: str
+    extraction_error: Optional[str] = None   # extraction hit a limit; only the text before it was indexed
+
+class BatchUploadItem(BaseModel):
+    filename: str                     # archive members are reported as "<archive>/<member path>"
+    status: str                       # "stored", "partial" (extraction cut short) or "failed"
+    document_id: Optional[int] = None
+    chunks: int = 0
+    error: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    documents: List[BatchUploadItem]
+    stored: int
+    failed: int
+
+class DocumentSummary(BaseModel):
+    id: int
+    filename: str
+    blob_url: str
+    title: Optional[str] = None
+
+class DocumentPage(BaseModel):
+    documents: List[DocumentSummary]
+    next_cursor: Optional[int] = None   # pass as ?cursor= to get the next page; None on the last page
+
+class DocumentText(BaseModel):
+    id: int
+    filename: str
+    text: str
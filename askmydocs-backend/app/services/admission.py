@@ -0,0 +1,131 @@
+"""
+Admission control for LLM backends.
+
+Each backend gets a concurrency limit and a bounded FIFO wait queue. Once the queue is
+full new calls are rejected immediately (429), and calls that wait longer than the
+queue deadline give up (503); both carry a Retry-After hint. This keeps an overloaded
+Ollama from slowing every request down until they all time out together.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+
+from app.config import settings
+from app.services.backend_pool import generation_pool
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call cannot be admitted; mapped to an HTTP error with Retry-After."""
+
+    def __init__(self, backend: str, reason: str, status_code: int, retry_after: int):
+        super().__init__(f"{backend} is overloaded ({reason}), retry in {retry_after}s")
+        self.backend = backend
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, backend: str, max_concurrency: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _publish(self):
+        metrics.set_gauge("llm_active_calls", self._active, backend=self.backend)
+        metrics.set_gauge("llm_queue_depth", len(self._waiters), backend=self.backend)
+
+    def _reject(self, reason: str, status_code: int) -> AdmissionRejected:
+        metrics.inc("llm_rejected_total", backend=self.backend, reason=reason)
+        logger.warning(f"Rejecting {self.backend} call: {reason}")
+        return AdmissionRejected(self.backend, reason, status_code, self.retry_after)
+
+    async def acquire(self):
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            metrics.observe("llm_queue_wait_seconds", 0.0, backend=self.backend)
+            self._publish()
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full", 429)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self._publish()
+        start = time.monotonic()
+        try:
+            # shield() so that a timeout can't race with release() handing us the slot
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not fut.done():
+                fut.cancel()
+                self._waiters.remove(fut)
+                raise self._reject("queue_timeout", 503)
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # the slot was already ours; pass it on
+            else:
+                fut.cancel()
+                self._waiters.remove(fut)
+            raise
+        finally:
+            metrics.observe("llm_queue_wait_seconds", time.monotonic() - start, backend=self.backend)
+            self._publish()
+
+    def release(self):
+        # Hand the slot straight to the oldest waiter, keeping the active count unchanged.
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                self._publish()
+                return
+        self._active -= 1
+        self._publish()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_admission_controller(backend: str) -> AdmissionController:
+    """One controller per LLM backend ("ollama", "openai"), created on first use."""
+    controller = _controllers.get(backend)
+    if controller is None:
+        # The Ollama limit is per endpoint, so it grows with the generation pool.
+        width = len(generation_pool.endpoints) if backend == "ollama" else 1
+        controller = AdmissionController(
+            backend,
+            max_concurrency=getattr(settings, f"llm_max_concurrency_{backend}") * width,
+            max_queue=getattr(settings, f"llm_max_queue_{backend}"),
+            queue_timeout=settings.llm_queue_timeout_seconds,
+            retry_after=settings.llm_retry_after_seconds,
+        )
+        _controllers[backend] = controller
+    return controller
@@ -0,0 +1,223 @@
+"""
+Pool of interchangeable Ollama endpoints.
+
+Requests go to the healthy endpoint with the fewest outstanding requests. An endpoint
+that fails ``failure_threshold`` times in a row (connection errors, timeouts and 5xx
+answers; see ``is_endpoint_failure``) is ejected for ``ejection_seconds``;
+a background health check brings it back as soon as it answers again (and ejects
+endpoints that stop answering before a request has to find out).
+
+Leases are plain context managers guarded by a threading lock, so the pool can be used
+from the event loop and from the worker threads that run the blocking LLM calls.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, TypeVar
+
+import httpx
+import requests
+
+from app.config import settings
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors that mean "this endpoint is unreachable", worth retrying on another one.
+RETRYABLE_ERRORS = (ConnectionError, requests.exceptions.ConnectionError, requests.exceptions.Timeout, httpx.TransportError)
+
+
+def is_endpoint_failure(exc: BaseException) -> bool:
+    """
+    Whether an error says something about the endpoint (unreachable, timing out, 5xx)
+    rather than the request: 4xx answers, caller-side errors and cancelled requests
+    (hedged losers, expired deadlines) must not get a healthy endpoint ejected.
+    """
+    if isinstance(exc, RETRYABLE_ERRORS + (TimeoutError,)):
+        return True
+    if isinstance(exc, (httpx.HTTPStatusError, requests.exceptions.HTTPError)):
+        return exc.response is not None and exc.response.status_code >= 500
+    return False
+
+
+class NoHealthyBackend(Exception):
+    pass
+
+
+@dataclass
+class Endpoint:
+    url: str
+    outstanding: int = 0
+    healthy: bool = True
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    total_requests: int = 0
+    total_failures: int = 0
+
+    def as_dict(self) -> Dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.consecutive_failures,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+        }
+
+
+def parse_urls(value: str, default: str) -> List[str]:
+    """Comma-separated URL list from settings, falling back to the single default URL."""
+    urls = [u.strip().rstrip("/") for u in value.split(",") if u.strip()]
+    return urls or [default.rstrip("/")]
+
+
+class BackendPool:
+    def __init__(
+        self,
+        name: str,
+        urls: List[str],
+        failure_threshold: int = 3,
+        ejection_seconds: float = 30.0,
+        health_path: str = "/api/tags",
+        health_interval: float = 10.0,
+    ):
+        if not urls:
+            raise ValueError(f"Backend pool {name} needs at least one endpoint")
+        self.name = name
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.ejection_seconds = ejection_seconds
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._rr = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def urls(self) -> List[str]:
+        return [ep.url for ep in self.endpoints]
+
+    def _available(self, now: float) -> List[Endpoint]:
+        available = [ep for ep in self.endpoints if ep.healthy or ep.ejected_until <= now]
+        # With every endpoint ejected, trying one beats failing every request outright.
+        return available or [min(self.endpoints, key=lambda ep: ep.ejected_until)]
+
+    def _pick(self) -> Endpoint:
+        candidates = self._available(time.monotonic())
+        least = min(ep.outstanding for ep in candidates)
+        tied = [ep for ep in candidates if ep.outstanding == least]
+        return tied[next(self._rr) % len(tied)]
+
+    def _publish(self, ep: Endpoint):
+        metrics.set_gauge("backend_outstanding", ep.outstanding, pool=self.name, endpoint=ep.url)
+        metrics.set_gauge("backend_healthy", int(ep.healthy), pool=self.name, endpoint=ep.url)
+
+    def mark_success(self, ep: Endpoint):
+        with self._lock:
+            ep.consecutive_failures = 0
+            if not ep.healthy:
+                logger.info(f"{self.name}: {ep.url} is back in rotation")
+            ep.healthy = True
+            self._publish(ep)
+
+    def mark_failure(self, ep: Endpoint):
+        with self._lock:
+            ep.consecutive_failures += 1
+            ep.total_failures += 1
+            metrics.inc("backend_failures_total", pool=self.name, endpoint=ep.url)
+            if ep.consecutive_failures >= self.failure_threshold:
+                if ep.healthy:
+                    logger.warning(f"{self.name}: ejecting {ep.url} after {ep.consecutive_failures} failures")
+                    metrics.inc("backend_ejections_total", pool=self.name, endpoint=ep.url)
+                ep.healthy = False
+                ep.ejected_until = time.monotonic() + self.ejection_seconds
+            self._publish(ep)
+
+    @contextmanager
+    def lease(self, weight: int = 1):
+        """Reserve the least-loaded endpoint for one request (``weight`` units of load)."""
+        with self._lock:
+            ep = self._pick()
+            ep.outstanding += weight
+            ep.total_requests += 1
+            self._publish(ep)
+        try:
+            yield ep
+        except Exception as e:
+            if is_endpoint_failure(e):
+                self.mark_failure(ep)
+            raise
+        else:
+            self.mark_success(ep)
+        finally:
+            with self._lock:
+                ep.outstanding -= weight
+                self._publish(ep)
+
+    def call(self, fn: Callable[[str], T], weight: int = 1, attempts: Optional[int] = None) -> T:
+        """Run ``fn(base_url)`` on the pool, moving to another endpoint if one is unreachable."""
+        attempts = attempts or len(self.endpoints)
+        for attempt in range(attempts):
+            try:
+                with self.lease(weight) as ep:
+                    return fn(ep.url)
+            except RETRYABLE_ERRORS as e:
+                if attempt == attempts - 1:
+                    raise
+                logger.warning(f"{self.name}: {ep.url} unreachable ({e}), retrying on another endpoint")
+        raise NoHealthyBackend(self.name)  # only reached when attempts == 0
+
+    async def check_health(self):
+        async with httpx.AsyncClient(timeout=httpx.Timeout(2.0)) as client:
+            async def probe(ep: Endpoint):
+                try:
+                    resp = await client.get(f"{ep.url}{self.health_path}")
+                    resp.raise_for_status()
+                except Exception as e:
+                    logger.debug(f"{self.name}: health check of {ep.url} failed: {e}")
+                    # A failed probe counts as much as a failed request: eject right away.
+                    with self._lock:
+                        ep.consecutive_failures = max(ep.consecutive_failures, self.failure_threshold - 1)
+                    self.mark_failure(ep)
+                else:
+                    self.mark_success(ep)
+
+            await asyncio.gather(*(probe(ep) for ep in self.endpoints))
+
+    async def _run(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    async def start(self):
+        # A single endpoint has nothing to fail over to; skip the probes.
+        if len(self.endpoints) > 1 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {"pool": self.name, "endpoints": [ep.as_dict() for ep in self.endpoints]}
+
+
+generation_pool = BackendPool(
+    "ollama-generation",
+    parse_urls(settings.ollama_generation_urls, settings.ollama_api_url),
+    failure_threshold=settings.backend_failure_threshold,
+    ejection_seconds=settings.backend_ejection_seconds,
+    health_interval=settings.backend_health_interval_seconds,
+)
@@ -0,0 +1,138 @@
+"""
+Storage for the original uploaded files.
+
+* ``AzureBlobStorage`` - one async ``BlobServiceClient`` (and its connection pool) for
+  the whole process. The container is created once at startup, not on every upload,
+  and files larger than one block are uploaded as blocks in parallel (``max_concurrency``).
+* ``LocalBlobStorage`` - the same interface on the local filesystem (opt-in with
+  ``BLOB_STORAGE_BACKEND=local``; every upload is copied under ``BLOB_LOCAL_DIR``,
+  so that directory grows by the size of everything uploaded), also used for
+  benchmarking the upload path offline.
+* ``NoBlobStorage`` - keeps no copy, as before Azure is configured: the default
+  (``auto``) without a connection string.
+
+Neither blocks the event loop: Azure uploads are async, local copies run in a thread.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+
+try:
+    from azure.core.exceptions import ResourceExistsError
+    from azure.storage.blob.aio import BlobServiceClient
+    AZURE_AVAILABLE = True
+except ImportError:
+    AZURE_AVAILABLE = False
+
+from app.config import settings
+from app.services import resilience
+
+logger = logging.getLogger(__name__)
+
+AZURE = "azure"
+LOCAL = "local"
+NONE = "none"
+AUTO = "auto"
+BACKENDS = (AUTO, AZURE, LOCAL, NONE)
+
+
+class BlobStorage(ABC):
+    async def start(self):
+        """Prepare the backend once at startup."""
+
+    async def close(self):
+        """Release connections at shutdown."""
+
+    @abstractmethod
+    async def upload_file(self, path: str, filename: str) -> str:
+        """Store a local file under a unique name and return its URL."""
+
+    @staticmethod
+    def blob_name(filename: str) -> str:
+        return f"{uuid.uuid4()}_{os.path.basename(filename)}"
+
+
+class AzureBlobStorage(BlobStorage):
+    def __init__(self, connection_string: str, container: str, max_concurrency: int = 4, block_size: int = 4 * 2**20):
+        if not AZURE_AVAILABLE:
+            raise RuntimeError("azure-storage-blob (with aiohttp) is required for the Azure blob storage backend")
+        self.max_concurrency = max_concurrency
+        self._client = BlobServiceClient.from_connection_string(
+            connection_string,
+            max_block_size=block_size,
+            max_single_put_size=block_size,
+            connection_timeout=10,
+            read_timeout=settings.blob_timeout_seconds,
+        )
+        self._container = self._client.get_container_client(container)
+
+    async def start(self):
+        try:
+            await self._container.create_container()
+            logger.info(f"Created blob container {self._container.container_name}")
+        except ResourceExistsError:
+            pass
+
+    async def close(self):
+        await self._client.close()
+
+    async def upload_file(self, path: str, filename: str) -> str:
+        blob = self._container.get_blob_client(self.blob_name(filename))
+
+        async def upload():
+            with open(path, "rb") as data:
+                await blob.upload_blob(data, length=os.path.getsize(path), overwrite=True, max_concurrency=self.max_concurrency)
+
+        await resilience.guarded("blob", upload)
+        return blob.url
+
+
+class LocalBlobStorage(BlobStorage):
+    def __init__(self, root: str):
+        self.root = root
+
+    async def start(self):
+        os.makedirs(self.root, exist_ok=True)
+
+    async def upload_file(self, path: str, filename: str) -> str:
+        name = self.blob_name(filename)
+        await asyncio.to_thread(shutil.copyfile, path, os.path.join(self.root, name))
+        return f"local://uploads/{name}"
+
+
+class NoBlobStorage(BlobStorage):
+    async def upload_file(self, path: str, filename: str) -> str:
+        return f"local://uploads/{os.path.basename(filename)}"  # a label only; the file isn't kept
+
+
+_blob_storage: Optional[BlobStorage] = None
+
+
+def create_blob_storage(backend: str = None) -> BlobStorage:
+    backend = backend or settings.blob_storage_backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown blob storage backend {backend!r}, expected one of {BACKENDS}")
+    if backend == AUTO:
+        backend = AZURE if AZURE_AVAILABLE and settings.azure_storage_connection_string else NONE
+    if backend == AZURE:
+        return AzureBlobStorage(
+            settings.azure_storage_connection_string,
+            settings.blob_container,
+            max_concurrency=settings.blob_max_concurrency,
+            block_size=settings.blob_block_size_mb * 2**20,
+        )
+    if backend == LOCAL:
+        return LocalBlobStorage(settings.blob_local_dir)
+    return NoBlobStorage()
+
+
+def get_blob_storage() -> BlobStorage:
+    """The process-wide blob storage, created on first use."""
+    global _blob_storage
+    if _blob_storage is None:
+        _blob_storage = create_blob_storage()
+    return _blob_storage
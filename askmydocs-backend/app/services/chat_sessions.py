@@ -0,0 +1,206 @@
+"""
+Server-side chat sessions with bounded memory.
+
+A session keeps its most recent turns verbatim and everything older as one rolling
+summary. Whatever a conversation's length, the history put into a prompt is the
+summary plus the newest turns that fit in ``chat_history_token_budget`` tokens, so
+prompt size (and prefill time) stays flat.
+
+Turns that no longer fit (or exceed ``chat_max_recent_turns``) are folded into the
+summary by the LLM in the background after an answer is sent: the previous summary
+and the folded turns go in, an updated summary comes out, so each turn is summarized
+once rather than re-summarizing the whole conversation. If that call fails the turns
+are kept and the budget is still enforced by leaving the oldest ones out of prompts.
+
+Sessions live in process memory in an LRU map, capped at ``chat_session_max`` entries
+and dropped after ``chat_session_idle_seconds`` without use. Each belongs to the
+principal that created it (the signed-in user, else the client address); to anyone
+else it looks like it doesn't exist.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.services import ollama_client, prompts
+from app.services.admission import get_admission_controller
+from app.services.backend_pool import generation_pool
+from app.services.metrics import metrics
+from app.services.prompts import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+MAX_STORED_TURNS_FACTOR = 2
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    limit = tokens * prompts.CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0]
+
+
+# (question, answer, estimated tokens of the formatted turn)
+Turn = Tuple[str, str, int]
+
+
+def format_turn(question: str, answer: str) -> str:
+    return f"User: {question}\nAssistant: {answer}"
+
+
+class ChatSession:
+    __slots__ = ("id", "owner", "summary", "turns", "last_used", "lock", "compacting")
+
+    def __init__(self, session_id: str, owner: str = ""):
+        self.id = session_id
+        self.owner = owner
+        self.summary = ""
+        self.turns: List[Turn] = []
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()  # one question at a time per session, so turns stay in order
+        self.compacting = False
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append((question, answer, estimate_tokens(format_turn(question, answer))))
+        # if summarizing keeps failing, don't hold on to turns no prompt will ever include
+        overflow = len(self.turns) - MAX_STORED_TURNS_FACTOR * settings.chat_max_recent_turns
+        if overflow > 0 and not self.compacting:  # a running compaction owns the oldest turns
+            del self.turns[:overflow]
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(tokens for _, _, tokens in self.turns)
+
+    def needs_compaction(self) -> bool:
+        return len(self.turns) > 1 and (
+            self.tokens > settings.chat_history_token_budget or len(self.turns) > settings.chat_max_recent_turns
+        )
+
+    def history(self, budget: Optional[int] = None) -> str:
+        """Summary plus the newest turns that fit in the token budget, oldest first."""
+        budget = settings.chat_history_token_budget if budget is None else budget
+        summary = truncate_to_tokens(self.summary, settings.chat_summary_token_budget)
+        remaining = budget - estimate_tokens(summary)
+        recent = []
+        for question, answer, tokens in reversed(self.turns[-settings.chat_max_recent_turns:]):
+            if tokens > remaining:
+                break
+            recent.append(format_turn(question, answer))
+            remaining -= tokens
+        parts = [f"Summary of the earlier conversation: {summary}"] if summary else []
+        return "\n\n".join(parts + recent[::-1])
+
+    def last_question(self) -> Optional[str]:
+        return self.turns[-1][0] if self.turns else None
+
+
+def _turns_to_fold(session: ChatSession) -> int:
+    """How many of the oldest turns must go for the rest to fit (at least one turn is kept)."""
+    budget = settings.chat_history_token_budget - settings.chat_summary_token_budget
+    keep, used = 0, 0
+    for _, _, tokens in reversed(session.turns[-settings.chat_max_recent_turns:]):
+        if used + tokens > budget and keep:
+            break
+        keep, used = keep + 1, used + tokens
+    return len(session.turns) - keep
+
+
+async def _summarize(summary: str, turns: List[Turn]) -> str:
+    text = prompts.CHAT_SUMMARY.render(
+        summary=summary or "(none yet)",
+        turns="\n\n".join(format_turn(question, answer) for question, answer, _ in turns),
+        words=settings.chat_summary_token_budget * 3 // 4,
+    )
+
+    def generate(base_url: str) -> str:
+        return ollama_client.generate(base_url, text, system=prompts.CHAT_SUMMARY.system).text
+
+    async with get_admission_controller("ollama").slot():
+        return (await asyncio.to_thread(generation_pool.call, generate)).strip()
+
+
+async def compact(session: ChatSession):
+    """Fold the turns that no longer fit into the session's summary."""
+    if session.compacting:
+        return
+    session.compacting = True
+    try:
+        count = _turns_to_fold(session)
+        if count <= 0:
+            return
+        folded = session.turns[:count]
+        start = time.monotonic()
+        summary = await _summarize(session.summary, folded)
+        # new turns may have been appended meanwhile, but only this task removes old ones
+        session.summary = truncate_to_tokens(summary, settings.chat_summary_token_budget)
+        del session.turns[:count]
+        metrics.inc("chat_summaries_total", outcome="ok")
+        metrics.observe("chat_summary_seconds", time.monotonic() - start)
+    except Exception as e:
+        metrics.inc("chat_summaries_total", outcome="failed")
+        logger.warning(f"Could not summarize chat session {session.id}: {e}")
+    finally:
+        session.compacting = False
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int, idle_seconds: float):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._tasks = set()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _publish(self):
+        metrics.set_gauge("chat_sessions_active", len(self._sessions))
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            metrics.inc("chat_sessions_evicted_total", reason="idle")
+
+    def create(self, owner: str = "") -> ChatSession:
+        self._expire()
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+            metrics.inc("chat_sessions_evicted_total", reason="lru")
+        session = ChatSession(uuid.uuid4().hex, owner)
+        self._sessions[session.id] = session
+        self._publish()
+        return session
+
+    def get(self, session_id: str, owner: Optional[str] = None) -> Optional[ChatSession]:
+        """The session, unless it has expired or (when ``owner`` is given) belongs to someone else."""
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is not None and owner is not None and session.owner != owner:
+            session = None
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        self._publish()
+        return session
+
+    def delete(self, session_id: str, owner: Optional[str] = None) -> bool:
+        found = self.get(session_id, owner) is not None
+        if found:
+            del self._sessions[session_id]
+        self._publish()
+        return found
+
+    def record_turn(self, session: ChatSession, question: str, answer: str):
+        """Add a turn and, if the session is now over budget, compact it in the background."""
+        session.add_turn(question, answer)
+        if session.needs_compaction() and not session.compacting:
+            task = asyncio.create_task(compact(session))
+            self._tasks.add(task)  # keep a reference until it finishes
+            task.add_done_callback(self._tasks.discard)
+
+
+chat_sessions = SessionStore(settings.chat_session_max, settings.chat_session_idle_seconds)
@@ -0,0 +1,226 @@
+"""
+Chroma behind the VectorStoreBackend interface.
+
+Chroma only marks deleted and overwritten entries in its HNSW segment, so the files keep
+growing with churn. Compaction (like dimension reduction) copies the live chunks into a
+staging collection, renames the old collection to a backup name, renames the staging
+one to the old name and only then drops the backup, so the data is always held by one
+complete collection. An interrupted switch is finished (or, if the copy itself was
+interrupted, the partial staging collection is dropped) when the store is next opened.
+
+Searches go to the old collection until the switch; one that was still running on it
+when it was dropped is retried once on the new collection. Every write (uploads
+through ``add_texts`` included) takes ``_write_lock``, so writes wait for the rewrite
+instead of landing in the collection that is about to be dropped.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from app.services import quantization as q
+from app.services.vector_store import VectorStoreBackend, directory_size
+
+logger = logging.getLogger(__name__)
+
+COPY_BATCH = 1000
+STAGING_SUFFIX = "_rewrite"    # the copy being written
+BACKUP_SUFFIX = "_replaced"    # the old collection, between the two renames
+NORM_SAMPLE = 100
+NORM_TOLERANCE = 1e-3
+
+
+class ChromaVectorStore(Chroma, VectorStoreBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._write_lock = threading.Lock()
+        self._recover_rewrite()
+
+    def _collection_names(self) -> List[str]:
+        return [c if isinstance(c, str) else c.name for c in self._client.list_collections()]
+
+    def _recover_rewrite(self):
+        """Finish or undo a collection rewrite that was interrupted (e.g. by a crash)."""
+        name = self._collection.name
+        staging, backup = f"{name}{STAGING_SUFFIX}", f"{name}{BACKUP_SUFFIX}"
+        names = self._collection_names()
+        if backup in names:
+            # the old collection is only renamed away once the copy is complete
+            if staging in names:
+                if self._collection.count():
+                    logger.warning(f"Collection {name} and its rewrite {staging} both hold chunks; leaving them for inspection")
+                    return
+                # opening the store created an empty collection under the free name
+                self._client.delete_collection(name)
+                new = self._client.get_collection(staging)
+                new.modify(name=name)
+                self._collection = new
+                logger.info(f"Finished an interrupted rewrite of collection {name}")
+            self._client.delete_collection(backup)
+        elif staging in names:
+            # the copy itself was interrupted: the collection under the name is still complete
+            self._client.delete_collection(staging)
+            logger.info(f"Dropped the partial rewrite {staging} of collection {name}")
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        # Chroma.add_texts would upsert without the write lock, into a collection that may be mid-rewrite
+        texts = list(texts)
+        embeddings = self._embedding_function.embed_documents(texts) if texts else []
+        return self.add_embeddings(texts, embeddings, metadatas, ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        if not texts:
+            return []
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        if metadatas:
+            # Chroma rejects empty metadata dicts but takes None
+            metadatas = [metadata or None for metadata in metadatas] + [None] * (len(texts) - len(metadatas))
+        with self._write_lock:
+            self._collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+        return ids
+
+    def search_by_vectors(
+        self, embeddings: List[List[float]], k: int = 4, filter: Optional[dict] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        if not embeddings:
+            return []
+        collection = self._collection
+        query = dict(query_embeddings=embeddings, n_results=k, where=filter, include=["documents", "metadatas", "distances"])
+        try:
+            res = collection.query(**query)
+        except Exception:
+            if self._collection is collection:
+                raise
+            # a rewrite dropped the collection mid-search; its replacement holds the same chunks
+            res = self._collection.query(**query)
+        relevance = self._select_relevance_score_fn()
+        results = []
+        for ids, texts, metadatas, distances in zip(res["ids"], res["documents"], res["metadatas"], res["distances"]):
+            results.append([
+                (Document(id=chunk_id, page_content=text or "", metadata=metadata or {}), relevance(distance))
+                for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances)
+            ])
+        return results
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def dimensions(self) -> Optional[int]:
+        sample = self._collection.get(limit=1, include=["embeddings"])
+        embeddings = sample["embeddings"]
+        return len(embeddings[0]) if embeddings is not None and len(embeddings) else None
+
+    def has_unnormalized_vectors(self) -> bool:
+        # the oldest chunks come first, and those are the ones written before /api/embed
+        sample = self._collection.get(limit=NORM_SAMPLE, include=["embeddings"])["embeddings"]
+        if sample is None or not len(sample):
+            return False
+        norms = np.linalg.norm(np.asarray(sample, dtype=np.float32), axis=1)
+        return bool(np.any(np.abs(norms - 1.0) > NORM_TOLERANCE))
+
+    def normalize_vectors(self) -> int:
+        """Rewrite the collection with unit-length vectors (same directions, so no re-embedding)."""
+        with self._write_lock:
+            copied = self._rewrite_collection(q.normalize)
+        logger.info(f"Normalized {copied} vectors in collection {self._collection.name}")
+        return copied
+
+    def reduce_dimensions(self, dims: int):
+        """
+        A collection's dimension is fixed once it has vectors, so the chunks are copied
+        (truncated) into a new collection, which then replaces the old one under its name.
+        Writes wait for the copy; afterwards Chroma rejects vectors of the old size, so
+        stop uploads (or the API) first and restart it with EMBEDDING_DIMENSIONS set.
+        """
+        current = self.dimensions()
+        if current is None or dims == current:
+            return
+        if dims > current:
+            raise ValueError(f"Can't grow {current}-dim vectors to {dims}; re-embed the documents instead")
+        with self._write_lock:
+            copied = self._rewrite_collection(lambda vectors: q.truncate(np.asarray(vectors), dims))
+        logger.info(f"Reduced {copied} vectors in collection {self._collection.name} to {dims} dimensions")
+
+    def _rewrite_collection(self, transform: Callable = lambda vectors: vectors) -> int:
+        """Copy every chunk into a new collection and switch to it under the old name (write lock held)."""
+        old = self._collection
+        name = old.name
+        staging, backup = f"{name}{STAGING_SUFFIX}", f"{name}{BACKUP_SUFFIX}"
+        if staging in self._collection_names():
+            self._client.delete_collection(staging)  # a partial copy; the store was recovered when opened
+        new = self._client.create_collection(staging, metadata=old.metadata)
+        offset = 0
+        for batch in self._pages(["embeddings", "documents", "metadatas"]):
+            new.add(ids=batch["ids"], embeddings=transform(batch["embeddings"]), documents=batch["documents"], metadatas=batch["metadatas"])
+            offset += len(batch["ids"])
+        # renames keep collection ids, so searches already holding `old` still work
+        old.modify(name=backup)
+        new.modify(name=name)
+        self._collection = new  # searches move over before the old collection goes away
+        self._client.delete_collection(backup)
+        return offset
+
+    def _pages(self, include: List[str]):
+        offset = 0
+        while True:
+            batch = self._collection.get(limit=COPY_BATCH, offset=offset, include=include)
+            if not batch["ids"]:
+                return
+            yield batch
+            offset += len(batch["ids"])
+
+    def doc_chunk_counts(self) -> Dict[Optional[int], int]:
+        counts: Counter = Counter()
+        for batch in self._pages(["metadatas"]):
+            counts.update((metadata or {}).get("doc_id") for metadata in batch["metadatas"])
+        return dict(counts)
+
+    def delete_documents(self, doc_ids: List[int]) -> int:
+        if not doc_ids:
+            return 0
+        with self._write_lock:
+            ids = self._collection.get(where={"doc_id": {"$in": list(doc_ids)}}, include=[])["ids"]
+            if ids:
+                self._collection.delete(ids=ids)
+        return len(ids)
+
+    def disk_bytes(self) -> int:
+        return directory_size(self._persist_directory) if self._persist_directory else 0
+
+    @contextmanager
+    def paused_writes(self):
+        # upserts are on disk once they return (Chroma logs them to SQLite first)
+        with self._write_lock:
+            yield
+
+    def compact(self, vacuum: bool = False) -> Optional[int]:
+        with self._write_lock:
+            copied = self._rewrite_collection()
+            logger.info(f"Compacted collection {self._collection.name}: {copied} chunks rewritten")
+            database = os.path.join(self._persist_directory or "", "chroma.sqlite3")
+            if vacuum and os.path.exists(database):
+                # frees the pages of the dropped collection; readers wait on SQLite's lock meanwhile
+                db = sqlite3.connect(database, timeout=30)
+                try:
+                    db.execute("VACUUM")
+                finally:
+                    db.close()
+        return None
+
+    def set_search_ef(self, ef: int):
+        """Size of HNSW's candidate list at query time: higher is slower but finds more true neighbours."""
+        self._collection.modify(configuration={"hnsw": {"ef_search": ef}})
@@ -0,0 +1,100 @@
+"""
+Embeddings routed across a pool of Ollama embedding endpoints, in two priority lanes.
+
+* query lane  - ``embed_query`` / ``embed_queries``: sent straight to the least loaded
+  endpoint, never waits on ingestion.
+* ingest lane - ``embed_documents``: split into batches that are spread over the pool
+  (an endpoint's load is counted in texts, not requests, so one big batch weighs as
+  much as it costs), with at most ``embedding_ingest_concurrency`` batches in flight
+  per endpoint on average. Keep that below Ollama's OLLAMA_NUM_PARALLEL so a bulk
+  upload always leaves a free slot for interactive queries.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import httpx
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.config import settings
+from app.services import quantization as q
+from app.services import resilience
+from app.services.backend_pool import BackendPool, parse_urls
+from app.services.metrics import metrics
+from app.services.ollama_client import embedding_base_url
+
+logger = logging.getLogger(__name__)
+
+QUERY_LANE = "query"
+INGEST_LANE = "ingest"
+
+# Same instructions LangChain's OllamaEmbeddings prepends, so queries and passages stay comparable.
+QUERY_INSTRUCTION = "query: "
+PASSAGE_INSTRUCTION = "passage: "
+
+embedding_pool = BackendPool(
+    "ollama-embedding",
+    parse_urls(settings.ollama_embedding_urls, embedding_base_url()),
+    failure_threshold=settings.backend_failure_threshold,
+    ejection_seconds=settings.backend_ejection_seconds,
+    health_interval=settings.backend_health_interval_seconds,
+)
+
+# Every ingestion batch goes through this executor, which is what bounds the ingest lane.
+_ingest_executor = ThreadPoolExecutor(
+    max_workers=settings.embedding_ingest_concurrency * len(embedding_pool.endpoints),
+    thread_name_prefix="embed-ingest",
+)
+_http = httpx.Client(timeout=httpx.Timeout(120.0, connect=5.0))
+
+
+def _embed_on(base_url: str, texts: List[str]) -> List[List[float]]:
+    resp = _http.post(
+        f"{base_url}/api/embed",
+        timeout=httpx.Timeout(resilience.timeout_for("embeddings"), connect=5.0),
+        json={"model": settings.ollama_model, "input": texts, "keep_alive": settings.model_keep_alive},
+    )
+    resp.raise_for_status()
+    return resp.json()["embeddings"]
+
+
+def embed_batch(texts: List[str], lane: str) -> List[List[float]]:
+    """Embed one batch on the least loaded endpoint, weighting it by its size."""
+    metrics.inc("embedding_texts_total", len(texts), lane=lane)
+    start = time.monotonic()
+    vectors = embedding_pool.call(lambda url: _embed_on(url, texts), weight=len(texts))
+    metrics.observe("embedding_batch_seconds", time.monotonic() - start, lane=lane)
+    if settings.embedding_dimensions:
+        # same truncation at ingest and query time, so stored and query vectors match
+        return q.truncate(np.asarray(vectors), settings.embedding_dimensions).tolist()
+    return vectors
+
+
+def _embed_ingest_batch(texts: List[str]) -> List[List[float]]:
+    return embed_batch(texts, INGEST_LANE)
+
+
+class PooledOllamaEmbeddings(Embeddings):
+    """LangChain embeddings backed by the embedding pool (used by the Chroma store)."""
+
+    def __init__(self, batch_size: int = None):
+        self.batch_size = batch_size or settings.embedding_batch_size
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        inputs = [f"{PASSAGE_INSTRUCTION}{t}" for t in texts]
+        batches = [inputs[i:i + self.batch_size] for i in range(0, len(inputs), self.batch_size)]
+        results: List[List[float]] = []
+        for vectors in _ingest_executor.map(_embed_ingest_batch, batches):
+            results.extend(vectors)
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several questions in one call on the query lane."""
+        return embed_batch([f"{QUERY_INSTRUCTION}{t}" for t in texts], QUERY_LANE)
@@ -1,23 +1,14 @@
-import os
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Chroma
+import asyncio
+from typing import List, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from app.config import settings
+from app.services.vector_store import get_vector_store
 
-def get_chroma_client(persist_directory="./chroma_db"):
-    # create embeddings object using Ollama
-    embeddings = OllamaEmbeddings(
-        base_url=f"http://{settings.ollama_host}:{settings.ollama_port}",
-        model="nomic-embed-text"
-    )
-    vectordb = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
-    return vectordb
+def get_chroma_client(persist_directory=None):
+    # kept for existing callers; the store is now whichever backend is configured
+    return get_vector_store(persist_directory)
 
-async def embed_and_upsert_from_text(doc_id: int, text: str, metadata: dict):
-    """
-    Splits the text into chunks, creates embeddings and adds to Chroma.
-    metadata is arbitrary dict stored with records (e.g. {"doc_id": doc_id, "filename": "..."})
-    """
+def split_into_chunks(doc_id: int, text: str, metadata: dict) -> Tuple[List[str], List[dict], List[str]]:
+    """Split a document into chunk texts, metadatas and ids ("<doc_id>_<chunk_index>")."""
     # Use smaller chunk sizes for better retrieval accuracy
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=500,  # Reduced from 1000 for more specific chunks
@@ -25,7 +16,6 @@ async def embed_and_upsert_from_text(doc_id: int, text: str, metadata: dict):
         separators=["\n\n", "\n", ". ", " ", ""]
     )
     docs = text_splitter.split_text(text)
-    vectordb = get_chroma_client()
     # prepare list of texts with metadata
     texts = []
     metadatas = []
@@ -34,8 +24,32 @@ async def embed_and_upsert_from_text(doc_id: int, text: str, metadata: dict):
         if chunk.strip():  # Only add non-empty chunks
             texts.append(chunk)
             metadatas.append({**metadata, "chunk_index": i})
-            ids.append(f"{metadata.get('doc_id')}_{i}")
-    
+            ids.append(f"{metadata.get('doc_id', doc_id)}_{i}")
+    return texts, metadatas, ids
+
+async def embed_and_upsert_from_text(doc_id: int, text: str, metadata: dict):
+    """
+    Splits the text into chunks, creates embeddings and adds to Chroma.
+    metadata is arbitrary dict stored with records (e.g. {"doc_id": doc_id, "filename": "..."})
+    """
+    await embed_and_upsert_many([(doc_id, text, metadata)])
+
+async def embed_and_upsert_many(documents: List[Tuple[int, str, dict]]) -> List[int]:
+    """
+    Like embed_and_upsert_from_text for several documents at once: their chunks share
+    embedding batches and a single store upsert. Returns the chunk count per document.
+    """
+    texts, metadatas, ids, counts = [], [], [], []
+    for doc_id, text, metadata in documents:
+        doc_texts, doc_metadatas, doc_ids = split_into_chunks(doc_id, text, metadata)
+        texts += doc_texts
+        metadatas += doc_metadatas
+        ids += doc_ids
+        counts.append(len(doc_texts))
+
     # Use add_texts instead of add_documents for string inputs
     if texts:
-        vectordb.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+        vectordb = get_vector_store()
+        # embedding a large document takes a while; keep the event loop free for queries
+        await asyncio.to_thread(vectordb.add_texts, texts=texts, metadatas=metadatas, ids=ids)
+    return counts
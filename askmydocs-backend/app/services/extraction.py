@@ -0,0 +1,168 @@
+"""
+Text extraction for uploaded files, shared by the upload router and the bulk ingester.
+
+Extractors are registered per file suffix and yield the text of a document piece by
+piece (a PDF page at a time), so a sandboxed extraction that is cut short can still
+keep what it got (see ``extraction_sandbox``). New formats are added with
+``@register_extractor("ext")`` in a module listed in ``EXTRACTION_PLUGINS``; extractors
+must be module-level functions so they can be handed to the sandbox workers.
+
+Extraction is plain synchronous code over a file path. ``iter_sources`` walks a
+directory or unpacks an archive one member at a time.
+"""
+import importlib
+import os
+import shutil
+import tarfile
+import zipfile
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator
+
+from app.config import settings
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+ARCHIVE_SUFFIXES = (".zip",) + TAR_SUFFIXES
+
+# An extractor takes a file path and yields its text in pieces (e.g. one per page).
+Extractor = Callable[[str], Iterable[str]]
+EXTRACTORS: Dict[str, Extractor] = {}
+
+
+def register_extractor(*suffixes: str):
+    """Register the decorated function as the extractor for the given file suffixes."""
+    def decorator(fn: Extractor) -> Extractor:
+        for suffix in suffixes:
+            EXTRACTORS[suffix.lower().lstrip(".")] = fn
+        return fn
+    return decorator
+
+
+def file_suffix(filename: str) -> str:
+    return filename.split(".")[-1].lower()
+
+
+def is_supported(filename: str) -> bool:
+    return file_suffix(filename) in EXTRACTORS
+
+
+@register_extractor("txt", "md")
+def _extract_plain(path: str) -> Iterator[str]:
+    with open(path, mode="r", encoding="utf-8", errors="ignore") as f:
+        yield f.read()
+
+
+@register_extractor("pdf")
+def _extract_pdf(path: str) -> Iterator[str]:
+    # lightweight example: use PyPDF2 to extract text
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    for p in reader.pages:
+        yield p.extract_text() or ""
+
+
+class _HTMLText(HTMLParser):
+    SKIP = ("script", "style")
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        if not self._skipping and data.strip():
+            self.parts.append(data.strip())
+
+
+@register_extractor("html", "htm")
+def _extract_html(path: str) -> Iterator[str]:
+    parser = _HTMLText()
+    with open(path, mode="r", encoding="utf-8", errors="ignore") as f:
+        parser.feed(f.read())
+    yield "\n".join(parser.parts)
+
+
+def extract_pages(path: str, suffix: str) -> Iterable[str]:
+    """Text pieces of a file; unsupported types have none."""
+    extractor = EXTRACTORS.get(suffix)
+    return extractor(path) if extractor else ()
+
+
+def extract_text(path: str, suffix: str) -> str:
+    """Extract the text of a file in this process (no limits; see extraction_sandbox)."""
+    return "\n".join(extract_pages(path, suffix))
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def extract_file(path: str) -> str:
+    """Extract a file in this process, by the suffix of its name."""
+    return extract_text(path, file_suffix(os.path.basename(path)))
+
+
+@dataclass
+class SourceFile:
+    key: str        # path inside the directory or archive
+    filename: str
+    path: str       # local file to extract from
+    temporary: bool = False  # extracted from an archive into the scratch directory
+
+
+def _scratch_copy(stream, scratch_dir: str, index: int, name: str) -> str:
+    path = os.path.join(scratch_dir, f"{index}_{os.path.basename(name)}")
+    with open(path, "wb") as out:
+        shutil.copyfileobj(stream, out)
+    return path
+
+
+def iter_sources(source: str, scratch_dir: str, skip: Iterable[str] = ()) -> Iterator[SourceFile]:
+    """Yield the supported files of a directory, zip or tar archive, in a stable order.
+
+    Archive members are copied into ``scratch_dir`` one at a time as they are consumed;
+    files whose key is in ``skip`` are not even unpacked.
+    """
+    skip = set(skip)
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, source).replace(os.sep, "/")
+                if is_supported(name) and key not in skip:
+                    yield SourceFile(key, name, path)
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for index, info in enumerate(archive.infolist()):
+                if info.is_dir() or not is_supported(info.filename) or info.filename in skip:
+                    continue
+                with archive.open(info) as stream:
+                    path = _scratch_copy(stream, scratch_dir, index, info.filename)
+                yield SourceFile(info.filename, os.path.basename(info.filename), path, temporary=True)
+    elif source.lower().endswith(TAR_SUFFIXES):
+        # Streamed in member order, so compressed tarballs are read once.
+        with tarfile.open(source, "r:*") as archive:
+            for index, member in enumerate(archive):
+                if not member.isfile() or not is_supported(member.name) or member.name in skip:
+                    continue
+                path = _scratch_copy(archive.extractfile(member), scratch_dir, index, member.name)
+                yield SourceFile(member.name, os.path.basename(member.name), path, temporary=True)
+    else:
+        raise ValueError(f"{source} is not a directory, zip or tar archive")
+
+
+def _load_plugins():
+    for module in filter(None, (name.strip() for name in settings.extraction_plugins.split(","))):
+        importlib.import_module(module)
+
+
+_load_plugins()
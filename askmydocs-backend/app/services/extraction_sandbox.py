@@ -0,0 +1,158 @@
+"""
+Document extraction in isolated worker processes with resource limits.
+
+Every document is extracted in a fresh process forked from a small forkserver (which
+only has the extraction code loaded, not the API), with rlimits on CPU time and
+address space, and is killed if it runs past its wall-clock deadline. Extracted text
+is streamed back to the caller a page at a time, so when a limit is hit the pages
+already extracted are kept and the result says why it is incomplete. A runaway PDF
+costs one worker process, never the API worker.
+"""
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import resource
+    RLIMITS_AVAILABLE = True
+except ImportError:  # not on Windows; the wall-clock limit still applies
+    RLIMITS_AVAILABLE = False
+
+from app.config import settings
+from app.services.extraction import EXTRACTORS, Extractor, file_suffix
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PAGE = "page"
+DONE = "done"
+ERROR = "error"
+
+_context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+if _context.get_start_method() == "forkserver":
+    _context.set_forkserver_preload([__name__])
+
+_slots = threading.BoundedSemaphore(settings.extraction_max_workers)
+
+
+def set_max_workers(count: int):
+    """Change how many extraction workers may run at once (e.g. for a bulk load)."""
+    global _slots
+    _slots = threading.BoundedSemaphore(count)
+
+
+@dataclass
+class ExtractionResult:
+    text: str
+    complete: bool = True
+    error: Optional[str] = None  # why extraction stopped early (the text is what was salvaged)
+
+
+class CPULimitExceeded(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise CPULimitExceeded()
+
+
+def _worker(extractor: Extractor, path: str, cpu_seconds: int, memory_bytes: int, conn):
+    if RLIMITS_AVAILABLE:
+        if cpu_seconds:
+            # SIGXCPU at the soft limit lets us report it; the hard limit is the backstop.
+            signal.signal(signal.SIGXCPU, _on_cpu_limit)
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+        if memory_bytes:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    try:
+        for piece in extractor(path):
+            conn.send((PAGE, piece))
+        message = (DONE, None)
+    except CPULimitExceeded:
+        message = (ERROR, "CPU time limit exceeded")
+    except MemoryError:
+        message = (ERROR, "memory limit exceeded")
+    except Exception as e:
+        message = (ERROR, f"{type(e).__name__}: {e}")
+    try:
+        conn.send(message)
+    finally:
+        conn.close()
+
+
+def _exit_reason(exitcode: Optional[int]) -> str:
+    if exitcode is not None and exitcode < 0:
+        name = signal.Signals(-exitcode).name
+        if name == "SIGXCPU" or name == "SIGKILL":
+            return f"worker killed by {name} (CPU or memory limit)"
+        return f"worker killed by {name}"
+    return f"worker exited unexpectedly (code {exitcode})"
+
+
+def extract_sandboxed(
+    path: str,
+    suffix: Optional[str] = None,
+    cpu_seconds: Optional[int] = None,
+    memory_mb: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> ExtractionResult:
+    """Extract a file in a limited worker process; blocks, so call it from a thread."""
+    extractor = EXTRACTORS.get(suffix or file_suffix(path))
+    if extractor is None:
+        return ExtractionResult("")  # fallback: treat as binary -> no text
+    cpu_seconds = settings.extraction_cpu_seconds if cpu_seconds is None else cpu_seconds
+    memory_mb = settings.extraction_memory_mb if memory_mb is None else memory_mb
+    timeout = settings.extraction_timeout_seconds if timeout is None else timeout
+
+    pieces, error, complete = [], None, False
+    start = time.monotonic()
+    with _slots:
+        receiver, sender = _context.Pipe(duplex=False)
+        process = _context.Process(
+            target=_worker,
+            # the extractor is pickled by reference, so plugin modules are imported in the worker
+            args=(extractor, path, cpu_seconds, memory_mb * 2**20, sender),
+            name="extraction-worker",
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    error = f"timed out after {timeout:g}s"
+                    break
+                if not receiver.poll(remaining):
+                    continue
+                try:
+                    kind, value = receiver.recv()
+                except EOFError:
+                    process.join(1)
+                    error = _exit_reason(process.exitcode)
+                    break
+                if kind == PAGE:
+                    pieces.append(value)
+                elif kind == DONE:
+                    complete = True
+                    break
+                else:
+                    error = value
+                    break
+        finally:
+            receiver.close()
+            if process.is_alive():
+                process.kill()
+            process.join()
+
+    outcome = "ok" if complete else ("partial" if pieces else "failed")
+    metrics.inc("extraction_total", outcome=outcome)
+    metrics.observe("extraction_seconds", time.monotonic() - start)
+    if error:
+        logger.warning(f"Extraction of {path} stopped after {len(pieces)} pages: {error}")
+    return ExtractionResult("\n".join(pieces), complete, error)
@@ -0,0 +1,146 @@
+"""
+Hedged LLM requests.
+
+A busy Ollama shows up as a long wait before the first token (queued for an admission
+slot, or behind other prompts on the runner). With hedging on, a generation that has
+not produced a token within ``llm_hedge_delay_seconds`` is also sent to the alternate
+backend (``llm_hedge_backend``: OpenAI, or another endpoint of the generation pool).
+Whichever attempt streams a token first wins and the other is cancelled, which closes
+its connection so the backend stops generating. An attempt that fails before its first
+token hedges straight away instead of waiting out the delay.
+
+Only slow requests pay for a second generation; the hedge rate and which side won are
+in ``GET /metrics`` (``llm_hedges_total / llm_hedge_requests_total``).
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from app.config import settings
+from app.services import ollama_client, openai_client, resilience
+from app.services.admission import get_admission_controller
+from app.services.backend_pool import generation_pool
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "primary"
+ALTERNATE = "alternate"
+
+Stream = Callable[[], AsyncIterator[str]]
+
+
+class _Attempt:
+    """One backend's generation, reported on `ready` at its first token or when it ends."""
+
+    def __init__(self, role: str, backend: str, stream: Stream, ready: asyncio.Queue):
+        self.role = role
+        self.backend = backend
+        self.failed = False
+        self._ready = ready
+        self._reported = False
+        self.task = asyncio.create_task(self._run(stream))
+
+    def _report(self):
+        if not self._reported:
+            self._reported = True
+            self._ready.put_nowait(self)
+
+    async def _run(self, stream: Stream) -> str:
+        start = time.monotonic()
+        pieces: List[str] = []
+        try:
+            async for piece in stream():
+                if not pieces:
+                    metrics.observe("llm_first_token_seconds", time.monotonic() - start, backend=self.backend)
+                    self._report()
+                pieces.append(piece)
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            self.failed = not pieces
+            raise
+        finally:
+            self._report()
+        return "".join(pieces)
+
+
+async def hedged_generate(
+    primary: Tuple[str, Stream], alternate: Optional[Tuple[str, Stream]], delay: float
+) -> Tuple[str, str]:
+    """
+    Run `primary` (backend name, stream factory), hedging to `alternate` after `delay`
+    seconds without a first token. Returns (text, backend that answered).
+    """
+    ready: asyncio.Queue = asyncio.Queue()
+    attempts = [_Attempt(PRIMARY, *primary, ready)]
+    metrics.inc("llm_hedge_requests_total")
+    try:
+        try:
+            winner = await asyncio.wait_for(ready.get(), delay)
+        except asyncio.TimeoutError:
+            winner = None
+        if alternate is not None and (winner is None or winner.failed):
+            logger.info(f"No first token from {primary[0]} after {delay:g}s, hedging to {alternate[0]}")
+            metrics.inc("llm_hedges_total", backend=alternate[0])
+            attempts.append(_Attempt(ALTERNATE, *alternate, ready))
+            reported = 0 if winner is None else 1
+            while winner is None or (winner.failed and reported < len(attempts)):
+                winner = await ready.get()
+                reported += 1
+            metrics.inc("llm_hedge_wins_total", winner=winner.role, backend=winner.backend)
+        elif winner is None:
+            winner = attempts[0]
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.task.cancel()
+        return await winner.task, winner.backend
+    finally:
+        for attempt in attempts:
+            attempt.task.cancel()  # no-op once finished; stops the winner if we were cancelled
+
+
+def ollama_stream(prompt: str, system: str) -> Stream:
+    """A generation on the least busy pool endpoint, inside an Ollama admission slot."""
+    async def stream() -> AsyncIterator[str]:
+        with resilience.get_breaker("ollama").guard():  # an open circuit fails at once, so we hedge at once
+            async with get_admission_controller("ollama").slot():
+                with generation_pool.lease() as ep:
+                    async for piece in ollama_client.stream_generate(ep.url, prompt, system=system):
+                        yield piece
+    return stream
+
+
+def openai_stream(prompt: str, system: str) -> Stream:
+    async def stream() -> AsyncIterator[str]:
+        with resilience.get_breaker("openai").guard():
+            async with get_admission_controller("openai").slot():
+                async for piece in openai_client.stream_chat(prompt, system=system):
+                    yield piece
+    return stream
+
+
+async def openai_answer(prompt: str, system: str) -> Tuple[str, str]:
+    """The whole answer from OpenAI (used to fail over when Ollama is unavailable)."""
+    pieces = [piece async for piece in openai_stream(prompt, system)()]
+    return "".join(pieces).strip(), f"openai-{openai_client.OPENAI_MODEL}"
+
+
+def alternate_backend() -> Optional[str]:
+    backend = settings.llm_hedge_backend
+    if backend == "openai" and not openai_client.configured():
+        return None
+    if backend == "ollama" and len(generation_pool.endpoints) < 2:
+        return None  # a second request to the same endpoint would only queue behind the first
+    return backend if backend in ("openai", "ollama") else None
+
+
+async def hedged_answer(prompt: str, system: str) -> Tuple[str, str]:
+    """Answer on Ollama, hedging to the configured alternate backend. Returns (text, llm_used)."""
+    backend = alternate_backend()
+    streams = {"ollama": ollama_stream, "openai": openai_stream}
+    alternate = (backend, streams[backend](prompt, system)) if backend else None
+    text, used = await hedged_generate(("ollama", ollama_stream(prompt, system)), alternate, settings.llm_hedge_delay_seconds)
+    llm_used = f"openai-{openai_client.OPENAI_MODEL}" if used == "openai" else "ollama-llama3"
+    return text.strip(), llm_used
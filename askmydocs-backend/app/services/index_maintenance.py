@@ -0,0 +1,130 @@
+"""
+Vector index stats and online compaction.
+
+Stats break the store down by document and by owner (joined with the ``documents``
+table), report its size on disk and count orphaned chunks: chunks whose ``doc_id`` has
+no ``Document`` row any more (a database restored or reset without the store, rows
+removed by hand). Chunks stored without a ``doc_id`` are counted as untracked.
+
+Compaction rewrites the store without its dead entries (deleted rows for the NumPy
+store; deleted and overwritten HNSW entries for Chroma), optionally vacuuming SQLite
+too. It runs in a worker thread while queries keep being served; uploads wait for it.
+Orphaned chunks are removed first when asked to. Batch uploads store chunks before
+committing their ``Document`` rows, so only documents with an id at or below the
+highest committed one are treated as orphans, and orphan removal is best run while no
+upload is in progress.
+
+Snapshots (``app.services.snapshots``) share the maintenance lock, so a snapshot never
+copies a store that is being compacted.
+
+    GET  /admin/index/stats
+    POST /admin/index/compact?remove_orphans=true&vacuum=true
+    GET  /admin/index/snapshots
+    POST /admin/index/snapshots
+    python -m app.cli.index_maintenance stats | compact [--remove-orphans] [--vacuum]
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.crud import document_owners, max_document_id
+from app.services.metrics import metrics
+from app.services.snapshots import create_snapshot
+from app.services.vector_store import VectorStoreBackend, get_vector_store
+
+logger = logging.getLogger(__name__)
+
+_maintenance_lock = asyncio.Lock()
+
+
+def is_running() -> bool:
+    return _maintenance_lock.locked()
+
+
+async def _chunk_owners(db: AsyncSession, store: VectorStoreBackend):
+    """(chunks per document, owner per existing document, orphaned documents, untracked chunks)."""
+    counts = await asyncio.to_thread(store.doc_chunk_counts)
+    untracked = sum(n for doc_id, n in counts.items() if not isinstance(doc_id, int))
+    counts = {doc_id: n for doc_id, n in counts.items() if isinstance(doc_id, int)}
+    owners = await document_owners(db, sorted(counts))
+    newest = await max_document_id(db)
+    orphans = [doc_id for doc_id in counts if doc_id not in owners and doc_id <= newest]
+    return counts, owners, orphans, untracked
+
+
+async def index_stats(db: AsyncSession, store: Optional[VectorStoreBackend] = None, top: int = 50) -> Dict:
+    """Chunk counts per user and per document (the `top` largest), disk size and orphans."""
+    store = store or get_vector_store()
+    counts, owners, orphans, untracked = await _chunk_owners(db, store)
+
+    users: Dict[int, Dict] = {}
+    for doc_id, owner in owners.items():
+        user = users.setdefault(owner, {"user_id": owner, "documents": 0, "chunks": 0})
+        user["documents"] += 1
+        user["chunks"] += counts[doc_id]
+    largest = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top]
+    orphaned_chunks = sum(counts[doc_id] for doc_id in orphans)
+    disk_bytes = await asyncio.to_thread(store.disk_bytes)
+    chunks = sum(counts.values()) + untracked
+
+    metrics.set_gauge("vector_store_chunks", chunks)
+    metrics.set_gauge("vector_store_disk_bytes", disk_bytes)
+    metrics.set_gauge("vector_store_orphaned_chunks", orphaned_chunks)
+    stats = {
+        "backend": settings.vector_store_backend,
+        "chunks": chunks,
+        "documents": len(owners),
+        "dimensions": store.dimensions(),
+        "disk_bytes": disk_bytes,
+        "orphaned_documents": len(orphans),
+        "orphaned_chunks": orphaned_chunks,
+        "untracked_chunks": untracked,
+        "users": sorted(users.values(), key=lambda user: -user["chunks"]),
+        "largest_documents": [{"doc_id": doc_id, "user_id": owners.get(doc_id), "chunks": n} for doc_id, n in largest],
+    }
+    if hasattr(store, "index_status"):
+        stats["ann_index"] = store.index_status()
+    return stats
+
+
+async def compact_index(
+    db: AsyncSession, store: Optional[VectorStoreBackend] = None, remove_orphans: bool = False, vacuum: bool = False
+) -> Dict:
+    """Optionally delete orphaned chunks, then compact the store. One run at a time."""
+    store = store or get_vector_store()
+    async with _maintenance_lock:
+        start = time.monotonic()
+        bytes_before = await asyncio.to_thread(store.disk_bytes)
+        removed = 0
+        if remove_orphans:
+            _, _, orphans, _ = await _chunk_owners(db, store)
+            removed = await asyncio.to_thread(store.delete_documents, orphans)
+            if removed:
+                logger.info(f"Removed {removed} orphaned chunks of {len(orphans)} deleted documents")
+        dropped = await asyncio.to_thread(store.compact, vacuum)
+        bytes_after = await asyncio.to_thread(store.disk_bytes)
+        seconds = time.monotonic() - start
+
+    metrics.inc("vector_store_compactions_total")
+    metrics.observe("vector_store_compaction_seconds", seconds)
+    metrics.set_gauge("vector_store_disk_bytes", bytes_after)
+    logger.info(f"Vector store compacted in {seconds:.1f}s: {bytes_before} -> {bytes_after} bytes on disk")
+    return {
+        "orphaned_chunks_removed": removed,
+        "dropped_entries": dropped,
+        "disk_bytes_before": bytes_before,
+        "disk_bytes_after": bytes_after,
+        "seconds": round(seconds, 3),
+    }
+
+
+async def snapshot_index(store: Optional[VectorStoreBackend] = None) -> Dict:
+    """Snapshot the store online (uploads wait for the copy); returns the snapshot's manifest."""
+    store = store or get_vector_store()
+    async with _maintenance_lock:
+        manifest = await asyncio.to_thread(create_snapshot, store)
+    return {key: value for key, value in manifest.items() if key != "files"}
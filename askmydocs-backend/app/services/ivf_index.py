@@ -0,0 +1,162 @@
+"""
+Inverted-file (IVF) approximate nearest-neighbour index for the NumPy vector store.
+
+Rows are filed under the nearest of ``nlist`` k-means centroids; a query only scans the
+rows filed under its ``nprobe`` nearest centroids, so its cost is roughly
+``nprobe / nlist`` of an exact scan. ``nprobe`` is the recall/latency knob
+(``nprobe >= nlist`` is exact search again).
+
+New rows are filed under the existing centroids as they arrive, and deleted or
+overwritten rows are only unassigned, leaving stale list entries that searches skip.
+The store retrains and refiles everything in the background once the corpus has grown
+or churned enough (see ``NumpyVectorStore.rebuild_index``).
+
+Files, next to the store's matrices:
+
+* ``ivf_centroids.npy``   - float32 (nlist, dim) unit-length centroids
+* ``ivf_assignments.npy`` - int32 list id per store row, -1 when unassigned
+"""
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from app.services import quantization as q
+
+NONE = "none"
+IVF = "ivf"
+MODES = (NONE, IVF)
+
+UNASSIGNED = -1
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGNMENTS_FILE = "ivf_assignments.npy"
+
+# k-means is trained on a sample of this many rows per list; enough for stable
+# centroids without scanning the whole corpus every iteration.
+TRAIN_ROWS_PER_LIST = 32
+TRAIN_ITERATIONS = 10
+
+
+def default_nlist(rows: int) -> int:
+    """About 2 * sqrt(rows) lists, so lists and list count grow together."""
+    return max(1, min(rows, int(round(2 * np.sqrt(rows)))))
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by inner product) for every row, computed blockwise."""
+    out = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], q.BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + q.BLOCK_ROWS], dtype=np.float32)
+        out[start:start + q.BLOCK_ROWS] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(sample: np.ndarray, nlist: int, iterations: int = TRAIN_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over unit-length rows."""
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(sample, dtype=np.float32)
+    nlist = min(nlist, sample.shape[0])
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = ~np.bincount(labels, minlength=nlist).astype(bool)
+        # Reseed empty lists with random rows rather than letting them die.
+        sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+        centroids = q.normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, directory: str, centroids: np.ndarray, assignments: np.ndarray, size: int):
+        self.directory = directory
+        self.centroids = centroids
+        self.assignments = assignments
+        self._lock = threading.Lock()
+        self._lists: List[np.ndarray] = []
+        self._pending: List[List[int]] = [[] for _ in range(self.nlist)]
+        self._build_lists(size)
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def load(cls, directory: str, size: int, capacity: int, dim: int) -> Optional["IVFIndex"]:
+        """Open a saved index, or return None if it is missing or doesn't match the store."""
+        centroids_path = os.path.join(directory, CENTROIDS_FILE)
+        assignments_path = os.path.join(directory, ASSIGNMENTS_FILE)
+        if not (os.path.exists(centroids_path) and os.path.exists(assignments_path)):
+            return None
+        centroids = np.load(centroids_path)
+        assignments = open_memmap(assignments_path, mode="r+")
+        if centroids.ndim != 2 or centroids.shape[1] != dim or assignments.shape[0] != capacity:
+            return None
+        return cls(directory, centroids, assignments, size)
+
+    @classmethod
+    def create(cls, directory: str, centroids: np.ndarray, assignments: np.ndarray, size: int) -> "IVFIndex":
+        """Write a freshly built index and swap its files in."""
+        assignments_path = os.path.join(directory, ASSIGNMENTS_FILE)
+        centroids_path = os.path.join(directory, CENTROIDS_FILE)
+        stored = open_memmap(f"{assignments_path}.tmp", mode="w+", dtype=np.int32, shape=assignments.shape)
+        stored[:] = assignments
+        stored.flush()
+        with open(f"{centroids_path}.tmp", "wb") as f:
+            np.save(f, centroids)
+        os.replace(f"{assignments_path}.tmp", assignments_path)
+        os.replace(f"{centroids_path}.tmp", centroids_path)
+        return cls(directory, centroids, stored, size)
+
+    def _build_lists(self, size: int):
+        labels = np.asarray(self.assignments[:size])
+        rows = np.flatnonzero(labels != UNASSIGNED)
+        order = rows[np.argsort(labels[rows], kind="stable")]
+        bounds = np.searchsorted(labels[order], np.arange(self.nlist + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.nlist)]
+
+    def grow(self, capacity: int):
+        path = os.path.join(self.directory, ASSIGNMENTS_FILE)
+        grown = open_memmap(f"{path}.tmp", mode="w+", dtype=np.int32, shape=(capacity,))
+        grown[:self.assignments.shape[0]] = self.assignments
+        grown[self.assignments.shape[0]:] = UNASSIGNED
+        grown.flush()
+        os.replace(f"{path}.tmp", path)
+        self.assignments = grown
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        """File (or re-file) rows under their nearest centroid."""
+        labels = assign(vectors, self.centroids)
+        self.assignments[rows] = labels
+        self.assignments.flush()
+        with self._lock:
+            for row, label in zip(rows.tolist(), labels.tolist()):
+                self._pending[label].append(row)
+
+    def remove(self, rows: np.ndarray):
+        self.assignments[rows] = UNASSIGNED
+        self.assignments.flush()
+
+    def nearest_lists(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        return q.top_k(self.centroids @ query, nprobe)
+
+    def probe(self, lists: np.ndarray) -> np.ndarray:
+        """Sorted, de-duplicated rows currently filed under the given lists."""
+        parts = []
+        with self._lock:
+            for i in lists.tolist():
+                if self._pending[i]:
+                    self._lists[i] = np.concatenate([self._lists[i], np.asarray(self._pending[i], dtype=np.int64)])
+                    self._pending[i] = []
+                rows = self._lists[i]
+                # Entries whose row was since deleted or re-filed elsewhere are stale.
+                parts.append(rows[self.assignments[rows] == i])
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
+
+    def flush(self):
+        self.assignments.flush()
@@ -0,0 +1,161 @@
+"""
+Keeps the Ollama generation and embedding models resident so that no request pays
+for loading them from disk.
+
+The manager warms every configured model at startup and then periodically re-touches
+them, which resets Ollama's keep-alive timer and reloads anything that was evicted
+(e.g. after an Ollama restart). Its state backs the /health/ready endpoint: with
+several endpoints per pool, the instance is ready once each kind of model (generation
+and embedding) is warm on at least one of them, since the pools route around the rest;
+cold endpoints are listed in the readiness body and re-warmed on every poll.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services import ollama_client, prompts
+from app.services.backend_pool import generation_pool
+from app.services.embedding_pool import embedding_pool
+
+logger = logging.getLogger(__name__)
+
+GENERATION = "generation"
+EMBEDDING = "embedding"
+
+# How often resident state is polled; cold models are reloaded on the next poll.
+STATUS_POLL_SECONDS = 15
+
+
+@dataclass
+class ModelState:
+    name: str
+    kind: str
+    base_url: str
+    loaded: bool = False
+    last_loaded_at: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def as_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "base_url": self.base_url,
+            "loaded": self.loaded,
+            "last_loaded_at": self.last_loaded_at,
+            "last_error": self.last_error,
+        }
+
+
+class ModelManager:
+    def __init__(self, models: List[ModelState], keep_alive: str, interval: float, enabled: bool = True):
+        self.models = models
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls) -> "ModelManager":
+        # One state per endpoint: each is warmed, though serving needs only one per kind.
+        models = [ModelState(settings.ollama_llm_model, GENERATION, url) for url in generation_pool.urls]
+        models += [ModelState(settings.ollama_model, EMBEDDING, url) for url in embedding_pool.urls]
+        return cls(
+            models,
+            keep_alive=settings.model_keep_alive,
+            interval=settings.model_keepalive_interval_seconds,
+            enabled=settings.model_warmup_enabled,
+        )
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _load(self, model: ModelState):
+        try:
+            if model.kind == GENERATION:
+                await ollama_client.load_generation_model(model.base_url, model.name, self.keep_alive)
+                if not model.loaded:
+                    await self._prime(model)
+            else:
+                await ollama_client.load_embedding_model(model.base_url, model.name, self.keep_alive)
+            if not model.loaded:
+                logger.info(f"Model {model.name} is loaded on {model.base_url}")
+            model.loaded = True
+            model.last_loaded_at = time.time()
+            model.last_error = None
+        except Exception as e:
+            model.loaded = False
+            model.last_error = str(e)
+            logger.warning(f"Failed to load model {model.name} on {model.base_url}: {e}")
+
+    async def _prime(self, model: ModelState):
+        """Put the shared instruction prefix in the model's prompt cache (best effort)."""
+        try:
+            await ollama_client.prime_prompt_prefix(model.base_url, model.name, prompts.GROUNDED_INSTRUCTIONS, self.keep_alive)
+        except Exception as e:
+            logger.warning(f"Could not prime the prompt prefix of {model.name} on {model.base_url}: {e}")
+
+    async def refresh(self):
+        """Touch every model: resets its keep-alive timer and reloads it if it was evicted."""
+        await asyncio.gather(*(self._load(m) for m in self.models))
+
+    async def check_resident(self):
+        """Mark models that Ollama has unloaded behind our back as cold."""
+        by_url: Dict[str, List[ModelState]] = {}
+        for m in self.models:
+            by_url.setdefault(m.base_url, []).append(m)
+        for base_url, models in by_url.items():
+            try:
+                running = set(await ollama_client.list_running_models(base_url))
+            except Exception as e:
+                for m in models:
+                    m.loaded = False
+                    m.last_error = str(e)
+                continue
+            for m in models:
+                if ollama_client.normalize_model_name(m.name) not in running:
+                    m.loaded = False
+
+    async def _run(self):
+        await self.refresh()
+        last_touch = time.monotonic()
+        while True:
+            await asyncio.sleep(min(self.interval, STATUS_POLL_SECONDS))
+            await self.check_resident()
+            if self.cold() or time.monotonic() - last_touch >= self.interval:
+                await self.refresh()
+                last_touch = time.monotonic()
+
+    def cold(self) -> List[ModelState]:
+        return [m for m in self.models if not m.loaded]
+
+    def is_ready(self) -> bool:
+        """Each kind of model is warm on at least one endpoint."""
+        if not self.enabled:
+            return True
+        kinds = {m.kind for m in self.models}
+        return all(any(m.loaded for m in self.models if m.kind == kind) for kind in kinds)
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.is_ready(),
+            "degraded": self.enabled and bool(self.cold()),
+            "warmup_enabled": self.enabled,
+            "cold_endpoints": [{"kind": m.kind, "base_url": m.base_url, "last_error": m.last_error} for m in self.cold()],
+            "models": [m.as_dict() for m in self.models],
+        }
+
+
+model_manager = ModelManager.from_settings()
@@ -0,0 +1,725 @@
+"""
+In-process NumPy vector store with memory-mapped persistence and optional quantized search.
+
+Layout of ``persist_directory``:
+
+* ``vectors.npy`` - float32 (capacity, dim) matrix of unit-length embeddings
+* ``codes.npy`` / ``scales.npy`` - the quantized copy searched first (float16 or int8)
+* ``alive.npy`` - one flag per row; deleted and overwritten rows are cleared
+* ``chunks.sqlite3`` - chunk id, text, metadata and (indexed) ``doc_id`` per matrix row,
+  plus store metadata
+
+All arrays are opened with ``open_memmap``, so startup is zero-copy: the OS pages the
+matrix in as it is searched. Capacity grows by doubling, so appends don't rewrite it.
+
+Queries are batched: one matrix product scores every query at once and top-k is
+selected with argpartition. Search is cosine similarity. In a quantized mode only the codes are scanned; the
+float32 rows of the best ``k * rescore_factor`` candidates are then read from disk to
+re-score them exactly, so the float matrix never has to be resident.
+
+With ``ann="ivf"`` an inverted-file index (see ``ivf_index``) is built once the store
+holds ``ann_min_rows`` chunks, and queries only scan the ``nprobe`` nearest lists
+instead of every row. Rows are filed into it as they are added; it is retrained and
+compacted by a background rebuild when the corpus has grown by ``rebuild_growth`` or
+enough rows have been deleted or overwritten since the last build.
+
+Deleted rows are only dropped by ``compact()``, which rewrites the live rows into new
+files while searches continue on the old ones; writes wait for it.
+
+Searches can be restricted to some documents with a Chroma-style ``{"doc_id": ...}``
+filter (a value, ``$eq`` or ``$in``). The filter is resolved to matrix rows through the
+``doc_id`` index first and only those rows are scored, so a narrowed search is cheaper
+than a full one rather than a full one with hits thrown away.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from numpy.lib.format import open_memmap
+
+from app.services import ivf_index as ivf
+from app.services import quantization as q
+from app.services.vector_store import VectorStoreBackend, directory_size
+
+logger = logging.getLogger(__name__)
+
+MIN_CAPACITY = 1024
+SQLITE_MAX_VARIABLES = 900
+# Rebuild the IVF index once this fraction of the rows it was built over went stale.
+STALE_REBUILD_FRACTION = 0.25
+FILTER_KEY = "doc_id"
+
+
+def _chunked(items: List, size: int = SQLITE_MAX_VARIABLES) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _filter_values(filter: dict) -> List[Any]:
+    """The doc_id values a filter allows; only doc_id equality and $in are supported."""
+    if set(filter) != {FILTER_KEY}:
+        raise NotImplementedError(f"The NumPy vector store can only filter on {FILTER_KEY!r}, got {filter!r}")
+    condition = filter[FILTER_KEY]
+    if not isinstance(condition, dict):
+        return [condition]
+    if set(condition) == {"$eq"}:
+        return [condition["$eq"]]
+    if set(condition) == {"$in"}:
+        return list(condition["$in"])
+    raise NotImplementedError(f"Unsupported {FILTER_KEY} filter {condition!r}, expected a value, $eq or $in")
+
+
+class NumpyVectorStore(VectorStoreBackend):
+    def __init__(
+        self,
+        persist_directory: str,
+        embedding_function: Embeddings,
+        quantization: str = q.NONE,
+        rescore_factor: int = 4,
+        ann: str = ivf.NONE,
+        nlist: int = 0,
+        nprobe: int = 16,
+        ann_min_rows: int = 100000,
+        rebuild_growth: float = 2.0,
+    ):
+        if quantization not in q.MODES:
+            raise ValueError(f"Unknown quantization mode {quantization!r}, expected one of {q.MODES}")
+        if ann not in ivf.MODES:
+            raise ValueError(f"Unknown ANN index {ann!r}, expected one of {ivf.MODES}")
+        self.persist_directory = persist_directory
+        self._embedding = embedding_function
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self.ann = ann
+        self.nlist = nlist  # 0 = sized from the corpus at each build
+        self.nprobe = nprobe
+        self.ann_min_rows = ann_min_rows
+        self.rebuild_growth = rebuild_growth
+        self._lock = threading.RLock()
+        # Serializes writers, so compaction can copy the live rows without the search lock.
+        self._write_lock = threading.Lock()
+
+        os.makedirs(persist_directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(persist_directory, "chunks.sqlite3"), check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT,
+                doc_id INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        if "doc_id" not in [column for _, column, *_ in self._db.execute("PRAGMA table_info(chunks)")]:
+            # stores created before filters were supported: backfill from the metadata
+            self._db.execute("ALTER TABLE chunks ADD COLUMN doc_id INTEGER")
+            self._db.execute("UPDATE chunks SET doc_id = json_extract(metadata, '$.doc_id')")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_chunks_doc_id ON chunks (doc_id)")
+        self._db.commit()
+        self.dim: Optional[int] = None
+        self._size = 0
+        self._capacity = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ivf: Optional[ivf.IVFIndex] = None
+        self._ivf_built_rows = 0
+        self._ivf_stale = 0
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._rebuild_rows: Optional[List[np.ndarray]] = None
+        self._writes_paused = False
+        self._epoch = 0  # bumped when compaction renumbers rows
+        self._load()
+
+    # ------------------------------------------------------------------ persistence
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_directory, name)
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(k, str(v)) for k, v in values.items()],
+        )
+
+    def _load(self):
+        dim = self._get_meta("dim")
+        if dim is None:
+            return
+        self.dim = int(dim)
+        self._size = int(self._get_meta("size") or 0)
+        self._vectors = open_memmap(self._path("vectors.npy"), mode="r+")
+        self._capacity = self._vectors.shape[0]
+        self._load_alive()
+        self._load_codes()
+        self._load_ivf()
+
+    def _load_codes(self):
+        if self.quantization == q.NONE:
+            return
+        stored_mode = self._get_meta("quantization")
+        if stored_mode == self.quantization and os.path.exists(self._path("codes.npy")):
+            self._codes = open_memmap(self._path("codes.npy"), mode="r+")
+            if self.quantization == q.INT8:
+                self._scales = open_memmap(self._path("scales.npy"), mode="r+")
+        else:
+            logger.info(f"Re-encoding {self._size} vectors as {self.quantization}")
+            self._codes, self._scales = self._new_code_files(self._capacity)
+            self._encode_rows(0, self._size)
+            self._set_meta(quantization=self.quantization)
+            self._db.commit()
+
+    def _load_ivf(self):
+        if self.ann != ivf.IVF:
+            return
+        self._ivf = ivf.IVFIndex.load(self.persist_directory, self._size, self._capacity, self.dim)
+        if self._ivf is None:
+            self._maybe_rebuild()
+            return
+        self._ivf_built_rows = int(self._get_meta("ivf_built_rows") or 0)
+        # Rows written after the index was last flushed (e.g. a crash mid-upsert).
+        missing = np.flatnonzero(np.asarray(self._alive[:self._size]) & (np.asarray(self._ivf.assignments[:self._size]) == ivf.UNASSIGNED))
+        if len(missing):
+            logger.info(f"Filing {len(missing)} unindexed rows into the IVF index")
+            self._ivf.add(missing, np.asarray(self._vectors[missing]))
+        self._maybe_rebuild()
+
+    def _load_alive(self):
+        path = self._path("alive.npy")
+        live = self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        if os.path.exists(path):
+            self._alive = open_memmap(path, mode="r+")
+            if self._alive.shape[0] == self._capacity and int(self._alive.sum()) == live:
+                return
+        # Missing or out of step with SQLite (e.g. a crash between the two writes): rebuild.
+        logger.info(f"Rebuilding row flags for {live} chunks")
+        self._alive = open_memmap(path, mode="w+", dtype=bool, shape=(self._capacity,))
+        rows = np.fromiter((r for (r,) in self._db.execute("SELECT row FROM chunks")), dtype=np.int64)
+        self._alive[rows] = True
+        self._alive.flush()
+
+    def _new_code_files(self, capacity: int, suffix: str = "") -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        if self.quantization == q.NONE:
+            return None, None
+        codes = open_memmap(self._path(f"codes.npy{suffix}"), mode="w+", dtype=q.code_dtype(self.quantization), shape=(capacity, self.dim))
+        scales = None
+        if self.quantization == q.INT8:
+            scales = open_memmap(self._path(f"scales.npy{suffix}"), mode="w+", dtype=np.float32, shape=(capacity,))
+        return codes, scales
+
+    def _encode_rows(self, start: int, stop: int):
+        for lo in range(start, stop, q.BLOCK_ROWS):
+            hi = min(stop, lo + q.BLOCK_ROWS)
+            codes, scales = q.quantize(np.asarray(self._vectors[lo:hi]), self.quantization)
+            self._codes[lo:hi] = codes
+            if scales is not None:
+                self._scales[lo:hi] = scales
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, MIN_CAPACITY)
+        # Grow into new files and swap them in; readers holding the old maps keep working.
+        vectors = open_memmap(self._path("vectors.npy.tmp"), mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        codes, scales = self._new_code_files(capacity, suffix=".tmp")
+        if self._size:
+            vectors[:self._size] = self._vectors[:self._size]
+            if codes is not None:
+                codes[:self._size] = self._codes[:self._size]
+            if scales is not None:
+                scales[:self._size] = self._scales[:self._size]
+        for arr, name in ((vectors, "vectors.npy"), (codes, "codes.npy"), (scales, "scales.npy")):
+            if arr is not None:
+                arr.flush()
+                os.replace(self._path(f"{name}.tmp"), self._path(name))
+        alive = open_memmap(self._path("alive.npy.tmp"), mode="w+", dtype=bool, shape=(capacity,))
+        alive[:self._capacity] = self._alive
+        alive.flush()
+        os.replace(self._path("alive.npy.tmp"), self._path("alive.npy"))
+        if self._ivf is not None:
+            self._ivf.grow(capacity)
+        self._vectors, self._codes, self._scales, self._alive = vectors, codes, scales, alive
+        self._capacity = capacity
+
+    # ------------------------------------------------------------------ writes
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        embeddings = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas, ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Upsert pre-computed embeddings; existing ids are overwritten in place."""
+        if not texts:
+            return []
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = q.normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._write_lock, self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_meta(dim=self.dim, quantization=self.quantization)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store ({self.dim})")
+
+            existing: Dict[str, int] = {}
+            for chunk in _chunked(ids):
+                marks = ",".join("?" * len(chunk))
+                existing.update(self._db.execute(f"SELECT id, row FROM chunks WHERE id IN ({marks})", chunk).fetchall())
+
+            # Last occurrence of an id in the batch wins, like Chroma's upsert.
+            latest = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            order = sorted(latest.values())
+            rows = []
+            next_row = self._size
+            for i in order:
+                row = existing.get(ids[i])
+                if row is None:
+                    row, next_row = next_row, next_row + 1
+                rows.append(row)
+
+            self._ensure_capacity(next_row)
+            rows_arr = np.asarray(rows, dtype=np.int64)
+            batch = vectors[order]
+            self._vectors[rows_arr] = batch
+            if self._codes is not None:
+                codes, scales = q.quantize(batch, self.quantization)
+                self._codes[rows_arr] = codes
+                if scales is not None:
+                    self._scales[rows_arr] = scales
+            self._flush()
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document, metadata, doc_id) VALUES (?, ?, ?, ?, ?)",
+                [(row, ids[i], texts[i], json.dumps(metadatas[i]), metadatas[i].get(FILTER_KEY)) for row, i in zip(rows, order)],
+            )
+            self._size = next_row
+            self._set_meta(size=self._size)
+            self._db.commit()
+            self._alive[rows_arr] = True
+            self._alive.flush()
+
+            if self._ivf is not None:
+                self._ivf_stale += len(existing)
+                self._ivf.add(rows_arr, batch)
+            if self._rebuild_rows is not None:
+                self._rebuild_rows.append(rows_arr)
+            self._maybe_rebuild()
+        return ids
+
+    def _flush(self):
+        for arr in (self._vectors, self._codes, self._scales, self._alive):
+            if arr is not None:
+                arr.flush()
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._write_lock, self._lock:
+            rows = []
+            for chunk in _chunked(list(ids)):
+                marks = ",".join("?" * len(chunk))
+                rows += [r for (r,) in self._db.execute(f"SELECT row FROM chunks WHERE id IN ({marks})", chunk)]
+                self._db.execute(f"DELETE FROM chunks WHERE id IN ({marks})", chunk)
+            self._db.commit()
+            rows_arr = np.asarray(rows, dtype=np.int64)
+            self._alive[rows_arr] = False
+            self._alive.flush()
+            if self._ivf is not None:
+                self._ivf_stale += len(rows)
+                self._ivf.remove(rows_arr)
+            self._maybe_rebuild()
+        return True
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._alive[:self._size].sum())
+
+    def dimensions(self) -> Optional[int]:
+        return self.dim
+
+    def has_unnormalized_vectors(self) -> bool:
+        return False  # add_embeddings normalizes every vector
+
+    def normalize_vectors(self) -> int:
+        return 0
+
+    def doc_chunk_counts(self) -> Dict[Optional[int], int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT doc_id, COUNT(*) FROM chunks GROUP BY doc_id").fetchall())
+
+    def delete_documents(self, doc_ids: List[int]) -> int:
+        ids = []
+        with self._lock:
+            for chunk in _chunked(list(doc_ids)):
+                marks = ",".join("?" * len(chunk))
+                ids += [i for (i,) in self._db.execute(f"SELECT id FROM chunks WHERE doc_id IN ({marks})", chunk)]
+        self.delete(ids)
+        return len(ids)
+
+    def disk_bytes(self) -> int:
+        return directory_size(self.persist_directory)
+
+    def reduce_dimensions(self, dims: int):
+        """Truncate the stored vectors to `dims` components (renormalized); codes and the IVF index follow."""
+        with self._write_lock, self._lock:
+            if self.dim is None or dims == self.dim:
+                return
+            if dims > self.dim:
+                raise ValueError(f"Can't grow {self.dim}-dim vectors to {dims}; re-embed the documents instead")
+            if self._rebuild_thread is not None:
+                raise RuntimeError("An IVF rebuild is running; try again once it has finished")
+            start = time.monotonic()
+            vectors = open_memmap(self._path("vectors.npy.tmp"), mode="w+", dtype=np.float32, shape=(self._capacity, dims))
+            for lo in range(0, self._size, q.BLOCK_ROWS * 16):
+                hi = min(self._size, lo + q.BLOCK_ROWS * 16)
+                vectors[lo:hi] = q.truncate(self._vectors[lo:hi], dims)
+            vectors.flush()
+            os.replace(self._path("vectors.npy.tmp"), self._path("vectors.npy"))
+            self._vectors, self.dim = vectors, dims
+
+            if self.quantization != q.NONE:
+                codes, scales = self._new_code_files(self._capacity, suffix=".tmp")
+                self._codes, self._scales = codes, scales
+                self._encode_rows(0, self._size)
+                for arr, name in ((codes, "codes.npy"), (scales, "scales.npy")):
+                    if arr is not None:
+                        arr.flush()
+                        os.replace(self._path(f"{name}.tmp"), self._path(name))
+            self._set_meta(dim=dims)
+            self._db.commit()
+            logger.info(f"Reduced {self._size} vectors to {dims} dimensions ({time.monotonic() - start:.1f}s)")
+
+            # the centroids have the old size: retrain (searches are exact until then)
+            self._ivf, self._ivf_built_rows, self._ivf_stale = None, 0, 0
+            self._maybe_rebuild()
+
+    # ------------------------------------------------------------------ maintenance
+
+    @contextmanager
+    def paused_writes(self):
+        """Hold off writers and IVF rebuilds (which write the index files); searches continue."""
+        with self._write_lock:
+            self._writes_paused = True
+            try:
+                thread = self._rebuild_thread
+                if thread is not None:
+                    thread.join()
+                with self._lock:
+                    if self.dim is not None:  # nothing is mapped before the first write
+                        self._flush()
+                    if self._ivf is not None:
+                        self._ivf.flush()
+                yield
+            finally:
+                self._writes_paused = False
+
+    def compact(self, vacuum: bool = False) -> int:
+        """Rewrite the live rows contiguously into right-sized files; returns the rows dropped.
+
+        Only writers are held off while the rows are copied; searches keep reading the
+        current files and are paused just for the swap (renumbering rows in SQLite and
+        replacing the files). With `vacuum`, SQLite is also vacuumed during the swap.
+        """
+        with self.paused_writes():  # also lets a running IVF rebuild (on the current row numbers) finish
+            with self._lock:
+                size, capacity = self._size, self._capacity
+                vectors, codes, scales = self._vectors, self._codes, self._scales
+                live = np.flatnonzero(np.asarray(self._alive[:size]))
+            dropped = size - len(live)
+            new_capacity = max(MIN_CAPACITY, len(live) * 5 // 4)  # headroom for the next appends
+            if self.dim is None or (dropped == 0 and new_capacity >= capacity):
+                if vacuum:
+                    with self._lock:
+                        self._db.execute("VACUUM")
+                return 0
+
+            start = time.monotonic()
+            new_vectors = open_memmap(self._path("vectors.npy.tmp"), mode="w+", dtype=np.float32, shape=(new_capacity, self.dim))
+            new_codes, new_scales = self._new_code_files(new_capacity, suffix=".tmp")
+            for lo in range(0, len(live), q.BLOCK_ROWS * 16):
+                rows = live[lo:lo + q.BLOCK_ROWS * 16]
+                new_vectors[lo:lo + len(rows)] = vectors[rows]
+                if new_codes is not None:
+                    new_codes[lo:lo + len(rows)] = codes[rows]
+                if new_scales is not None:
+                    new_scales[lo:lo + len(rows)] = scales[rows]
+            alive = open_memmap(self._path("alive.npy.tmp"), mode="w+", dtype=bool, shape=(new_capacity,))
+            alive[:len(live)] = True
+            for arr in (new_vectors, new_codes, new_scales, alive):
+                if arr is not None:
+                    arr.flush()
+
+            with self._lock:
+                # Ascending order: each row's new number is free by the time it is taken.
+                self._db.executemany(
+                    "UPDATE chunks SET row = ? WHERE row = ?",
+                    [(new, old) for new, old in enumerate(live.tolist()) if new != old],
+                )
+                self._set_meta(size=len(live))
+                self._db.commit()
+                for arr, name in ((new_vectors, "vectors.npy"), (new_codes, "codes.npy"), (new_scales, "scales.npy"), (alive, "alive.npy")):
+                    if arr is not None:
+                        os.replace(self._path(f"{name}.tmp"), self._path(name))
+                if self._ivf is not None:
+                    assignments = np.full(new_capacity, ivf.UNASSIGNED, dtype=np.int32)
+                    assignments[:len(live)] = self._ivf.assignments[live]
+                    self._ivf = ivf.IVFIndex.create(self.persist_directory, self._ivf.centroids, assignments, len(live))
+                self._vectors, self._codes, self._scales, self._alive = new_vectors, new_codes, new_scales, alive
+                self._size, self._capacity = len(live), new_capacity
+                self._epoch += 1
+                if vacuum:
+                    self._db.execute("VACUUM")
+            logger.info(f"Compacted vector store: dropped {dropped} rows, {len(live)} kept ({time.monotonic() - start:.1f}s)")
+            return dropped
+
+    # ------------------------------------------------------------------ ANN index
+
+    def _maybe_rebuild(self):
+        """Start a background rebuild when the index is missing, outgrown or too stale (lock held)."""
+        if self.ann != ivf.IVF or self._rebuild_thread is not None:
+            return
+        live = int(self._alive[:self._size].sum())
+        if self._ivf is None:
+            due = live >= self.ann_min_rows
+        else:
+            due = (
+                live >= self._ivf_built_rows * self.rebuild_growth
+                or self._ivf_stale >= self._ivf_built_rows * STALE_REBUILD_FRACTION
+            )
+        if due:
+            self.rebuild_index(wait=False)
+
+    def rebuild_index(self, wait: bool = True):
+        """Retrain the IVF centroids and refile every live row, dropping stale entries.
+
+        Searches keep using the current index (or exact search) until the new one is
+        swapped in; rows written meanwhile are refiled into it before the swap.
+        """
+        with self._lock:
+            if self._writes_paused:
+                logger.info("Not rebuilding the IVF index while writes are paused for maintenance")
+                return
+            if self._rebuild_thread is None:
+                self._rebuild_thread = threading.Thread(target=self._rebuild, name="ivf-rebuild", daemon=True)
+                self._rebuild_rows = []
+                self._rebuild_thread.start()
+            thread = self._rebuild_thread
+        if wait:
+            thread.join()
+
+    def _rebuild(self):
+        try:
+            with self._lock:
+                size, vectors = self._size, self._vectors
+                live_rows = np.flatnonzero(np.asarray(self._alive[:size]))
+            if not len(live_rows):
+                return
+
+            start = time.monotonic()
+            nlist = min(self.nlist or ivf.default_nlist(len(live_rows)), len(live_rows))
+            rng = np.random.default_rng(len(live_rows))
+            train_size = min(len(live_rows), nlist * ivf.TRAIN_ROWS_PER_LIST)
+            sample = np.sort(rng.choice(live_rows, train_size, replace=False))
+            centroids = ivf.train_centroids(np.asarray(vectors[sample]), nlist)
+
+            labels = np.full(size, ivf.UNASSIGNED, dtype=np.int32)
+            for lo in range(0, len(live_rows), q.BLOCK_ROWS * 16):
+                rows = live_rows[lo:lo + q.BLOCK_ROWS * 16]
+                labels[rows] = ivf.assign(np.asarray(vectors[rows]), centroids)
+
+            with self._lock:
+                assignments = np.full(self._capacity, ivf.UNASSIGNED, dtype=np.int32)
+                assignments[:size] = labels
+                index = ivf.IVFIndex.create(self.persist_directory, centroids, assignments, size)
+                # Catch up with writes that happened while we were training.
+                written = np.unique(np.concatenate(self._rebuild_rows)) if self._rebuild_rows else np.empty(0, dtype=np.int64)
+                written = written[self._alive[written]]
+                if len(written):
+                    index.add(written, np.asarray(self._vectors[written]))
+                deleted = live_rows[~self._alive[live_rows]]
+                if len(deleted):
+                    index.remove(deleted)
+                self._ivf = index
+                self._ivf_built_rows = int(self._alive[:self._size].sum())
+                self._ivf_stale = 0
+                self._set_meta(ivf_built_rows=self._ivf_built_rows)
+                self._db.commit()
+            logger.info(f"Built IVF index: {self._ivf_built_rows} rows in {nlist} lists ({time.monotonic() - start:.1f}s)")
+        except Exception as e:
+            logger.error(f"IVF index rebuild failed: {e}")
+        finally:
+            with self._lock:
+                self._rebuild_thread = None
+                self._rebuild_rows = None
+
+    def index_status(self) -> dict:
+        with self._lock:
+            return {
+                "ann": self.ann,
+                "built": self._ivf is not None,
+                "nlist": self._ivf.nlist if self._ivf is not None else 0,
+                "nprobe": self.nprobe,
+                "built_rows": self._ivf_built_rows,
+                "stale_rows": self._ivf_stale,
+                "rebuilding": self._rebuild_thread is not None,
+            }
+
+    # ------------------------------------------------------------------ search
+
+    def _filter_rows(self, filter: dict) -> np.ndarray:
+        """Matrix rows of the chunks a filter allows, looked up through the doc_id index (lock held)."""
+        rows = []
+        for chunk in _chunked(_filter_values(filter)):
+            marks = ",".join("?" * len(chunk))
+            rows += [r for (r,) in self._db.execute(f"SELECT row FROM chunks WHERE doc_id IN ({marks})", chunk)]
+        return np.sort(np.asarray(rows, dtype=np.int64))
+
+    def _search(self, queries: np.ndarray, k: int, filter: Optional[dict] = None) -> List[List[Tuple[int, float]]]:
+        """Best (row, cosine similarity) pairs for each query row."""
+        with self._lock:
+            size = self._size
+            if size == 0:
+                return [[] for _ in range(len(queries))]
+            vectors, codes, scales = self._vectors, self._codes, self._scales
+            alive = np.array(self._alive[:size])
+            index = self._ivf
+            allowed = self._filter_rows(filter) if filter else None
+
+        if allowed is not None:
+            # pre-filter: score only the allowed rows, never the whole matrix
+            allowed = allowed[allowed < size]
+            return self._search_rows(allowed[alive[allowed]], queries, k, vectors, codes, scales, alive)
+
+        if index is not None and self.nprobe < index.nlist:
+            return [self._search_lists(index, query, k, size, vectors, codes, scales, alive) for query in queries]
+
+        if codes is None:
+            candidate_scores = q.scores(vectors[:size], None, queries)
+        else:
+            candidate_scores = q.scores(codes[:size], None if scales is None else scales[:size], queries)
+        candidate_scores[~alive] = -np.inf
+        k = min(k, int(alive.sum()))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        results = []
+        for j in range(len(queries)):
+            column = candidate_scores[:, j]
+            if codes is None:
+                best = q.top_k(column, k)
+                results.append([(int(r), float(column[r])) for r in best])
+                continue
+            candidates = np.sort(q.top_k(column, k * self.rescore_factor))
+            results.append(self._rescore(vectors, alive, candidates, queries[j], k))
+        return results
+
+    def _rescore(self, vectors, alive: np.ndarray, candidates: np.ndarray, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Exact float32 scores for a few candidate rows (sorted, for sequential reads)."""
+        exact = np.asarray(vectors[candidates]) @ query
+        exact[~alive[candidates]] = -np.inf
+        best = [i for i in q.top_k(exact, k) if exact[i] > -np.inf]
+        return [(int(candidates[i]), float(exact[i])) for i in best]
+
+    def _search_lists(self, index: ivf.IVFIndex, query: np.ndarray, k: int, size: int, vectors, codes, scales, alive) -> List[Tuple[int, float]]:
+        """Search only the rows filed under the query's nprobe nearest lists."""
+        rows = index.probe(index.nearest_lists(query, self.nprobe))
+        rows = rows[rows < size]
+        return self._search_rows(rows[alive[rows]], query[None, :], k, vectors, codes, scales, alive)[0]
+
+    def _search_rows(self, rows: np.ndarray, queries: np.ndarray, k: int, vectors, codes, scales, alive) -> List[List[Tuple[int, float]]]:
+        """Search a subset of live rows (sorted) for every query."""
+        if codes is None:
+            exact = np.asarray(vectors[rows]) @ queries.T
+            return [[(int(rows[i]), float(exact[i, j])) for i in q.top_k(exact[:, j], k)] for j in range(len(queries))]
+        approx = q.scores(codes[rows], None if scales is None else scales[rows], queries)
+        results = []
+        for j in range(len(queries)):
+            candidates = np.sort(rows[q.top_k(approx[:, j], k * self.rescore_factor)])
+            results.append(self._rescore(vectors, alive, candidates, queries[j], k))
+        return results
+
+    def _documents(self, hits: List[List[Tuple[int, float]]]) -> List[List[Tuple[Document, float]]]:
+        """Attach chunk text and metadata to every query's hits (one SQLite lookup for all)."""
+        rows = sorted({row for query_hits in hits for row, _ in query_hits})
+        found = {}
+        with self._lock:
+            for chunk in _chunked(rows):
+                marks = ",".join("?" * len(chunk))
+                for row, chunk_id, text, metadata in self._db.execute(
+                    f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({marks})", chunk
+                ):
+                    found[row] = Document(id=chunk_id, page_content=text or "", metadata=json.loads(metadata or "{}"))
+        return [[(found[row], score) for row, score in query_hits if row in found] for query_hits in hits]
+
+    def search_by_vectors(
+        self, embeddings: List[List[float]], k: int = 4, filter: Optional[dict] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        if len(embeddings) == 0:
+            return []
+        queries = q.normalize(np.asarray(embeddings, dtype=np.float32))
+        while True:
+            epoch = self._epoch
+            hits = self._search(queries, k, filter)
+            with self._lock:
+                if epoch == self._epoch:  # else compaction renumbered the rows meanwhile: search again
+                    return self._documents(hits)
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.search_by_vectors([embedding], k, filter=kwargs.get("filter"))[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # scores are already cosine similarities
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, persist_directory: str = "./vector_index", **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(persist_directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
+
+    def close(self):
+        thread = self._rebuild_thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            self._flush()
+            self._db.close()
+
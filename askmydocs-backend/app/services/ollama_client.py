@@ -0,0 +1,162 @@
+"""
+Thin client for the parts of the Ollama HTTP API that LangChain doesn't expose
+(model loading, keep-alive, the list of resident models) and for generation with a
+separate system prompt, which reports how many prompt tokens Ollama actually evaluated.
+"""
+import json
+import logging
+from typing import AsyncIterator, List, NamedTuple, Optional
+
+import httpx
+
+from app.config import settings
+from app.services import resilience
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Loading llama3 from disk on a CPU box can take well over a minute.
+LOAD_TIMEOUT = httpx.Timeout(300.0, connect=5.0)
+STATUS_TIMEOUT = httpx.Timeout(5.0)
+GENERATE_TIMEOUT = httpx.Timeout(300.0, connect=5.0)
+NS_PER_SECOND = 1e9
+
+# Shared by every generation thread: keeps connections to the pool endpoints alive.
+_generate_client = httpx.Client(timeout=GENERATE_TIMEOUT)
+
+
+def embedding_base_url() -> str:
+    return f"http://{settings.ollama_host}:{settings.ollama_port}"
+
+
+def normalize_model_name(name: str) -> str:
+    """Ollama reports resident models with an explicit tag (llama3 -> llama3:latest)."""
+    return name if ":" in name else f"{name}:latest"
+
+
+async def list_running_models(base_url: str) -> List[str]:
+    """Return the names of the models currently loaded in memory on an Ollama instance."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=STATUS_TIMEOUT) as client:
+        resp = await client.get("/api/ps")
+        resp.raise_for_status()
+        return [normalize_model_name(m["name"]) for m in resp.json().get("models", [])]
+
+
+async def load_generation_model(base_url: str, model: str, keep_alive: str) -> None:
+    """Load a generation model (an empty prompt makes Ollama load it without generating)."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=LOAD_TIMEOUT) as client:
+        resp = await client.post("/api/generate", json={"model": model, "keep_alive": keep_alive})
+        resp.raise_for_status()
+
+
+async def load_embedding_model(base_url: str, model: str, keep_alive: str) -> None:
+    """Load an embedding model by embedding a single short input."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=LOAD_TIMEOUT) as client:
+        resp = await client.post("/api/embed", json={"model": model, "input": "warm-up", "keep_alive": keep_alive})
+        resp.raise_for_status()
+
+
+class Generation(NamedTuple):
+    text: str
+    prompt_tokens: int     # prompt tokens evaluated; a prefix reused from the cache is not counted
+    prompt_seconds: float  # prefill time
+    total_seconds: float
+
+
+def generate(
+    base_url: str,
+    prompt: str,
+    system: str = "",
+    model: Optional[str] = None,
+    keep_alive: Optional[str] = None,
+    num_predict: Optional[int] = None,
+) -> Generation:
+    """
+    Blocking /api/generate call. The system prompt goes first in the model's template,
+    so keeping it identical across calls lets Ollama reuse its cached prefix.
+    """
+    options = {"temperature": 0}
+    if num_predict is not None:
+        options["num_predict"] = num_predict
+    resp = _generate_client.post(
+        f"{base_url}/api/generate",
+        timeout=httpx.Timeout(resilience.timeout_for("ollama"), connect=5.0),
+        json={
+            "model": model or settings.ollama_llm_model,
+            "system": system,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": keep_alive or settings.model_keep_alive,
+            "options": options,
+        },
+    )
+    resp.raise_for_status()
+    body = resp.json()
+    result = Generation(
+        text=body.get("response", ""),
+        prompt_tokens=body.get("prompt_eval_count", 0),
+        prompt_seconds=body.get("prompt_eval_duration", 0) / NS_PER_SECOND,
+        total_seconds=body.get("total_duration", 0) / NS_PER_SECOND,
+    )
+    _record(body)
+    return result
+
+
+def _record(body: dict):
+    metrics.inc("llm_prompt_eval_tokens_total", body.get("prompt_eval_count", 0), backend="ollama")
+    metrics.observe("llm_prompt_eval_seconds", body.get("prompt_eval_duration", 0) / NS_PER_SECOND, backend="ollama")
+
+
+async def stream_generate(
+    base_url: str,
+    prompt: str,
+    system: str = "",
+    model: Optional[str] = None,
+    keep_alive: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming /api/generate: yields text as Ollama produces it. Closing the generator
+    (e.g. cancelling the task consuming it) drops the connection, which stops Ollama
+    generating for this request.
+    """
+    async with httpx.AsyncClient(timeout=httpx.Timeout(resilience.timeout_for("ollama"), connect=5.0)) as client:
+        async with client.stream(
+            "POST",
+            f"{base_url}/api/generate",
+            json={
+                "model": model or settings.ollama_llm_model,
+                "system": system,
+                "prompt": prompt,
+                "stream": True,
+                "keep_alive": keep_alive or settings.model_keep_alive,
+                "options": {"temperature": 0},
+            },
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama: {chunk['error']}")
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    _record(chunk)
+
+
+async def prime_prompt_prefix(base_url: str, model: str, system: str, keep_alive: str) -> None:
+    """Evaluate a system prompt once so the first real request finds it in the cache."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=LOAD_TIMEOUT) as client:
+        resp = await client.post(
+            "/api/generate",
+            json={
+                "model": model,
+                "system": system,
+                "prompt": "Ready?",
+                "stream": False,
+                "keep_alive": keep_alive,
+                "options": {"temperature": 0, "num_predict": 1},
+            },
+        )
+        resp.raise_for_status()
@@ -0,0 +1,38 @@
+"""
+Streaming chat completions from OpenAI, used as the alternate backend for hedged
+requests and for failover when Ollama is unavailable.
+The openai package is only imported when a request is actually sent.
+"""
+from typing import AsyncIterator
+
+from app.config import settings
+from app.services import resilience
+
+OPENAI_MODEL = "gpt-3.5-turbo"
+MAX_TOKENS = 150
+TEMPERATURE = 0.1
+
+
+def configured() -> bool:
+    return bool(settings.openai_api_key) and settings.openai_api_key != "sk-dummy-key"
+
+
+async def stream_chat(prompt: str, system: str = "") -> AsyncIterator[str]:
+    """Yield the answer as it is generated; closing the generator closes the HTTP stream."""
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key=settings.openai_api_key, timeout=resilience.timeout_for("openai"))
+    messages = [{"role": "system", "content": system}] if system else []
+    stream = await client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=messages + [{"role": "user", "content": prompt}],
+        max_tokens=MAX_TOKENS,
+        temperature=TEMPERATURE,
+        stream=True,
+    )
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await stream.close()
@@ -0,0 +1,74 @@
+"""
+Every prompt the backend sends to an LLM, in one place.
+
+A prompt is split into a static ``system`` part (the instructions, byte-for-byte the
+same on every call) and a ``template`` holding the per-request values. The static part
+always comes first: Ollama keeps the KV cache of the last prompt each runner slot
+evaluated and only prefills tokens after the longest common prefix, so with the
+instructions up front every request after the first skips re-processing them and only
+pays for the documents, history and question.
+
+The grounded prompts share ``GROUNDED_INSTRUCTIONS`` as their prefix, so a RAG
+question and a chat-session follow-up reuse the same cached tokens.
+"""
+from typing import Dict, NamedTuple
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+NOT_FOUND_ANSWER = "I cannot find this information in the provided documents."
+
+GROUNDED_INSTRUCTIONS = f"""You are a helpful assistant that answers questions based ONLY on the provided documents.
+
+Answer the question using ONLY the information from the documents you are given. If the answer is not in the documents, say "{NOT_FOUND_ANSWER}" Be direct and concise."""
+
+
+class Prompt(NamedTuple):
+    system: str    # static instructions, sent first
+    template: str  # per-request part, str.format placeholders
+
+    def render(self, **values) -> str:
+        return self.template.format(**values)
+
+
+RAG = Prompt(
+    system=GROUNDED_INSTRUCTIONS,
+    template="""Context from documents:
+{context}
+
+Question: {question}""",
+)
+
+CONVERSATION = Prompt(
+    system=GROUNDED_INSTRUCTIONS + "\nUse the conversation so far only to understand what the question refers to.",
+    template="""Conversation so far:
+{history}
+
+Context from documents:
+{context}
+
+Question: {question}""",
+)
+
+CHAT_SUMMARY = Prompt(
+    system="""You keep the running summary of a conversation about the user's documents up to date.
+Keep names, numbers, documents and open questions the user may refer back to; drop pleasantries. Reply with the summary only.""",
+    template="""Current summary:
+{summary}
+
+New exchanges to fold in:
+{turns}
+
+Write the updated summary in at most {words} words.""",
+)
+
+PROMPTS: Dict[str, Prompt] = {
+    "rag": RAG,
+    "conversation": CONVERSATION,
+    "chat_summary": CHAT_SUMMARY,
+}
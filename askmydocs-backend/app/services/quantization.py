@@ -0,0 +1,77 @@
+"""
+Vector quantization for the local vector store.
+
+Vectors are kept in memory as float16 or int8 codes (int8 with one float32 scale per
+row) and searched approximately; the best ``k * rescore_factor`` candidates are then
+re-scored exactly against the float32 originals, which stay on disk (memory-mapped)
+and are only touched for those few rows.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+NONE = "none"
+FLOAT16 = "float16"
+INT8 = "int8"
+MODES = (NONE, FLOAT16, INT8)
+
+# Scores are computed in blocks so the float32 upcast of the codes never materializes
+# the whole matrix; small blocks keep the upcast in cache (~3 MB at 768 dims).
+BLOCK_ROWS = 1024
+
+
+def code_dtype(mode: str):
+    return {NONE: np.float32, FLOAT16: np.float16, INT8: np.int8}[mode]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def truncate(vectors: np.ndarray, dims: int) -> np.ndarray:
+    """Keep the first `dims` components and rescale to unit length.
+
+    Matryoshka-trained embeddings (nomic-embed-text v1.5) pack most of the signal into
+    the leading dimensions, so a prefix is a smaller embedding of the same text.
+    """
+    return normalize(np.asarray(vectors, dtype=np.float32)[..., :dims])
+
+
+def quantize(vectors: np.ndarray, mode: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Encode float32 rows; returns (codes, per-row scales or None)."""
+    if mode == INT8:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    return vectors.astype(code_dtype(mode)), None
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    out = codes.astype(np.float32)
+    if scales is not None:
+        out *= scales[:, None]
+    return out
+
+
+def scores(codes: np.ndarray, scales: Optional[np.ndarray], queries: np.ndarray) -> np.ndarray:
+    """Inner products of every row with every query: (rows, queries)."""
+    out = np.empty((codes.shape[0], queries.shape[0]), dtype=np.float32)
+    for start in range(0, codes.shape[0], BLOCK_ROWS):
+        block = codes[start:start + BLOCK_ROWS].astype(np.float32, copy=False)
+        out[start:start + BLOCK_ROWS] = block @ queries.T
+    if scales is not None:
+        out *= scales[:, None]
+    return out
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest values, best first (argpartition, then sort only k)."""
+    k = min(k, values.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-values, k - 1)[:k]
+    return idx[np.argsort(-values[idx], kind="stable")]
@@ -1,43 +1,30 @@
 from langchain_community.llms import Ollama
-from langchain.chains import RetrievalQA
+from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
-from app.services.embeddings_service import get_chroma_client
+from app.services import prompts
+from app.services.retrieval import AdaptiveRetriever
+from app.services.vector_store import get_vector_store
+from app.services.backend_pool import generation_pool
 from app.config import settings
 
-# Define a custom prompt template that ensures the LLM uses the context
-CUSTOM_PROMPT = PromptTemplate(
-    input_variables=["context", "question"],
-    template="""You are a helpful assistant that answers questions based ONLY on the provided documents.
-
-Context from documents:
-{context}
-
-Question: {question}
-
-Answer the question using ONLY the information from the documents above. If the answer is not in the documents, say "I cannot find this information in the provided documents." Be direct and concise."""
-)
-
-def get_qa_chain():
+def get_qa_chain(base_url: str = None):
     # create LLM using Ollama
     llm = Ollama(
-        base_url=settings.ollama_api_url,
-        model="llama3",
-        temperature=0
-    )
-    vectordb = get_chroma_client()
-    retriever = vectordb.as_retriever(search_kwargs={"k": 5})
-    
-    # Create QA chain with custom prompt
-    qa = RetrievalQA.from_chain_type(
-        llm=llm, 
-        chain_type="stuff", 
-        retriever=retriever,
-        chain_type_kwargs={"prompt": CUSTOM_PROMPT},
-        return_source_documents=False
+        base_url=base_url or settings.ollama_api_url,
+        model=settings.ollama_llm_model,
+        temperature=0,
+        keep_alive=settings.model_keep_alive,
+        timeout=int(settings.ollama_timeout_seconds),
+        system=prompts.RAG.system,  # static instructions first, so Ollama reuses their cached prefill
     )
-    return qa
+    # "Stuff" the retrieved chunks into the custom prompt; retrieval happens before, in answer_question
+    return load_qa_chain(llm, chain_type="stuff", prompt=PromptTemplate.from_template(prompts.RAG.template))
+
+def retrieve(question: str):
+    return AdaptiveRetriever(vectorstore=get_vector_store()).invoke(question)
 
 def answer_question(question: str):
-    qa = get_qa_chain()
-    resp = qa.run(question)
-    return resp
+    # Embedding and vector search run outside the pool: their errors must not count
+    # against (or be retried on) a generation endpoint.
+    docs = retrieve(question)
+    return generation_pool.call(lambda base_url: get_qa_chain(base_url).run(input_documents=docs, question=question))
@@ -0,0 +1,251 @@
+"""
+Per-user rate limits and usage accounting.
+
+Every caller (the signed-in user, or the client address for anonymous calls) has two
+token buckets:
+
+* requests - refilled at ``rate_limit_requests_per_minute`` up to
+  ``rate_limit_request_burst``; each question or uploaded file takes one.
+* generated tokens - refilled at ``rate_limit_tokens_per_minute`` up to
+  ``rate_limit_token_burst``. The length of an answer is only known afterwards, so it
+  is charged once the answer exists and may push the bucket into debt; new questions
+  are refused until it has refilled to zero.
+
+A refused call gets a 429 with Retry-After set to when the bucket will allow it again.
+A batch costing more requests than the burst could never be allowed, so it gets a 413
+naming the burst instead of a 429 it could retry forever.
+
+Buckets and usage counters live in process memory, which is exact for one worker.
+With several workers (or replicas) set ``rate_limit_redis_url`` so they share state in
+Redis; bucket updates there are a single Lua script, so concurrent workers can't both
+spend the same tokens.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+try:
+    import redis.asyncio as redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from fastapi import HTTPException, Request, status
+
+from app.config import settings
+from app.models import User
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = "requests"
+TOKENS = "tokens"
+SECONDS_PER_MINUTE = 60.0
+# In-memory buckets that have refilled completely are dropped beyond this many callers.
+MAX_IDLE_BUCKETS = 10000
+
+
+@dataclass(frozen=True)
+class Limit:
+    name: str
+    rate: float       # refill per second
+    capacity: float   # burst
+
+
+def request_limit() -> Limit:
+    return Limit(REQUESTS, settings.rate_limit_requests_per_minute / SECONDS_PER_MINUTE, settings.rate_limit_request_burst)
+
+
+def token_limit() -> Limit:
+    return Limit(TOKENS, settings.rate_limit_tokens_per_minute / SECONDS_PER_MINUTE, settings.rate_limit_token_burst)
+
+
+class RateLimited(Exception):
+    """Raised when a caller is over a limit; mapped to 429 with Retry-After."""
+
+    def __init__(self, principal: str, limit: Limit, retry_after: int):
+        per_minute = limit.rate * SECONDS_PER_MINUTE
+        super().__init__(f"Rate limit exceeded: {per_minute:g} {limit.name} per minute, retry in {retry_after}s")
+        self.principal = principal
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def refill(tokens: float, updated: float, now: float, limit: Limit) -> float:
+    return min(limit.capacity, tokens + max(0.0, now - updated) * limit.rate)
+
+
+def retry_after(tokens: float, cost: float, limit: Limit) -> int:
+    """Whole seconds until the bucket holds `cost` tokens again."""
+    return max(1, int((cost - tokens) / limit.rate + 0.999)) if limit.rate > 0 else 3600
+
+
+class InMemoryRateLimiter:
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._usage: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        if len(self._buckets) <= MAX_IDLE_BUCKETS:
+            return
+        for key, (tokens, updated) in list(self._buckets.items()):
+            limit = request_limit() if key[1] == REQUESTS else token_limit()
+            if refill(tokens, updated, now, limit) >= limit.capacity:
+                del self._buckets[key]
+
+    async def take(self, principal: str, limit: Limit, cost: float, force: bool = False) -> Tuple[bool, float]:
+        """
+        Take `cost` tokens if the bucket holds that many (or always, with `force`).
+        Returns (taken, tokens left); `cost=0` just checks the bucket is not in debt.
+        """
+        now = time.monotonic()
+        with self._lock:
+            key = (principal, limit.name)
+            tokens, updated = self._buckets.get(key, (limit.capacity, now))
+            tokens = refill(tokens, updated, now, limit)
+            taken = force or tokens >= cost
+            if taken:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._prune(now)
+            return taken, tokens
+
+    async def add_usage(self, principal: str, **counts: int):
+        with self._lock:
+            self._usage.setdefault(principal, Counter()).update(counts)
+
+    async def usage(self, principal: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._usage.get(principal, Counter()))
+
+    async def close(self):
+        pass
+
+
+# KEYS[1] bucket hash; ARGV: rate, capacity, cost, force, now, ttl
+TAKE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate, capacity, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local now = tonumber(ARGV[5])
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local taken = 0
+if ARGV[4] == '1' or tokens >= cost then
+    tokens = tokens - cost
+    taken = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+return {taken, tostring(tokens)}
+"""
+
+
+class RedisRateLimiter:
+    """Buckets and usage shared by every worker through Redis."""
+
+    def __init__(self, url: str, prefix: str = "askmydocs:ratelimit"):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis is required for a shared rate limit backend (pip install redis)")
+        self._client = redis.from_url(url)
+        self._take = self._client.register_script(TAKE_SCRIPT)
+        self._prefix = prefix
+
+    async def take(self, principal: str, limit: Limit, cost: float, force: bool = False) -> Tuple[bool, float]:
+        # an idle bucket is full again after capacity / rate seconds; let Redis forget it then
+        ttl = int(limit.capacity / limit.rate) + 60 if limit.rate > 0 else 86400
+        taken, tokens = await self._take(
+            keys=[f"{self._prefix}:{limit.name}:{principal}"],
+            args=[limit.rate, limit.capacity, cost, int(force), time.time(), ttl],
+        )
+        return bool(int(taken)), float(tokens)
+
+    async def add_usage(self, principal: str, **counts: int):
+        key = f"{self._prefix}:usage:{principal}"
+        async with self._client.pipeline(transaction=False) as pipe:
+            for name, count in counts.items():
+                pipe.hincrby(key, name, count)
+            await pipe.execute()
+
+    async def usage(self, principal: str) -> Dict[str, int]:
+        values = await self._client.hgetall(f"{self._prefix}:usage:{principal}")
+        return {name.decode(): int(count) for name, count in values.items()}
+
+    async def close(self):
+        await self._client.aclose()
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    """The shared Redis limiter when configured, else the in-process one."""
+    global _limiter
+    if _limiter is None:
+        if settings.rate_limit_redis_url:
+            _limiter = RedisRateLimiter(settings.rate_limit_redis_url)
+        else:
+            _limiter = InMemoryRateLimiter()
+    return _limiter
+
+
+def principal_for(user: Optional[User], request: Optional[Request] = None) -> str:
+    """Who a call is charged to: the signed-in user, else the client address."""
+    if user is not None:
+        return f"user:{user.id}"
+    return f"ip:{request.client.host if request and request.client else 'unknown'}"
+
+
+async def check_request(principal: str, cost: int = 1):
+    """Charge `cost` requests and refuse the call while the caller's generated tokens are in debt."""
+    if not settings.rate_limit_enabled:
+        return
+    requests = request_limit()
+    if cost > requests.capacity:  # the bucket never holds this many, so waiting can't help
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A call may count as at most {requests.capacity:g} requests (RATE_LIMIT_REQUEST_BURST), this one counts as {cost}",
+        )
+    limiter = get_rate_limiter()
+    # the token check takes nothing, so do it first: a refused call doesn't spend a request
+    for limit, amount in ((token_limit(), 0), (requests, cost)):
+        taken, tokens = await limiter.take(principal, limit, amount)
+        if not taken:
+            metrics.inc("rate_limited_total", limit=limit.name)
+            await limiter.add_usage(principal, rejected=1)
+            raise RateLimited(principal, limit, retry_after(tokens, amount, limit))
+    await limiter.add_usage(principal, requests=cost)
+
+
+async def charge_tokens(principal: str, tokens: int):
+    """Charge generated tokens after an answer (the bucket may go into debt)."""
+    if not settings.rate_limit_enabled or tokens <= 0:
+        return
+    limiter = get_rate_limiter()
+    await limiter.take(principal, token_limit(), tokens, force=True)
+    await limiter.add_usage(principal, generated_tokens=tokens)
+
+
+async def usage_report(principal: str) -> Dict:
+    """Totals so far and what is left in each bucket right now."""
+    limiter = get_rate_limiter()
+    totals = await limiter.usage(principal)
+    buckets = {}
+    for limit in (request_limit(), token_limit()):
+        _, tokens = await limiter.take(principal, limit, 0, force=True)
+        buckets[limit.name] = {
+            "available": round(tokens, 1),
+            "burst": limit.capacity,
+            "per_minute": limit.rate * SECONDS_PER_MINUTE,
+        }
+    return {
+        "principal": principal,
+        "requests": totals.get("requests", 0),
+        "generated_tokens": totals.get("generated_tokens", 0),
+        "rejected": totals.get("rejected", 0),
+        "limits": buckets,
+    }
@@ -0,0 +1,224 @@
+"""
+Deadlines, timeouts and circuit breakers for external calls.
+
+A request gets one deadline (``deadline(seconds)``), kept in a context variable so it
+follows the request through retrieval and generation, including into ``to_thread``
+workers. Every call to a dependency (Ollama, OpenAI, embeddings, the vector store, blob
+storage) is bounded by that dependency's own ``<name>_timeout_seconds`` or by the time
+left on the deadline, whichever is shorter; when the deadline is already gone the call
+is not started at all.
+
+Each dependency also has a circuit breaker. After ``circuit_failure_threshold``
+consecutive failures it opens and calls fail immediately with ``CircuitOpen`` (instead
+of every request waiting out a timeout against a dead backend); after
+``circuit_reset_seconds`` one probe call is let through, and its outcome closes or
+re-opens the circuit. Our own overload (admission rejections) and a caller's exhausted
+deadline are not counted against the dependency.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.config import settings
+from app.services.admission import AdmissionRejected
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time; mapped to 504."""
+
+    def __init__(self, dependency: Optional[str] = None):
+        super().__init__("Request deadline exceeded" + (f" before calling {dependency}" if dependency else ""))
+        self.dependency = dependency
+
+
+class DependencyTimeout(Exception):
+    """A dependency did not answer within its own timeout; mapped to 504."""
+
+    def __init__(self, dependency: str, timeout: float):
+        super().__init__(f"{dependency} did not respond within {timeout:.1f}s")
+        self.dependency = dependency
+        self.timeout = timeout
+
+
+class CircuitOpen(Exception):
+    """The dependency's circuit is open; mapped to 503 with Retry-After."""
+
+    def __init__(self, dependency: str, retry_after: int):
+        super().__init__(f"{dependency} is unavailable (circuit open), retry in {retry_after}s")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+# Errors that say nothing about the dependency's health.
+NOT_FAILURES = (AdmissionRejected, DeadlineExceeded, CircuitOpen)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Give the code inside `seconds` to finish (an enclosing, earlier deadline still applies)."""
+    current = _deadline.get()
+    token = _deadline.set(min(current, time.monotonic() + seconds) if current else time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left on the current request's deadline (None without one)."""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def timeout_for(dependency: str) -> float:
+    """The dependency's timeout, shortened to what is left of the deadline."""
+    timeout = getattr(settings, f"{dependency}_timeout_seconds")
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded(dependency)
+    return min(timeout, left)
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """Await with only the request deadline as the limit."""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(left, 0))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded() from None
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()  # shared by the event loop and worker threads
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            return HALF_OPEN
+        return self._state
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logger.warning(f"Circuit for {self.name} is now {state}")
+        self._state = state
+        metrics.set_gauge("circuit_state", STATE_VALUES[state], dependency=self.name)
+
+    def allow(self):
+        """Raise CircuitOpen unless a call may go through now."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True  # one probe at a time; the rest keep failing fast
+                self._set_state(HALF_OPEN)
+                return
+            retry_after = max(1, int(self._opened_at + self.reset_seconds - time.monotonic() + 0.999))
+        metrics.inc("circuit_rejected_total", dependency=self.name)
+        raise CircuitOpen(self.name, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._probing or self.consecutive_failures >= self.failure_threshold:
+                if self._state != OPEN or self._probing:
+                    metrics.inc("circuit_opened_total", dependency=self.name)
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self._set_state(OPEN)
+
+    def release_probe(self):
+        with self._lock:
+            self._probing = False
+
+    @contextmanager
+    def guard(self):
+        """Check the circuit, then record how the call inside went."""
+        self.allow()
+        try:
+            yield
+        except NOT_FAILURES:
+            self.release_probe()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:  # cancelled: no verdict on the dependency
+            self.release_probe()
+            raise
+        else:
+            self.record_success()
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {"dependency": self.name, "state": self._current_state(), "consecutive_failures": self.consecutive_failures}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    """One breaker per dependency ("ollama", "openai", "embeddings", "vector_store", "blob")."""
+    with _breakers_lock:
+        breaker = _breakers.get(dependency)
+        if breaker is None:
+            breaker = CircuitBreaker(dependency, settings.circuit_failure_threshold, settings.circuit_reset_seconds)
+            _breakers[dependency] = breaker
+        return breaker
+
+
+def breaker_status():
+    with _breakers_lock:
+        return [breaker.as_dict() for breaker in _breakers.values()]
+
+
+async def guarded(dependency: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Run `call()` behind the dependency's circuit breaker and within its timeout."""
+    with get_breaker(dependency).guard():
+        timeout = timeout_for(dependency)
+        try:
+            return await asyncio.wait_for(call(), timeout)
+        except asyncio.TimeoutError:
+            left = remaining()
+            if left is not None and left <= 0:
+                raise DeadlineExceeded(dependency) from None
+            raise DependencyTimeout(dependency, timeout) from None
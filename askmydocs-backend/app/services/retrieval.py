@@ -0,0 +1,90 @@
+"""
+Adaptive top-k retrieval.
+
+Instead of a fixed k, every search over-fetches ``retrieval_candidates`` hits and keeps
+only those that are nearly as relevant as the best one (within ``retrieval_score_margin``
+of its score). The count is then clamped to ``retrieval_min_k``..``retrieval_max_k``
+and cut off once the chunks would exceed ``retrieval_token_budget`` prompt tokens. A
+question with one clearly matching passage sends a short prompt; a broad one whose
+top hits score alike gets more context.
+
+How many candidates were fetched and kept, and the context size, go to ``GET /metrics``
+for tuning the knobs.
+"""
+import logging
+from typing import Any, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.prompts import estimate_tokens
+from app.services.vector_store import VectorStoreBackend
+
+logger = logging.getLogger(__name__)
+
+Hit = Tuple[Document, float]
+
+
+def select_hits(
+    hits: List[Hit],
+    margin: Optional[float] = None,
+    min_k: Optional[int] = None,
+    max_k: Optional[int] = None,
+    token_budget: Optional[int] = None,
+) -> List[Hit]:
+    """Keep the hits (best first) within `margin` of the best score, bounded by min/max k and tokens."""
+    margin = settings.retrieval_score_margin if margin is None else margin
+    min_k = settings.retrieval_min_k if min_k is None else min_k
+    max_k = settings.retrieval_max_k if max_k is None else max_k
+    token_budget = settings.retrieval_token_budget if token_budget is None else token_budget
+    if not hits:
+        return []
+
+    cutoff = hits[0][1] - margin
+    selected, tokens = [], 0
+    for doc, score in hits[:max_k]:
+        if len(selected) >= min_k and score < cutoff:
+            break
+        cost = estimate_tokens(doc.page_content)
+        if selected and tokens + cost > token_budget:
+            break  # the best hit is always kept, even if it alone is over budget
+        selected.append((doc, score))
+        tokens += cost
+    return selected
+
+
+def record(candidates: int, selected: List[Hit]):
+    tokens = sum(estimate_tokens(doc.page_content) for doc, _ in selected)
+    metrics.observe("retrieval_candidates", candidates)
+    metrics.observe("retrieval_k", len(selected))
+    metrics.observe("retrieval_context_tokens", tokens)
+    logger.info(f"Retrieved {len(selected)} of {candidates} candidate chunks ({tokens} context tokens)")
+
+
+def adaptive_search_by_vectors(
+    vectordb: VectorStoreBackend, vectors: List[List[float]], filter: Optional[dict] = None
+) -> List[List[Hit]]:
+    """Over-fetch for every query vector in one batched search, then select adaptively."""
+    results = []
+    for hits in vectordb.search_by_vectors(vectors, settings.retrieval_candidates, filter):
+        selected = select_hits(hits)
+        record(len(hits), selected)
+        results.append(selected)
+    return results
+
+
+def adaptive_search(vectordb: VectorStoreBackend, query: str, filter: Optional[dict] = None) -> List[Hit]:
+    return adaptive_search_by_vectors(vectordb, [vectordb.embeddings.embed_query(query)], filter)[0]
+
+
+class AdaptiveRetriever(BaseRetriever):
+    """LangChain retriever over ``adaptive_search`` (for chains such as RetrievalQA)."""
+
+    vectorstore: Any
+    filter: Optional[dict] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [doc for doc, _ in adaptive_search(self.vectorstore, query, self.filter)]
@@ -0,0 +1,49 @@
+"""
+Single-flight request coalescing: concurrent callers asking for the same key share
+one in-flight computation instead of each running their own.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace so trivially different phrasings coalesce."""
+    return " ".join(query.casefold().split())
+
+
+def query_key(query: str, model: str, scope: Optional[Dict[str, Any]] = None) -> str:
+    """Coalescing key for a question: normalized text, model and corpus scope."""
+    return json.dumps([normalize_query(query), model.lower(), scope or {}], sort_keys=True, default=str)
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        metrics.inc("singleflight_requests_total", flight=self.name)
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.inc("singleflight_coalesced_total", flight=self.name)
+        else:
+            # Run the computation as its own task so that one caller disconnecting
+            # doesn't cancel it for everyone else waiting on the same key.
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._inflight[key] = task
+            metrics.add_gauge("singleflight_inflight", 1, flight=self.name)
+            task.add_done_callback(lambda t, key=key: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        metrics.add_gauge("singleflight_inflight", -1, flight=self.name)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Coalesced call for {self.name} failed: {task.exception()}")
@@ -0,0 +1,308 @@
+"""
+Point-in-time snapshots of the vector store, restored by swapping files at startup.
+
+A snapshot is a directory under ``vector_snapshot_dir`` holding a copy of every file of
+the store (vectors, chunk text and metadata, index files) plus ``manifest.json``
+recording the backend, embedding model, vector dimensions and chunk count. Snapshots
+are taken online: writes are paused for the copy (``paused_writes()``), searches are
+not. Files are cloned copy-on-write where the filesystem supports it (btrfs, XFS,
+APFS-style reflinks via ``FICLONE``), so a snapshot takes seconds and no extra space
+until the store changes; elsewhere they are copied. A file unchanged since the previous
+snapshot (same size and mtime) is hard-linked to that snapshot's copy instead; snapshot
+files are never modified, so sharing them is safe. SQLite files go through SQLite's
+backup API, which copies a consistent database whatever its journal mode.
+
+Restoring copies (or clones) a snapshot next to the store and swaps it in with a
+rename; the replaced store is kept beside it as ``<dir>.before-<snapshot>``. A
+snapshot taken with another backend, embedding model or vector size is refused: its
+vectors would not be comparable with the query embeddings. Set
+``VECTOR_RESTORE_SNAPSHOT`` to restore at startup (once: a marker in the restored store
+keeps later restarts from restoring again), or use ``python -m app.cli.snapshots``
+with the API stopped.
+"""
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows
+    FCNTL_AVAILABLE = False
+
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.vector_store import NUMPY, VectorStoreBackend, store_directory
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+STORE = "store"
+RESTORED_MARKER = ".restored-from-snapshot"
+FORMAT = 1
+FICLONE = 0x40049409  # ioctl: clone the whole file copy-on-write (Linux)
+SQLITE_SUFFIX = ".sqlite3"
+# Transient files: temporary copies being swapped in, and SQLite journals (the backup API covers them).
+SKIPPED_SUFFIXES = (".tmp", "-journal", "-wal", "-shm")
+
+
+class SnapshotMismatch(ValueError):
+    """The snapshot doesn't match the configured backend, embedding model or vector size."""
+
+
+def clone_file(src: str, dst: str) -> str:
+    """Copy-on-write clone where the filesystem supports it, else a plain copy. Returns which."""
+    if FCNTL_AVAILABLE:
+        try:
+            with open(src, "rb") as source, open(dst, "wb") as target:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            shutil.copystat(src, dst)
+            return "cloned"
+        except OSError:
+            pass  # not supported here (ext4, tmpfs, across filesystems...)
+    shutil.copy2(src, dst)
+    return "copied"
+
+
+def backup_sqlite(src: str, dst: str):
+    source = sqlite3.connect(src)
+    target = sqlite3.connect(dst)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def _store_files(directory: str) -> List[str]:
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name == RESTORED_MARKER or name.endswith(SKIPPED_SUFFIXES):
+                continue
+            files.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(files)
+
+
+def _snapshot_dir(snapshot_dir: Optional[str] = None) -> str:
+    return snapshot_dir or settings.vector_snapshot_dir
+
+
+def read_manifest(path: str) -> Dict:
+    with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_snapshots(snapshot_dir: Optional[str] = None) -> List[Dict]:
+    """Manifests of the complete snapshots, newest first."""
+    root = _snapshot_dir(snapshot_dir)
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for name in os.listdir(root):
+        if os.path.exists(os.path.join(root, name, MANIFEST)):
+            manifests.append(read_manifest(os.path.join(root, name)))
+    return sorted(manifests, key=lambda m: m["created_at"], reverse=True)
+
+
+def _new_id(root: str) -> str:
+    base = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    snapshot_id, n = base, 1
+    while os.path.exists(os.path.join(root, snapshot_id)) or os.path.exists(os.path.join(root, f"{snapshot_id}.partial")):
+        n += 1
+        snapshot_id = f"{base}-{n}"
+    return snapshot_id
+
+
+def create_snapshot(
+    store: VectorStoreBackend,
+    backend: Optional[str] = None,
+    directory: Optional[str] = None,
+    snapshot_dir: Optional[str] = None,
+    keep: Optional[int] = None,
+) -> Dict:
+    """Snapshot `store` (whose files are in `directory`); returns the manifest."""
+    backend = backend or settings.vector_store_backend
+    directory = directory or store_directory(backend)
+    root = _snapshot_dir(snapshot_dir)
+    os.makedirs(root, exist_ok=True)
+    previous = next((m for m in list_snapshots(root) if m["backend"] == backend), None)
+    snapshot_id = _new_id(root)
+    partial = os.path.join(root, f"{snapshot_id}.partial")
+    start = time.monotonic()
+    counts = {"cloned": 0, "copied": 0, "linked": 0, "sqlite": 0}
+    files = {}
+
+    with store.paused_writes():
+        paused = time.monotonic()
+        for rel in _store_files(directory):
+            src, dst = os.path.join(directory, rel), os.path.join(partial, STORE, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            stat = os.stat(src)
+            files[rel] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            if rel.endswith(SQLITE_SUFFIX):
+                backup_sqlite(src, dst)
+                counts["sqlite"] += 1
+                continue
+            if previous is not None and previous["files"].get(rel) == files[rel]:
+                try:
+                    os.link(os.path.join(root, previous["id"], STORE, rel), dst)
+                    counts["linked"] += 1
+                    continue
+                except OSError:
+                    pass  # previous copy gone or links unsupported: copy instead
+            counts[clone_file(src, dst)] += 1
+        chunks, dimensions = store.count(), store.dimensions()
+        paused = time.monotonic() - paused
+
+    manifest = {
+        "format": FORMAT,
+        "id": snapshot_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "backend": backend,
+        "embedding_model": settings.ollama_model,
+        "dimensions": dimensions,
+        "chunks": chunks,
+        "files": files,
+    }
+    with open(os.path.join(partial, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(partial, os.path.join(root, snapshot_id))  # only complete snapshots are listed
+
+    seconds = time.monotonic() - start
+    metrics.inc("vector_snapshots_total")
+    metrics.observe("vector_snapshot_seconds", seconds)
+    metrics.observe("vector_snapshot_write_pause_seconds", paused)
+    logger.info(
+        f"Snapshot {snapshot_id}: {chunks} chunks, {len(files)} files "
+        f"({counts['cloned']} cloned, {counts['linked']} linked, {counts['copied']} copied, {counts['sqlite']} SQLite) "
+        f"in {seconds:.1f}s, writes paused {paused:.1f}s"
+    )
+    prune(root, settings.vector_snapshot_keep if keep is None else keep)
+    return manifest
+
+
+def prune(snapshot_dir: Optional[str] = None, keep: Optional[int] = None) -> List[str]:
+    """Delete all but the newest `keep` snapshots (0 keeps all); returns the deleted ids."""
+    root = _snapshot_dir(snapshot_dir)
+    keep = settings.vector_snapshot_keep if keep is None else keep
+    if keep <= 0:
+        return []
+    deleted = []
+    for manifest in list_snapshots(root)[keep:]:
+        shutil.rmtree(os.path.join(root, manifest["id"]))
+        deleted.append(manifest["id"])
+    return deleted
+
+
+def stored_dimensions(backend: str, directory: str) -> Optional[int]:
+    """Vector size of the store on disk, read without opening it (None if there is none)."""
+    if backend == NUMPY:
+        path, query = os.path.join(directory, "chunks.sqlite3"), "SELECT value FROM meta WHERE key = 'dim'"
+    else:
+        path, query = os.path.join(directory, "chroma.sqlite3"), "SELECT dimension FROM collections WHERE dimension IS NOT NULL"
+    if not os.path.exists(path):
+        return None
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = db.execute(query).fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        db.close()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+def check_compatible(manifest: Dict, backend: str, current_dimensions: Optional[int]):
+    """Raise SnapshotMismatch unless the snapshot can serve the configured embeddings."""
+    if manifest.get("format") != FORMAT:
+        raise SnapshotMismatch(f"Snapshot {manifest.get('id')} has unknown format {manifest.get('format')}")
+    if manifest["backend"] != backend:
+        raise SnapshotMismatch(f"Snapshot {manifest['id']} is of the {manifest['backend']} backend, not {backend}")
+    if manifest["embedding_model"] != settings.ollama_model:
+        raise SnapshotMismatch(
+            f"Snapshot {manifest['id']} was embedded with {manifest['embedding_model']}, "
+            f"but the configured embedding model is {settings.ollama_model}"
+        )
+    expected = settings.embedding_dimensions or current_dimensions
+    if expected and manifest["dimensions"] and manifest["dimensions"] != expected:
+        raise SnapshotMismatch(f"Snapshot {manifest['id']} holds {manifest['dimensions']}-dim vectors, expected {expected}")
+
+
+def restore_snapshot(
+    snapshot_id: str,
+    backend: Optional[str] = None,
+    directory: Optional[str] = None,
+    snapshot_dir: Optional[str] = None,
+) -> Dict:
+    """
+    Swap the snapshot in as the store's directory. The store must not be open (this runs
+    at startup, or from the CLI with the API stopped). Returns the manifest.
+    """
+    backend = backend or settings.vector_store_backend
+    directory = os.path.abspath(directory or store_directory(backend))
+    source = os.path.join(_snapshot_dir(snapshot_dir), snapshot_id)
+    if not os.path.exists(os.path.join(source, MANIFEST)):
+        raise FileNotFoundError(f"No snapshot {snapshot_id!r} in {_snapshot_dir(snapshot_dir)}")
+    manifest = read_manifest(source)
+    check_compatible(manifest, backend, stored_dimensions(backend, directory))
+
+    start = time.monotonic()
+    staging = f"{directory}.restoring"
+    if os.path.exists(staging):
+        shutil.rmtree(staging)  # left over from an interrupted restore
+    for rel in manifest["files"]:
+        dst = os.path.join(staging, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        clone_file(os.path.join(source, STORE, rel), dst)  # never a hard link: the live store changes in place
+    os.makedirs(staging, exist_ok=True)
+    with open(os.path.join(staging, RESTORED_MARKER), "w", encoding="utf-8") as f:
+        f.write(snapshot_id)
+
+    if os.path.exists(directory):
+        backup = f"{directory}.before-{snapshot_id}"
+        if os.path.exists(backup):
+            shutil.rmtree(backup)
+        _swap(directory, staging, backup)
+        logger.info(f"Previous vector store kept at {backup}")
+    else:
+        os.rename(staging, directory)
+    metrics.observe("vector_restore_seconds", time.monotonic() - start)
+    logger.info(f"Restored vector store from snapshot {snapshot_id} ({manifest['chunks']} chunks) in {time.monotonic() - start:.1f}s")
+    return manifest
+
+
+def _swap(directory: str, staging: str, backup: str):
+    try:
+        os.rename(directory, backup)
+        os.rename(staging, directory)
+    except OSError:
+        # the store directory is a mount point (e.g. a Docker volume): swap its contents instead
+        os.makedirs(backup, exist_ok=True)
+        for name in os.listdir(directory):
+            shutil.move(os.path.join(directory, name), os.path.join(backup, name))
+        for name in os.listdir(staging):
+            shutil.move(os.path.join(staging, name), os.path.join(directory, name))
+        os.rmdir(staging)
+
+
+def restored_from(directory: Optional[str] = None) -> Optional[str]:
+    path = os.path.join(directory or store_directory(), RESTORED_MARKER)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def restore_at_startup() -> Optional[Dict]:
+    """Restore ``vector_restore_snapshot`` unless the store already came from it."""
+    snapshot_id = settings.vector_restore_snapshot
+    if not snapshot_id or restored_from() == snapshot_id:
+        return None
+    return restore_snapshot(snapshot_id)
+
@@ -0,0 +1,61 @@
+"""
+Compression of full document text for the ``document_contents`` table.
+
+Every stored value starts with one codec byte, so the codec can change (or zstandard
+can be installed later) without rewriting existing rows: each row is decompressed
+with whatever codec it was written with.
+"""
+import zlib
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+from app.config import settings
+
+RAW = b"\x00"
+ZLIB = b"\x01"
+ZSTD = b"\x02"
+
+AUTO = "auto"
+CODECS = {"none": RAW, "zlib": ZLIB, "zstd": ZSTD}
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+MIN_COMPRESS_BYTES = 512  # shorter texts are stored as-is
+
+
+def _codec(name: str) -> bytes:
+    if name == AUTO:
+        return ZSTD if ZSTD_AVAILABLE else ZLIB
+    if name not in CODECS:
+        raise ValueError(f"Unknown document compression {name!r}, expected one of {(AUTO, *CODECS)}")
+    if CODECS[name] == ZSTD and not ZSTD_AVAILABLE:
+        raise RuntimeError("zstandard is required for DOCUMENT_COMPRESSION=zstd")
+    return CODECS[name]
+
+
+def compress_text(text: str, codec: str = None) -> bytes:
+    raw = text.encode("utf-8")
+    prefix = RAW if len(raw) < MIN_COMPRESS_BYTES else _codec(codec or settings.document_compression)
+    if prefix == ZSTD:
+        return prefix + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    if prefix == ZLIB:
+        return prefix + zlib.compress(raw, ZLIB_LEVEL)
+    return prefix + raw
+
+
+def decompress_text(data: bytes) -> str:
+    prefix, body = data[:1], data[1:]
+    if prefix == ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is required to read zstd-compressed document text")
+        # content size is in the frame header, written by ZstdCompressor.compress
+        return zstandard.ZstdDecompressor().decompress(body).decode("utf-8")
+    if prefix == ZLIB:
+        return zlib.decompress(body).decode("utf-8")
+    if prefix == RAW:
+        return body.decode("utf-8")
+    raise ValueError(f"Unknown document text codec byte {prefix!r}")
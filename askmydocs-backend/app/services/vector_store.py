@@ -0,0 +1,182 @@
+"""
+Pluggable vector store.
+
+Every backend is a LangChain ``VectorStore`` (so ``as_retriever()`` and friends keep
+working) that also implements ``VectorStoreBackend``: pre-computed embedding upserts,
+batched search and a chunk count. ``get_vector_store()`` returns the process-wide
+instance of the configured backend:
+
+* ``chroma`` - the persisted Chroma collection (default)
+* ``numpy``  - the in-process NumPy index with memory-mapped persistence
+
+Both can trade recall for latency on large corpora: Chroma through HNSW's ``ef_search``,
+the NumPy store through its optional IVF index and ``nprobe``. Both can also hold
+embeddings truncated to ``embedding_dimensions``; an existing store is converted with
+``python -m app.cli.reduce_dimensions``, and a store whose vectors don't match the
+setting is refused at startup rather than failing on every search. Embeddings come
+from Ollama's ``/api/embed``, which returns unit-length vectors; Chroma collections
+filled through the older ``/api/embeddings`` hold unnormalized ones, which would not
+rank against the new query vectors, so they are refused too until converted with
+``python -m app.cli.normalize_embeddings`` (the NumPy store always normalizes).
+
+Both report chunk counts per document and their size on disk, and can be compacted
+online (``app.services.index_maintenance``): queries keep being served while the live
+chunks are rewritten, only writes wait. ``paused_writes()`` gives the same guarantee to
+anything copying the store's files (``app.services.snapshots``).
+"""
+import os
+import threading
+from abc import abstractmethod
+from typing import ContextManager, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from app.config import settings
+
+CHROMA = "chroma"
+NUMPY = "numpy"
+BACKENDS = (CHROMA, NUMPY)
+
+
+class VectorStoreBackend(VectorStore):
+    @abstractmethod
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Upsert chunks whose embeddings were already computed."""
+
+    @abstractmethod
+    def search_by_vectors(
+        self, embeddings: List[List[float]], k: int = 4, filter: Optional[dict] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Top-k hits for every query vector in one call; scores are relevance, higher is better."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of chunks in the store."""
+
+    @abstractmethod
+    def dimensions(self) -> Optional[int]:
+        """Length of the stored vectors (None while the store is empty)."""
+
+    @abstractmethod
+    def has_unnormalized_vectors(self) -> bool:
+        """Whether (a sample of) the stored vectors are not unit-length."""
+
+    @abstractmethod
+    def normalize_vectors(self) -> int:
+        """Rescale every stored vector to unit length; returns how many were rewritten."""
+
+    @abstractmethod
+    def reduce_dimensions(self, dims: int):
+        """Truncate every stored vector to its first `dims` components and renormalize."""
+
+    @abstractmethod
+    def doc_chunk_counts(self) -> Dict[Optional[int], int]:
+        """Number of chunks per ``doc_id`` (None for chunks stored without one)."""
+
+    @abstractmethod
+    def delete_documents(self, doc_ids: List[int]) -> int:
+        """Delete every chunk of the given documents; returns how many were deleted."""
+
+    @abstractmethod
+    def disk_bytes(self) -> int:
+        """Size of the store's files on disk."""
+
+    @abstractmethod
+    def compact(self, vacuum: bool = False) -> Optional[int]:
+        """Rewrite the store without dead entries while serving queries; returns the entries dropped if known."""
+
+    @abstractmethod
+    def paused_writes(self) -> ContextManager[None]:
+        """Hold off writes, with everything written so far on disk; searches continue."""
+
+
+def store_directory(backend: Optional[str] = None) -> str:
+    """Where the configured (or given) backend keeps its files."""
+    return settings.vector_index_dir if (backend or settings.vector_store_backend) == NUMPY else settings.chroma_persist_dir
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # removed while we were walking
+    return total
+
+
+_stores: Dict[Tuple[str, str], VectorStoreBackend] = {}
+_stores_lock = threading.Lock()
+
+
+def open_vector_store(persist_directory: Optional[str] = None, backend: Optional[str] = None) -> VectorStoreBackend:
+    """Open a backend without caching or checking it (get_vector_store is what requests use)."""
+    from app.services.embedding_pool import PooledOllamaEmbeddings
+
+    backend = backend or settings.vector_store_backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector store backend {backend!r}, expected one of {BACKENDS}")
+    if backend == NUMPY:
+        from app.services.numpy_store import NumpyVectorStore
+
+        return NumpyVectorStore(
+            persist_directory or settings.vector_index_dir,
+            PooledOllamaEmbeddings(),
+            quantization=settings.vector_quantization,
+            rescore_factor=settings.vector_rescore_factor,
+            ann=settings.vector_ann_index,
+            nlist=settings.vector_ivf_nlist,
+            nprobe=settings.vector_ivf_nprobe,
+            ann_min_rows=settings.vector_ann_min_chunks,
+            rebuild_growth=settings.vector_ann_rebuild_growth,
+        )
+    from app.services.chroma_store import ChromaVectorStore
+
+    store = ChromaVectorStore(
+        persist_directory=persist_directory or settings.chroma_persist_dir,
+        embedding_function=PooledOllamaEmbeddings(),
+    )
+    if settings.vector_hnsw_ef_search:
+        store.set_search_ef(settings.vector_hnsw_ef_search)
+    return store
+
+
+def check_dimensions(store: VectorStoreBackend):
+    """Refuse a store whose vectors don't have the configured embedding size."""
+    stored, configured = store.dimensions(), settings.embedding_dimensions
+    if configured and stored and stored != configured:
+        raise ValueError(
+            f"The vector store holds {stored}-dim embeddings but EMBEDDING_DIMENSIONS={configured}; "
+            f"convert it with: python -m app.cli.reduce_dimensions --dims {configured}"
+        )
+
+
+def check_normalized(store: VectorStoreBackend):
+    """Refuse a store of unnormalized embeddings, which /api/embed query vectors can't be compared with."""
+    if store.has_unnormalized_vectors():
+        raise ValueError(
+            "The vector store holds unnormalized embeddings (written through Ollama's /api/embeddings); "
+            "convert it with: python -m app.cli.normalize_embeddings"
+        )
+
+
+def get_vector_store(persist_directory: Optional[str] = None, backend: Optional[str] = None) -> VectorStoreBackend:
+    """Open the configured backend once per process instead of on every request."""
+    backend = backend or settings.vector_store_backend
+    with _stores_lock:
+        key = (backend, persist_directory or "")
+        store = _stores.get(key)
+        if store is None:
+            store = open_vector_store(persist_directory, backend)
+            check_dimensions(store)
+            check_normalized(store)
+            _stores[key] = store
+        return store
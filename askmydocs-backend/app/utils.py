@@ -1,76 +1,201 @@
+import asyncio
 import logging
-from typing import List, Tuple
+from typing import AsyncIterator, List, Optional, Tuple
 
-from langchain.prompts import PromptTemplate
-from langchain_community.llms import Ollama
+from langchain_core.documents import Document
 
 from app.config import settings
 from app.schemas import SourceDoc
-from app.services.embeddings_service import get_chroma_client
+from app.services import ollama_client, prompts, resilience, retrieval
+from app.services.admission import AdmissionRejected, get_admission_controller
+from app.services.chat_sessions import ChatSession, chat_sessions
+from app.services.backend_pool import RETRYABLE_ERRORS, NoHealthyBackend, generation_pool
+from app.services.hedging import alternate_backend, hedged_answer, openai_answer
+from app.services.metrics import metrics
+from app.services.resilience import CircuitOpen, DeadlineExceeded, DependencyTimeout
+from app.services.vector_store import VectorStoreBackend, get_vector_store
 
 logger = logging.getLogger(__name__)
 
 
-# Keep the prompt in sync with rag_service to force document-grounded answers.
-CUSTOM_PROMPT = PromptTemplate(
-    input_variables=["context", "question"],
-    template="""You are a helpful assistant that answers questions based ONLY on the provided documents.
+# A batch question turned away by admission control waits Retry-After and tries again this often.
+BATCH_ADMISSION_RETRIES = 3
+# Surfaced as HTTP errors (429/503/504) instead of an "Error: ..." answer.
+PASSTHROUGH_ERRORS = (AdmissionRejected, CircuitOpen, DeadlineExceeded, DependencyTimeout)
+# Ollama failures after which the question goes to the alternate LLM.
+FAILOVER_ERRORS = (CircuitOpen, DependencyTimeout, NoHealthyBackend) + RETRYABLE_ERRORS
+
+
+def scope_filter(document_ids: Optional[List[int]]) -> Optional[dict]:
+    """Vector store pre-filter for a resolved query scope (None = whole collection)."""
+    return None if document_ids is None else {"doc_id": {"$in": document_ids}}
+
+
+def source_documents(docs: List[Document], scores: Optional[List[float]] = None) -> List[SourceDoc]:
+    """Source list for a response, deduplicated by filename."""
+    seen_filenames = set()
+    source_docs = []
+    for i, doc in enumerate(docs):
+        filename = doc.metadata.get("filename", f"document_{i}")
+        if filename not in seen_filenames:
+            seen_filenames.add(filename)
+            source_docs.append(SourceDoc(
+                doc_id=str(doc.metadata.get("doc_id", i)),
+                filename=filename,
+                content=doc.page_content,
+                relevance_score=scores[i] if scores else 0.0,
+            ))
+    return source_docs
+
+
+async def generate_answer(
+    query: str, docs: List[Document], scores: Optional[List[float]] = None, history: str = ""
+) -> Tuple[str, List[SourceDoc], str]:
+    """Answer a question from retrieved chunks with Ollama, on the least busy pool endpoint."""
+    if not docs:
+        # Nothing to ground an answer in: don't spend an LLM slot on it.
+        return prompts.NOT_FOUND_ANSWER, [], "ollama-llama3"
+
+    context = "\n\n".join([doc.page_content for doc in docs])
+    # static instructions as the system prompt, so Ollama reuses their cached prefill
+    if history:
+        prompt = prompts.CONVERSATION
+        text = prompt.render(history=history, context=context, question=query)
+    else:
+        prompt = prompts.RAG
+        text = prompt.render(context=context, question=query)
+    metrics.observe("llm_prompt_tokens", prompts.estimate_tokens(prompt.system) + prompts.estimate_tokens(text))
+
+    if settings.llm_hedging:
+        answer, llm_used = await resilience.within_deadline(hedged_answer(text, prompt.system))
+        return answer, source_documents(docs, scores), llm_used
+
+    try:
+        answer, llm_used = await _generate_on_ollama(text, prompt.system), "ollama-llama3"
+    except FAILOVER_ERRORS as e:
+        if alternate_backend() != "openai":
+            raise
+        logger.warning(f"Ollama unavailable ({e}), failing over to OpenAI")
+        metrics.inc("llm_failovers_total", reason=type(e).__name__)
+        answer, llm_used = await resilience.within_deadline(openai_answer(text, prompt.system))
+
+    return answer, source_documents(docs, scores), llm_used
 
-Context from documents:
-{context}
 
-Question: {question}
+async def _generate_on_ollama(text: str, system: str) -> str:
+    # Use Ollama locally (aligned with embeddings + rag_service)
+    def generate(base_url: str) -> str:
+        return ollama_client.generate(base_url, text, system=system).text
 
-Answer the question using ONLY the information from the documents above. If the answer is not in the documents, say \"I cannot find this information in the provided documents.\" Be direct and concise."""
-)
+    async def call() -> str:
+        async with get_admission_controller("ollama").slot():
+            return await asyncio.to_thread(generation_pool.call, generate)
 
+    return (await resilience.guarded("ollama", call)).strip()
 
-async def ask_hybrid_llm(query: str, model: str = "ollama") -> Tuple[str, List[SourceDoc], str]:
+
+async def ask_hybrid_llm(query: str, model: str = "ollama", document_ids: Optional[List[int]] = None) -> Tuple[str, List[SourceDoc], str]:
     """
     Query the persisted Chroma vector store and answer with Ollama using the same embeddings used on upload.
+    With document_ids, only chunks of those documents are searched (a pre-filter in the vector store).
     Returns: (answer, source_documents, llm_used)
     """
     try:
-        vectordb = get_chroma_client()
-        retriever = vectordb.as_retriever(search_kwargs={"k": 5})
-        docs = retriever.get_relevant_documents(query)
-
-        if docs:
-            context = "\n\n".join([doc.page_content for doc in docs])
-            
-            # Deduplicate source documents by filename
-            seen_filenames = set()
-            source_docs = []
-            for i, doc in enumerate(docs):
-                filename = doc.metadata.get("filename", f"document_{i}")
-                if filename not in seen_filenames:
-                    seen_filenames.add(filename)
-                    source_docs.append(SourceDoc(
-                        doc_id=str(doc.metadata.get("doc_id", i)),
-                        filename=filename,
-                        content=doc.page_content,
-                        relevance_score=0.0,
-                    ))
-        else:
-            context = ""
-            source_docs = []
-
-        prompt = CUSTOM_PROMPT.format(context=context or "No documents found.", question=query)
-
-        # Use Ollama locally (aligned with embeddings + rag_service)
-        llm = Ollama(base_url=settings.ollama_api_url, model="llama3", temperature=0)
-        answer = llm.invoke(prompt).strip()
-
-        if not docs:
-            return "I cannot find this information in the provided documents.", source_docs, "ollama-llama3"
-
-        return answer, source_docs, "ollama-llama3"
-
+        if document_ids is not None and not document_ids:
+            return prompts.NOT_FOUND_ANSWER, [], "ollama-llama3"  # the filters matched no documents
+        # Retrieval and generation block, so run them off the event loop; otherwise
+        # concurrent requests serialize and identical ones can never be coalesced.
+        hits = (await retrieve_batch([query], document_ids))[0]
+        return await generate_answer(query, [doc for doc, _ in hits], [score for _, score in hits])
+
+    except PASSTHROUGH_ERRORS:
+        raise  # surfaced as 429/503/504 (with Retry-After where it helps)
     except Exception as e:
         logger.error(f"Error in ask_hybrid_llm: {e}")
         return f"Error: {str(e)}", [], "error"
 
 
+async def ask_in_session(
+    session: ChatSession, query: str, model: str = "ollama", document_ids: Optional[List[int]] = None
+) -> Tuple[str, List[SourceDoc], str]:
+    """
+    Answer a follow-up question with the session's bounded history in the prompt, then
+    record the turn (older turns are folded into the session summary in the background).
+    """
+    async with session.lock:
+        try:
+            if document_ids is not None and not document_ids:
+                answer, sources, llm_used = prompts.NOT_FOUND_ANSWER, [], "ollama-llama3"
+            else:
+                # retrieve with the previous question too, so "and its price?" finds the right chunks
+                previous = session.last_question()
+                search_text = f"{previous}\n{query}" if previous else query
+                hits = (await retrieve_batch([search_text], document_ids))[0]
+                answer, sources, llm_used = await generate_answer(
+                    query, [doc for doc, _ in hits], [score for _, score in hits], history=session.history()
+                )
+        except PASSTHROUGH_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Error in ask_in_session: {e}")
+            return f"Error: {str(e)}", [], "error"
+        chat_sessions.record_turn(session, query, answer)
+        return answer, sources, llm_used
+
+
+def _embed_queries(vectordb: VectorStoreBackend, queries: List[str]) -> List[List[float]]:
+    embeddings = vectordb.embeddings
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(queries)  # one call on the query lane
+    return [embeddings.embed_query(query) for query in queries]
+
+
+async def retrieve_batch(queries: List[str], document_ids: Optional[List[int]] = None) -> List[List[Tuple[Document, float]]]:
+    """Chunks for many questions: one embedding call and one batched (adaptive) vector search."""
+    if document_ids is not None and not document_ids:
+        return [[] for _ in queries]
+    vectordb = get_vector_store()
+    vectors = await resilience.guarded("embeddings", lambda: asyncio.to_thread(_embed_queries, vectordb, queries))
+    return await resilience.guarded(
+        "vector_store",
+        lambda: asyncio.to_thread(retrieval.adaptive_search_by_vectors, vectordb, vectors, scope_filter(document_ids)),
+    )
+
+
+async def answer_batch(
+    queries: List[str], hits: List[List[Tuple[Document, float]]], concurrency: int = None
+) -> AsyncIterator[Tuple[int, Tuple[str, List[SourceDoc], str]]]:
+    """
+    Generate answers for retrieved questions, at most `concurrency` at a time, yielding
+    (question index, (answer, source_documents, llm_used)) as each one completes.
+    """
+    limit = asyncio.Semaphore(concurrency or settings.query_batch_concurrency)
+
+    async def answer(i: int):
+        docs, scores = [doc for doc, _ in hits[i]], [score for _, score in hits[i]]
+        async with limit:
+            for attempt in range(BATCH_ADMISSION_RETRIES + 1):
+                try:
+                    with resilience.deadline(settings.request_timeout_seconds):
+                        return i, await generate_answer(queries[i], docs, scores)
+                except AdmissionRejected as e:
+                    if attempt == BATCH_ADMISSION_RETRIES:
+                        return i, (f"Error: {e}", [], "error")
+                    await asyncio.sleep(e.retry_after)
+                except Exception as e:
+                    logger.error(f"Error answering batch question {i}: {e}")
+                    return i, (f"Error: {str(e)}", [], "error")
+
+    tasks = [asyncio.create_task(answer(i)) for i in range(len(queries))]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        # the client went away (or we finished): don't leave generations running
+        for task in tasks:
+            task.cancel()
+
+
 async def generate_openai_response(prompt: str, source_docs: List[SourceDoc]) -> Tuple[str, List[SourceDoc], str]:
     """Generate response using OpenAI API"""
     try:
@@ -80,21 +205,25 @@ async def generate_openai_response(prompt: str, source_docs: List[SourceDoc]) ->
             return "OpenAI API key not configured. Please set a valid OPENAI_API_KEY environment variable.", [], "error"
         
         # Initialize OpenAI client
-        client = OpenAI(api_key=settings.openai_api_key)
+        client = OpenAI(api_key=settings.openai_api_key, timeout=resilience.timeout_for("openai"))
         
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that answers questions based on provided documents. Keep your answers concise and accurate."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=150,
-            temperature=0.1
-        )
+        async with get_admission_controller("openai").slot():
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that answers questions based on provided documents. Keep your answers concise and accurate."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=150,
+                temperature=0.1
+            )
         
         answer = response.choices[0].message.content.strip()
         return answer, source_docs, "openai-gpt-3.5-turbo"
         
+    except AdmissionRejected:
+        raise
     except ImportError:
         return "OpenAI library not installed. Please install: pip install openai", [], "error"
     except Exception as e:
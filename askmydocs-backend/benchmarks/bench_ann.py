@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark the IVF index against exact search.
+
+Loads the same synthetic clustered corpus as bench_quantization.py into the NumPy
+store, builds its IVF index and sweeps nprobe, reporting query latency and recall@k
+against exact search at each setting (the recall vs latency curve), plus the build time.
+
+    python benchmarks/bench_ann.py --chunks 1000000 --queries 200 --quantization int8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import ivf_index as ivf  # noqa: E402
+from app.services import quantization as q  # noqa: E402
+from app.services.numpy_store import NumpyVectorStore  # noqa: E402
+from bench_quantization import make_corpus, make_queries, recall, run  # noqa: E402
+
+
+def build(path: str, vectors: np.ndarray, quantization: str, nlist: int) -> NumpyVectorStore:
+    # ann_min_rows is out of reach so loading doesn't trigger background builds; we build once at the end.
+    store = NumpyVectorStore(path, embedding_function=None, quantization=quantization, ann=ivf.IVF, nlist=nlist, ann_min_rows=len(vectors) + 1)
+    batch = 20000
+    for start in range(0, len(vectors), batch):
+        chunk = vectors[start:start + batch]
+        ids = [str(i) for i in range(start, start + len(chunk))]
+        store.add_embeddings(ids, chunk, ids=ids)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = store default (about 2 * sqrt(chunks))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64, 128])
+    parser.add_argument("--quantization", choices=q.MODES, default=q.NONE)
+    args = parser.parse_args()
+
+    print(f"📦 Generating {args.chunks} x {args.dim} corpus ({args.clusters} clusters)...")
+    vectors, _, rng = make_corpus(args.chunks, args.dim, args.clusters)
+    queries = make_queries(vectors, rng, args.queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = build(tmp, vectors, args.quantization, args.nlist)
+
+        run(store, queries[:5], args.k)  # warm the page cache
+        latencies, baseline = run(store, queries, args.k)
+        rows = [("exact", np.percentile(latencies, 50), np.percentile(latencies, 95), 1.0)]
+
+        start = time.perf_counter()
+        store.rebuild_index(wait=True)
+        status = store.index_status()
+        print(f"🔨 Built IVF index ({status['nlist']} lists) in {time.perf_counter() - start:.1f}s")
+
+        for nprobe in args.nprobe:
+            if nprobe >= status["nlist"]:
+                break
+            store.nprobe = nprobe
+            run(store, queries[:5], args.k)
+            latencies, results = run(store, queries, args.k)
+            rows.append((f"nprobe={nprobe}", np.percentile(latencies, 50), np.percentile(latencies, 95), recall(results, baseline, args.k)))
+        store.close()
+
+    exact_p50 = rows[0][1]
+    print(f"\n{'search':<12} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'recall@' + str(args.k):>9}")
+    for name, p50, p95, rec in rows:
+        print(f"{name:<12} {p50:>8.2f} {p95:>8.2f} {exact_p50 / p50:>7.1f}x {rec:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark the blob storage upload path.
+
+Runs N concurrent uploads of an S MB file through two paths and reports wall time
+and the worst event-loop stall (how long a 5 ms heartbeat task was kept waiting,
+i.e. how long every other request on the server would have been frozen):
+
+* before - what upload_file used to do: a synchronous upload on the event loop thread
+  (with Azure also a new client and a create_container call per upload)
+* after  - app.services.blob_storage: async, one shared client, parallel blocks
+
+Offline it uses the local filesystem backend; pass an Azure (or Azurite) connection
+string to measure the real service.
+
+    python benchmarks/bench_blob_storage.py --uploads 20 --size-mb 8
+    python benchmarks/bench_blob_storage.py --connection-string "UseDevelopmentStorage=true"
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.blob_storage import AzureBlobStorage, LocalBlobStorage  # noqa: E402
+
+HEARTBEAT = 0.005
+
+
+async def heartbeat(stalls: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT)
+        stalls.append(time.perf_counter() - start - HEARTBEAT)
+
+
+def old_local_upload(path: str, root: str):
+    shutil.copyfile(path, os.path.join(root, f"{uuid.uuid4()}_doc.pdf"))
+
+
+def old_azure_upload(path: str, connection_string: str, container: str):
+    from azure.storage.blob import BlobServiceClient
+
+    blob_service = BlobServiceClient.from_connection_string(connection_string)
+    try:
+        blob_service.create_container(container)
+    except Exception:
+        pass
+    blob_client = blob_service.get_blob_client(container=container, blob=f"{uuid.uuid4()}_doc.pdf")
+    with open(path, "rb") as data:
+        blob_client.upload_blob(data, overwrite=True)
+
+
+async def measure(upload, uploads: int):
+    stalls, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(stalls, stop))
+    await asyncio.sleep(HEARTBEAT * 2)
+    start = time.perf_counter()
+    await asyncio.gather(*(upload() for _ in range(uploads)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return elapsed, max(stalls) if stalls else 0.0
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "doc.pdf")
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.size_mb * 2**20))
+
+        if args.connection_string:
+            storage = AzureBlobStorage(args.connection_string, args.container, args.max_concurrency, args.block_size_mb * 2**20)
+
+            async def before():
+                old_azure_upload(path, args.connection_string, args.container)
+        else:
+            root = os.path.join(tmp, "uploads")
+            storage = LocalBlobStorage(root)
+
+            async def before():
+                old_local_upload(path, root)
+
+        await storage.start()
+
+        async def after():
+            await storage.upload_file(path, "doc.pdf")
+
+        backend = "azure" if args.connection_string else "local"
+        print(f"📤 {args.uploads} concurrent uploads of {args.size_mb} MB ({backend})")
+        rows = []
+        for name, upload in (("before", before), ("after", after)):
+            await upload()  # warm-up
+            elapsed, stall = await measure(upload, args.uploads)
+            rows.append((name, elapsed, stall))
+        await storage.close()
+
+    total_mb = args.uploads * args.size_mb
+    print(f"\n{'path':<8} {'wall s':>8} {'MB/s':>8} {'max loop stall ms':>18}")
+    for name, elapsed, stall in rows:
+        print(f"{name:<8} {elapsed:>8.2f} {total_mb / elapsed:>8.1f} {stall * 1000:>18.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--size-mb", type=int, default=8)
+    parser.add_argument("--connection-string", default="")
+    parser.add_argument("--container", default="bench-documents")
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--block-size-mb", type=int, default=4)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark document row scans and listing with inline vs separately stored text.
+
+Loads N documents of S KB of text for one user into two schemas and times:
+
+* scan    - select(Document) for all of the user's documents (what any ORM query does)
+* listing - one page of GET /documents (50 rows)
+* text    - loading and decompressing one document's full text (after only)
+
+before - the old documents table with an inline ``content`` Text column
+after  - documents + compressed document_contents (app.models)
+
+Uses a temporary SQLite file by default; pass a synchronous SQLAlchemy URL
+(e.g. postgresql+psycopg2://...) of an empty database to measure Postgres.
+
+    python benchmarks/bench_document_text.py --documents 2000 --size-kb 100
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, Integer, String, Text, create_engine, func, select  # noqa: E402
+from sqlalchemy.orm import Session, declarative_base  # noqa: E402
+
+from app.crud import documents_page_query  # noqa: E402
+from app.models import Base, Document, DocumentContent, User  # noqa: E402
+
+LegacyBase = declarative_base()
+
+
+class LegacyDocument(LegacyBase):
+    __tablename__ = "legacy_documents"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    blob_url = Column(String, nullable=False)
+    title = Column(String, nullable=True)
+    content = Column(Text, nullable=True)
+
+
+def make_text(size_kb: int, rng: random.Random) -> str:
+    vocabulary = [f"{rng.choice('bcdfghklmnprst')}{rng.choice('aeiou')}{rng.choice('nrstl')}{i % 97}" for i in range(5000)]
+    words, size = [], 0
+    while size < size_kb * 1024:
+        word = rng.choice(vocabulary)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def timed(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def load(engine, documents: int, size_kb: int):
+    rng = random.Random(0)
+    texts = [make_text(size_kb, rng) for _ in range(min(documents, 50))]
+    with Session(engine) as db:
+        db.add(User(id=1, name="bench", email="bench@example.com", password="x"))
+        db.commit()
+        for start in range(0, documents, 200):
+            batch = range(start, min(start + 200, documents))
+            db.add_all(LegacyDocument(user_id=1, filename=f"doc{i}.txt", blob_url="local://x", content=texts[i % len(texts)]) for i in batch)
+            db.add_all(
+                Document(user_id=1, filename=f"doc{i}.txt", blob_url="local://x", content=DocumentContent.from_text(texts[i % len(texts)]))
+                for i in batch
+            )
+            db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--database-url", default="")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        LegacyBase.metadata.create_all(engine)
+        print(f"📄 Loading {args.documents} documents of {args.size_kb} KB ({engine.dialect.name})")
+        load(engine, args.documents, args.size_kb)
+
+        with Session(engine) as db:
+            inline_bytes = db.scalar(select(func.sum(func.length(LegacyDocument.content))))
+            stored_bytes = db.scalar(select(func.sum(func.length(DocumentContent.data))))
+            last_id = db.scalar(select(func.max(Document.id)))
+
+            def scan(model):
+                return lambda: (db.scalars(select(model).where(model.user_id == 1)).all(), db.expunge_all())
+
+            def legacy_page():
+                db.scalars(select(LegacyDocument).where(LegacyDocument.user_id == 1).order_by(LegacyDocument.id.desc()).limit(50)).all()
+                db.expunge_all()
+
+            def text_of_one():
+                db.scalars(select(DocumentContent).where(DocumentContent.document_id == last_id)).one().text
+                db.expunge_all()
+
+            rows = [
+                ("before", timed(scan(LegacyDocument), args.repeats), timed(legacy_page, args.repeats), None),
+                (
+                    "after",
+                    timed(scan(Document), args.repeats),
+                    timed(lambda: db.execute(documents_page_query(1, 50)).all(), args.repeats),
+                    timed(text_of_one, args.repeats),
+                ),
+            ]
+        engine.dispose()
+
+    print(f"   text stored: {inline_bytes / 2**20:.1f} MB inline, {stored_bytes / 2**20:.1f} MB compressed "
+          f"({inline_bytes / stored_bytes:.1f}×)")
+    print(f"\n{'schema':<8} {'scan ms':>10} {'listing ms':>11} {'one text ms':>12}")
+    for name, scan_s, page_s, text_s in rows:
+        text_ms = f"{text_s * 1000:>12.2f}" if text_s is not None else f"{'-':>12}"
+        print(f"{name:<8} {scan_s * 1000:>10.1f} {page_s * 1000:>11.2f} {text_ms}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark truncated embeddings: recall lost against search time saved.
+
+For each dimension count the corpus and the queries are truncated and renormalized
+(as with EMBEDDING_DIMENSIONS), loaded into the NumPy store and searched exactly;
+recall@k is measured against search over the full vectors.
+
+By default the corpus is synthetic: clustered like bench_quantization.py, with the
+per-dimension variance decaying the way Matryoshka-trained models (nomic-embed-text
+v1.5) concentrate signal in the leading dimensions. Plain random vectors would spread
+it evenly and overstate the loss. With --corpus the sample documents are embedded
+through Ollama instead, and the first sentence of sampled chunks serves as the queries:
+
+    python benchmarks/bench_embedding_dimensions.py --chunks 200000 --dims 768,512,256,128
+    python benchmarks/bench_embedding_dimensions.py --corpus test_documents test_pdf_documents
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings  # noqa: E402
+from app.services import quantization as q  # noqa: E402
+from app.services.numpy_store import NumpyVectorStore  # noqa: E402
+from bench_quantization import build, make_queries, recall, run  # noqa: E402
+
+
+def make_matryoshka_corpus(chunks: int, dim: int, clusters: int, seed: int = 0):
+    """Clustered vectors whose j-th dimension carries scale ~ 1/(j+1)."""
+    rng = np.random.default_rng(seed)
+    decay = (1.0 / np.arange(1, dim + 1)).astype(np.float32)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32) * decay
+    labels = rng.integers(0, clusters, size=chunks)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(chunks, dim)).astype(np.float32) * decay
+    return q.normalize(vectors), rng
+
+
+def embed_sample_corpus(directories, count: int, seed: int = 0):
+    """Chunk and embed the sample documents at full size; queries are chunks' first sentences."""
+    from app.services.embedding_pool import PooledOllamaEmbeddings
+    from app.services.embeddings_service import split_into_chunks
+    from app.services.extraction import extract_file, is_supported
+
+    settings.embedding_dimensions = 0  # the baseline needs the untruncated vectors
+    texts = []
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            if is_supported(name):
+                chunks, _, _ = split_into_chunks(0, extract_file(os.path.join(directory, name)), {})
+                texts.extend(chunks)
+    if not texts:
+        raise SystemExit(f"❌ No supported documents in {', '.join(directories)}")
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(texts), size=min(count, len(texts)), replace=False)
+    questions = [texts[i].split(". ")[0] for i in picks]
+
+    embeddings = PooledOllamaEmbeddings()
+    vectors = q.normalize(np.asarray(embeddings.embed_documents(texts), dtype=np.float32))
+    queries = q.normalize(np.asarray(embeddings.embed_queries(questions), dtype=np.float32))
+    return vectors, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dims", default="768,512,256,128", help="comma-separated dimension counts to compare")
+    parser.add_argument("--corpus", nargs="+", help="embed these document directories via Ollama instead of a synthetic corpus")
+    args = parser.parse_args()
+
+    if args.corpus:
+        print(f"📦 Embedding the documents in {', '.join(args.corpus)}...")
+        vectors, queries = embed_sample_corpus(args.corpus, args.queries)
+    else:
+        print(f"📦 Generating {args.chunks} x {args.dim} Matryoshka-like corpus ({args.clusters} clusters)...")
+        vectors, rng = make_matryoshka_corpus(args.chunks, args.dim, args.clusters)
+        queries = make_queries(vectors, rng, args.queries)
+    full = vectors.shape[1]
+    dims = sorted({min(int(d), full) for d in args.dims.split(",")} | {full}, reverse=True)
+    k = min(args.k, len(vectors))
+
+    rows = []
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for d in dims:
+            store: NumpyVectorStore = build(os.path.join(tmp, str(d)), q.NONE, q.truncate(vectors, d), rescore_factor=1)
+            reduced = q.truncate(queries, d)
+            run(store, reduced[:5], k)  # warm the page cache
+            latencies, results = run(store, reduced, k)
+            if baseline is None:
+                baseline = results
+            rows.append((d, store._vectors[:store._size].nbytes, np.percentile(latencies, 50), np.percentile(latencies, 95), recall(results, baseline, k)))
+            store.close()
+
+    base_bytes, base_p50 = rows[0][1], rows[0][2]
+    print(f"\n{'dims':>5} {'index MB':>9} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'recall@' + str(k):>9}")
+    for d, nbytes, p50, p95, rec in rows:
+        print(f"{d:>5} {nbytes / 2**20:>9.1f} {p50:>8.2f} {p95:>8.2f} {base_p50 / p50:>7.2f}x {rec:>9.3f}")
+    print(f"\n(full-size index: {base_bytes / 2**20:.1f} MB; recall is against search over all {full} dimensions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark doc_id pre-filtered search in the NumPy store.
+
+Loads the synthetic corpus from bench_quantization.py as documents of
+--chunks-per-doc chunks each, then compares query latency over the whole corpus
+with searches restricted to 1, 10 and 100 documents (what a QueryRequest with
+document_ids / filename / date filters turns into). The filtered searches resolve the
+allowed rows through the chunks table's doc_id index and score only those rows.
+
+    python benchmarks/bench_filtered_search.py --chunks 200000 --quantization int8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import quantization as q  # noqa: E402
+from app.services.numpy_store import NumpyVectorStore  # noqa: E402
+from bench_quantization import make_corpus, make_queries  # noqa: E402
+
+
+def build(path: str, vectors: np.ndarray, quantization: str, chunks_per_doc: int) -> NumpyVectorStore:
+    store = NumpyVectorStore(path, embedding_function=None, quantization=quantization)
+    batch = 20000
+    for start in range(0, len(vectors), batch):
+        chunk = vectors[start:start + batch]
+        ids = [str(i) for i in range(start, start + len(chunk))]
+        metadatas = [{"doc_id": i // chunks_per_doc} for i in range(start, start + len(chunk))]
+        store.add_embeddings(ids, chunk, metadatas, ids=ids)
+    return store
+
+
+def run(store: NumpyVectorStore, queries: np.ndarray, k: int, documents: int, total_docs: int, rng) -> np.ndarray:
+    latencies = []
+    for query in queries:
+        search_filter = None
+        if documents:
+            search_filter = {"doc_id": {"$in": rng.choice(total_docs, size=documents, replace=False).tolist()}}
+        start = time.perf_counter()
+        store.search_by_vectors([query], k, filter=search_filter)
+        latencies.append(time.perf_counter() - start)
+    return np.asarray(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--chunks-per-doc", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--quantization", choices=q.MODES, default=q.NONE)
+    args = parser.parse_args()
+
+    print(f"📦 Generating {args.chunks} x {args.dim} corpus ({args.chunks // args.chunks_per_doc} documents)...")
+    vectors, _, rng = make_corpus(args.chunks, args.dim, args.clusters)
+    queries = make_queries(vectors, rng, args.queries)
+    total_docs = args.chunks // args.chunks_per_doc
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store = build(tmp, vectors, args.quantization, args.chunks_per_doc)
+        for name, documents in (("whole corpus", 0), ("1 document", 1), ("10 documents", 10), ("100 documents", 100)):
+            pick = np.random.default_rng(1)
+            run(store, queries[:5], args.k, documents, total_docs, pick)  # warm the page cache
+            latencies = run(store, queries, args.k, documents, total_docs, pick)
+            rows.append((name, np.percentile(latencies, 50), np.percentile(latencies, 95)))
+        store.close()
+
+    full_p50 = rows[0][1]
+    print(f"\n{'search':<15} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+    for name, p50, p95 in rows:
+        print(f"{name:<15} {p50:>8.2f} {p95:>8.2f} {full_p50 / p50:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark prefill time with and without prompt-prefix reuse on a live Ollama.
+
+Sends the same N grounded questions (each with its own synthetic retrieved context)
+in three layouts and reports the prompt tokens Ollama evaluated and the prefill time
+(prompt_eval_duration) per request, generating a single token so prefill dominates:
+
+* no reuse    - registry layout, but a unique marker at the start of every system
+                prompt, so nothing can be taken from the cache
+* old layout  - the former CUSTOM_PROMPT as one prompt, with the instructions split
+                around the documents and question
+* registry    - app.services.prompts: static instructions as the system prompt, first
+
+    python benchmarks/bench_prompt_prefix.py --base-url http://localhost:11434 --questions 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import ollama_client, prompts  # noqa: E402
+
+OLD_TEMPLATE = """You are a helpful assistant that answers questions based ONLY on the provided documents.
+
+Context from documents:
+{context}
+
+Question: {question}
+
+Answer the question using ONLY the information from the documents above. If the answer is not in the documents, say "I cannot find this information in the provided documents." Be direct and concise."""
+
+
+def make_context(rng: random.Random, words: int) -> str:
+    vocabulary = ["revenue", "contract", "policy", "quarter", "customer", "invoice", "renewal", "clause", "budget", "team"]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def run(base_url: str, model: str, requests):
+    tokens, seconds = [], []
+    ollama_client.generate(base_url, *requests[0], model=model, num_predict=1)  # warm-up
+    for prompt, system in requests:
+        result = ollama_client.generate(base_url, prompt, system=system, model=model, num_predict=1)
+        tokens.append(result.prompt_tokens)
+        seconds.append(result.prompt_seconds)
+    return statistics.mean(tokens), statistics.median(seconds) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:11434")
+    parser.add_argument("--model", default="llama3")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--context-words", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    items = [(make_context(rng, args.context_words), f"What does document {i} say about renewals?") for i in range(args.questions)]
+    layouts = [
+        ("no reuse", [(prompts.RAG.render(context=c, question=q), f"[{uuid.uuid4()}]\n{prompts.RAG.system}") for c, q in items]),
+        ("old layout", [(OLD_TEMPLATE.format(context=c, question=q), "") for c, q in items]),
+        ("registry", [(prompts.RAG.render(context=c, question=q), prompts.RAG.system) for c, q in items]),
+    ]
+
+    print(f"🧠 {args.questions} questions with {args.context_words}-word contexts on {args.model} ({args.base_url})")
+    rows = [(name, *run(args.base_url, args.model, requests)) for name, requests in layouts]
+
+    baseline = rows[0][2]
+    print(f"\n{'layout':<12} {'evaluated tokens':>17} {'prefill ms p50':>15} {'speedup':>8}")
+    for name, tokens, prefill_ms in rows:
+        print(f"{name:<12} {tokens:>17.0f} {prefill_ms:>15.1f} {baseline / prefill_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark quantized vector search against the float32 baseline.
+
+Builds a synthetic clustered corpus (shaped like nomic-embed-text output: 768 dims,
+unit length), loads it into NumpyVectorStore in each quantization mode and reports
+index memory, query latency and recall@5 against exact float32 search.
+
+    python benchmarks/bench_quantization.py --chunks 200000 --queries 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import quantization as q  # noqa: E402
+from app.services.numpy_store import NumpyVectorStore  # noqa: E402
+
+
+def make_corpus(chunks: int, dim: int, clusters: int, seed: int = 0):
+    """Topic clusters plus per-chunk noise, so neighbours are close but not trivial."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=chunks)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(chunks, dim)).astype(np.float32)
+    return q.normalize(vectors), centers, rng
+
+
+def make_queries(vectors: np.ndarray, rng, count: int):
+    picks = rng.integers(0, len(vectors), size=count)
+    noise = 0.3 * rng.normal(size=(count, vectors.shape[1])).astype(np.float32)
+    return q.normalize(vectors[picks] + noise)
+
+
+def index_bytes(store: NumpyVectorStore) -> int:
+    """Bytes that must stay resident to serve searches (the scanned matrix)."""
+    size = store._size
+    if store.quantization == q.NONE:
+        return store._vectors[:size].nbytes
+    total = store._codes[:size].nbytes
+    if store._scales is not None:
+        total += store._scales[:size].nbytes
+    return total
+
+
+def build(path: str, mode: str, vectors: np.ndarray, rescore_factor: int) -> NumpyVectorStore:
+    store = NumpyVectorStore(path, embedding_function=None, quantization=mode, rescore_factor=rescore_factor)
+    batch = 20000
+    for start in range(0, len(vectors), batch):
+        chunk = vectors[start:start + batch]
+        ids = [str(i) for i in range(start, start + len(chunk))]
+        store.add_embeddings(ids, chunk, ids=ids)
+    return store
+
+
+def run(store: NumpyVectorStore, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = store._search(query[None, :], k)[0]
+        latencies.append(time.perf_counter() - start)
+        results.append([row for row, _ in hits])
+    return np.asarray(latencies) * 1000, results
+
+
+def recall(results, baseline, k: int) -> float:
+    return float(np.mean([len(set(r[:k]) & set(b[:k])) / k for r, b in zip(results, baseline)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"📦 Generating {args.chunks} x {args.dim} corpus ({args.clusters} clusters)...")
+    vectors, _, rng = make_corpus(args.chunks, args.dim, args.clusters)
+    queries = make_queries(vectors, rng, args.queries)
+
+    rows = []
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in q.MODES:
+            store = build(os.path.join(tmp, mode), mode, vectors, args.rescore_factor)
+            run(store, queries[:5], args.k)  # warm the page cache
+            latencies, results = run(store, queries, args.k)
+            if baseline is None:
+                baseline = results
+            rows.append((mode, index_bytes(store), np.percentile(latencies, 50), np.percentile(latencies, 95), recall(results, baseline, args.k)))
+            store.close()
+
+    base_bytes = rows[0][1]
+    print(f"\n{'mode':<9} {'index MB':>9} {'vs f32':>7} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(args.k):>9}")
+    for mode, nbytes, p50, p95, rec in rows:
+        print(f"{mode:<9} {nbytes / 2**20:>9.1f} {nbytes / base_bytes:>6.0%} {p50:>8.2f} {p95:>8.2f} {rec:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
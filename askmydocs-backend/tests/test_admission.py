@@ -0,0 +1,105 @@
+"""
+Test cases for LLM admission control and backpressure
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.metrics import metrics
+
+
+def make_controller(max_concurrency=1, max_queue=1, queue_timeout=1.0):
+    return AdmissionController("test", max_concurrency, max_queue, queue_timeout, retry_after=7)
+
+
+class TestAdmissionController:
+    """Test the concurrency limit and bounded wait queue"""
+
+    def setup_method(self):
+        metrics.reset()
+
+    def test_concurrency_is_limited(self):
+        controller = make_controller(max_concurrency=2, max_queue=10)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with controller.slot():
+                peak = max(peak, controller.active)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(*(call() for _ in range(6)))
+
+        asyncio.run(run())
+        assert peak == 2
+        assert controller.active == 0
+        assert controller.queue_depth == 0
+
+    def test_full_queue_is_rejected_with_429(self):
+        controller = make_controller(max_concurrency=1, max_queue=1)
+
+        async def run():
+            await controller.acquire()           # takes the only slot
+            waiter = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)               # waiter is now queued
+            with pytest.raises(AdmissionRejected) as excinfo:
+                await controller.acquire()
+            controller.release()                 # hands the slot to the waiter
+            await waiter
+            controller.release()
+            return excinfo.value
+
+        rejected = asyncio.run(run())
+        assert rejected.status_code == 429
+        assert rejected.retry_after == 7
+        assert metrics.get("llm_rejected_total", backend="test", reason="queue_full") == 1
+
+    def test_queue_deadline_is_rejected_with_503(self):
+        controller = make_controller(max_concurrency=1, max_queue=5, queue_timeout=0.02)
+
+        async def run():
+            await controller.acquire()
+            with pytest.raises(AdmissionRejected) as excinfo:
+                await controller.acquire()
+            return excinfo.value
+
+        rejected = asyncio.run(run())
+        assert rejected.status_code == 503
+        assert controller.queue_depth == 0
+
+    def test_waiters_are_served_in_order(self):
+        controller = make_controller(max_concurrency=1, max_queue=5)
+        order = []
+
+        async def call(i):
+            async with controller.slot():
+                order.append(i)
+                await asyncio.sleep(0.005)
+
+        async def run():
+            tasks = []
+            for i in range(4):
+                tasks.append(asyncio.ensure_future(call(i)))
+                await asyncio.sleep(0)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        assert order == [0, 1, 2, 3]
+
+    def test_queue_wait_is_recorded(self):
+        controller = make_controller(max_concurrency=1, max_queue=5)
+
+        async def call():
+            async with controller.slot():
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(call(), call())
+
+        asyncio.run(run())
+        summary = metrics.snapshot()["summaries"]['llm_queue_wait_seconds{backend="test"}']
+        assert summary["count"] == 2
+        assert summary["max"] > 0
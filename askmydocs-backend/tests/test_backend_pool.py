@@ -0,0 +1,130 @@
+"""
+Test cases for the load-balanced Ollama backend pool
+"""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+import requests
+
+from app.services.backend_pool import BackendPool, parse_urls
+
+
+def make_pool(n=3, **kwargs):
+    return BackendPool("test", [f"http://ollama-{i}:11434" for i in range(n)], **kwargs)
+
+
+class TestBackendPool:
+    """Test balancing, ejection and failover"""
+
+    def test_parse_urls_falls_back_to_default(self):
+        assert parse_urls("", "http://ollama:11434/") == ["http://ollama:11434"]
+        assert parse_urls("http://a:1/, http://b:2", "http://ollama:11434") == ["http://a:1", "http://b:2"]
+
+    def test_least_outstanding_endpoint_is_chosen(self):
+        pool = make_pool(3)
+        with pool.lease() as first, pool.lease() as second, pool.lease(weight=5) as third:
+            assert len({first.url, second.url, third.url}) == 3
+            with pool.lease() as fourth:
+                # third carries weight 5, so it is the last choice
+                assert fourth.url != third.url
+
+    def test_idle_endpoints_are_used_round_robin(self):
+        pool = make_pool(3)
+        used = []
+        for _ in range(6):
+            with pool.lease() as ep:
+                used.append(ep.url)
+        assert set(used) == set(pool.urls)
+
+    def test_failing_endpoint_is_ejected_and_retried_elsewhere(self):
+        pool = make_pool(2, failure_threshold=1, ejection_seconds=60)
+        bad = pool.urls[0]
+        calls = []
+
+        def fn(url):
+            calls.append(url)
+            if url == bad:
+                raise requests.exceptions.ConnectionError("refused")
+            return url
+
+        results = [pool.call(fn) for _ in range(4)]
+
+        assert all(r == pool.urls[1] for r in results)
+        assert calls.count(bad) == 1
+        assert pool.endpoints[0].healthy is False
+
+    def test_ejected_endpoint_returns_after_success(self):
+        pool = make_pool(2, failure_threshold=1, ejection_seconds=0)
+        ep = pool.endpoints[0]
+        pool.mark_failure(ep)
+        assert not ep.healthy
+        # ejection has already expired, so the endpoint is eligible for a trial request
+        pool.mark_success(ep)
+        assert ep.healthy
+
+    def test_non_connection_errors_are_not_retried(self):
+        pool = make_pool(2)
+        calls = []
+
+        def fn(url):
+            calls.append(url)
+            raise ValueError("bad prompt")
+
+        with pytest.raises(ValueError):
+            pool.call(fn)
+        assert len(calls) == 1
+
+    def test_client_errors_do_not_eject(self):
+        pool = make_pool(2, failure_threshold=1, ejection_seconds=60)
+        request = httpx.Request("POST", f"{pool.urls[0]}/api/generate")
+
+        def status(code):
+            return httpx.HTTPStatusError(f"{code}", request=request, response=httpx.Response(code, request=request))
+
+        for error in (status(400), status(404), ValueError("bad prompt")):
+            with pytest.raises(type(error)):
+                with pool.lease():
+                    raise error
+        assert all(ep.healthy and ep.total_failures == 0 for ep in pool.endpoints)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            with pool.lease():
+                raise status(503)
+        assert sum(not ep.healthy for ep in pool.endpoints) == 1
+
+    def test_cancelled_request_does_not_eject(self):
+        pool = make_pool(1, failure_threshold=1, ejection_seconds=60)
+
+        async def hedged_loser():
+            with pool.lease():
+                await asyncio.sleep(10)
+
+        async def main():
+            task = asyncio.create_task(hedged_loser())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        ep = pool.endpoints[0]
+        assert ep.healthy and ep.total_failures == 0 and ep.outstanding == 0
+
+    def test_outstanding_is_released_across_threads(self):
+        pool = make_pool(2)
+
+        def work():
+            for _ in range(200):
+                with pool.lease():
+                    pass
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert all(ep.outstanding == 0 for ep in pool.endpoints)
+        assert sum(ep.total_requests for ep in pool.endpoints) == 800
@@ -0,0 +1,64 @@
+"""
+Test cases for the blob storage backends
+"""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import blob_storage
+from app.services.blob_storage import LocalBlobStorage, NoBlobStorage, create_blob_storage
+
+
+class TestLocalBlobStorage:
+    """Test the filesystem backend"""
+
+    def test_upload_copies_file_under_unique_name(self, tmp_path):
+        source = tmp_path / "report.pdf"
+        source.write_bytes(b"%PDF data")
+        storage = LocalBlobStorage(str(tmp_path / "uploads"))
+
+        async def run():
+            await storage.start()
+            return [await storage.upload_file(str(source), "report.pdf") for _ in range(2)]
+
+        urls = asyncio.run(run())
+        assert urls[0] != urls[1]
+        assert all(url.startswith("local://uploads/") and url.endswith("_report.pdf") for url in urls)
+        stored = sorted(p.name for p in (tmp_path / "uploads").iterdir())
+        assert stored == sorted(url.rsplit("/", 1)[1] for url in urls)
+        assert (tmp_path / "uploads" / stored[0]).read_bytes() == b"%PDF data"
+
+
+class TestFactory:
+    """Test backend selection"""
+
+    def test_auto_keeps_no_copy_without_connection_string(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings, "azure_storage_connection_string", "")
+        monkeypatch.setattr(settings, "blob_local_dir", str(tmp_path / "uploads"))
+        storage = create_blob_storage("auto")
+        assert isinstance(storage, NoBlobStorage)
+        source = tmp_path / "upload.tmp"
+        source.write_bytes(b"%PDF data")
+        assert asyncio.run(storage.upload_file(str(source), "report.pdf")) == "local://uploads/report.pdf"
+        assert not (tmp_path / "uploads").exists()
+
+    def test_local_is_opt_in(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings, "blob_local_dir", str(tmp_path / "uploads"))
+        assert isinstance(create_blob_storage("local"), LocalBlobStorage)
+
+    @pytest.mark.skipif(not blob_storage.AZURE_AVAILABLE, reason="azure-storage-blob not installed")
+    def test_auto_uses_azure_with_connection_string(self, monkeypatch):
+        monkeypatch.setattr(
+            settings,
+            "azure_storage_connection_string",
+            "DefaultEndpointsProtocol=https;AccountName=test;AccountKey=dGVzdA==;EndpointSuffix=core.windows.net",
+        )
+        storage = create_blob_storage("auto")
+        assert isinstance(storage, blob_storage.AzureBlobStorage)
+        asyncio.run(storage.close())
+
+    def test_unknown_backend_is_rejected(self):
+        with pytest.raises(ValueError):
+            create_blob_storage("s3")
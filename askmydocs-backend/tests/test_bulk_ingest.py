@@ -0,0 +1,191 @@
+"""
+Test cases for the bulk ingestion CLI: source walking, checkpoints and resume
+"""
+
+import asyncio
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from app.cli import bulk_ingest
+from app.cli.bulk_ingest import DONE, FAILED, Checkpoint, ingest, store_documents
+from app.services import embeddings_service
+from app.services.extraction import SourceFile, extract_file, iter_sources
+
+FILES = {
+    "a.txt": "alpha document",
+    "notes/b.md": "# beta notes",
+    "notes/deep/c.txt": "gamma text",
+    "image.png": "not a document",
+}
+SUPPORTED = ["a.txt", "notes/b.md", "notes/deep/c.txt"]
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    root = tmp_path / "docs"
+    for name, text in FILES.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    return root
+
+
+def make_zip(tmp_path):
+    path = tmp_path / "docs.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, text in FILES.items():
+            archive.writestr(name, text)
+    return path
+
+
+def make_tar(tmp_path):
+    path = tmp_path / "docs.tar.gz"
+    with tarfile.open(path, "w:gz") as archive:
+        for name, text in FILES.items():
+            data = text.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+class FakeStore:
+    """Records stored batches and hands out document ids"""
+
+    def __init__(self, fail_after=None):
+        self.batches = []
+        self.fail_after = fail_after
+
+    async def __call__(self, files):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            raise RuntimeError("embedding endpoint down")
+        self.batches.append([(f.key, text) for f, text in files])
+        start = sum(len(b) for b in self.batches) - len(files)
+        return [(start + i + 1, 1) for i in range(len(files))]
+
+
+class TestSources:
+    """Test walking directories and archives"""
+
+    def test_directory_yields_supported_files_in_order(self, source_dir, tmp_path):
+        assert [f.key for f in iter_sources(str(source_dir), str(tmp_path))] == SUPPORTED
+
+    @pytest.mark.parametrize("make_archive", [make_zip, make_tar])
+    def test_archives_yield_the_same_files(self, make_archive, tmp_path):
+        scratch = tmp_path / "scratch"
+        scratch.mkdir()
+        files = list(iter_sources(str(make_archive(tmp_path)), str(scratch)))
+        assert sorted(f.key for f in files) == SUPPORTED
+        assert all(f.temporary for f in files)
+        assert {f.key: extract_file(f.path) for f in files}["notes/deep/c.txt"] == "gamma text"
+
+    def test_skipped_files_are_not_yielded(self, source_dir, tmp_path):
+        keys = [f.key for f in iter_sources(str(source_dir), str(tmp_path), skip={"a.txt"})]
+        assert keys == SUPPORTED[1:]
+
+    def test_unknown_source_is_rejected(self, tmp_path):
+        path = tmp_path / "docs.rar"
+        path.write_text("?")
+        with pytest.raises(ValueError):
+            list(iter_sources(str(path), str(tmp_path)))
+
+
+class TestCheckpoint:
+    """Test checkpoint persistence"""
+
+    def test_last_record_per_key_wins(self, tmp_path):
+        path = str(tmp_path / "checkpoint.jsonl")
+        checkpoint = Checkpoint(path)
+        checkpoint.record([{"key": "a", "status": FAILED}, {"key": "b", "status": DONE}])
+        checkpoint.record([{"key": "a", "status": DONE}])
+        assert Checkpoint(path).done == {"a", "b"}
+
+    def test_truncated_line_is_ignored(self, tmp_path):
+        path = tmp_path / "checkpoint.jsonl"
+        path.write_text(json.dumps({"key": "a", "status": DONE}) + '\n{"key": "b", "sta')
+        assert Checkpoint(str(path)).done == {"a"}
+
+
+class TestIngest:
+    """Test batching and resume"""
+
+    def test_files_are_stored_in_batches(self, source_dir, tmp_path):
+        store = FakeStore()
+        checkpoint = Checkpoint(str(tmp_path / "checkpoint.jsonl"))
+        stats = asyncio.run(ingest(str(source_dir), checkpoint, store, batch_files=2, workers=1))
+        assert [len(b) for b in store.batches] == [2, 1]
+        assert dict(store.batches[0])["a.txt"] == "alpha document"
+        assert stats["done"] == 3 and stats["chunks"] == 3
+        assert checkpoint.done == set(SUPPORTED)
+
+    def test_interrupted_run_resumes_without_redoing_files(self, source_dir, tmp_path):
+        path = str(tmp_path / "checkpoint.jsonl")
+        with pytest.raises(RuntimeError):
+            asyncio.run(ingest(str(source_dir), Checkpoint(path), FakeStore(fail_after=1), batch_files=2, workers=1))
+        assert Checkpoint(path).done == set(SUPPORTED[:2])
+
+        store = FakeStore()
+        stats = asyncio.run(ingest(str(source_dir), Checkpoint(path), store, batch_files=2, workers=1))
+        assert store.batches == [[("notes/deep/c.txt", "gamma text")]]
+        assert stats["done"] == 1 and stats["skipped"] == 2
+        assert Checkpoint(path).done == set(SUPPORTED)
+
+
+class FakeSession:
+    """Documents table of one session: rows become visible to later runs on commit"""
+
+    def __init__(self, committed):
+        self.committed = committed
+        self.pending = []
+
+    def add_all(self, docs):
+        self.pending += docs
+
+    async def flush(self):
+        for doc in self.pending:
+            doc.id = len(self.committed) + self.pending.index(doc) + 1
+
+    async def commit(self):
+        self.committed += self.pending
+        self.pending = []
+
+
+class ChunkStore:
+    def __init__(self):
+        self.chunks = {}
+        self.fail = False
+
+    def add_texts(self, texts, metadatas, ids):
+        if self.fail:
+            raise ConnectionError("embedding endpoint down")
+        self.chunks.update(zip(ids, texts))
+
+
+class TestStoreDocuments:
+    """Test that a batch interrupted anywhere is repaired by resuming, without duplicates"""
+
+    def test_crash_between_commit_and_upsert(self, monkeypatch):
+        committed, chunks = [], ChunkStore()
+
+        async def ids_by_url(db, user_id, urls):
+            return {doc.blob_url: doc.id for doc in committed if doc.blob_url in urls}
+
+        monkeypatch.setattr(bulk_ingest, "document_ids_by_blob_url", ids_by_url)
+        monkeypatch.setattr(embeddings_service, "get_vector_store", lambda: chunks)
+        files = [(SourceFile(key, key, key), text) for key, text in [("a.txt", "alpha document"), ("b.txt", "beta notes")]]
+
+        chunks.fail = True  # crash after the Document rows are committed
+        with pytest.raises(ConnectionError):
+            asyncio.run(store_documents(FakeSession(committed), 1, files))
+        assert len(committed) == 2 and chunks.chunks == {}
+
+        chunks.fail = False  # resumed: the rows are reused and their chunks stored
+        assert asyncio.run(store_documents(FakeSession(committed), 1, files)) == [(1, 1), (2, 1)]
+        # done again (the checkpoint write was lost): same ids, chunks overwritten
+        assert asyncio.run(store_documents(FakeSession(committed), 1, files)) == [(1, 1), (2, 1)]
+        assert len(committed) == 2
+        assert chunks.chunks == {"1_0": "alpha document", "2_0": "beta notes"}
@@ -0,0 +1,158 @@
+"""
+Test cases for chat sessions: bounded history, rolling summaries and LRU eviction
+"""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import chat_sessions as cs
+from app.services.chat_sessions import ChatSession, SessionStore, compact, estimate_tokens
+
+
+@pytest.fixture(autouse=True)
+def budget(monkeypatch):
+    monkeypatch.setattr(settings, "chat_history_token_budget", 100)
+    monkeypatch.setattr(settings, "chat_summary_token_budget", 20)
+    monkeypatch.setattr(settings, "chat_max_recent_turns", 4)
+
+
+def session_with_turns(count, words=10):
+    session = ChatSession("s")
+    for i in range(count):
+        session.add_turn(f"question {i}", " ".join([f"answer{i}"] * words))
+    return session
+
+
+class TestHistory:
+    """Test the history put into prompts"""
+
+    def test_recent_turns_are_verbatim(self):
+        history = session_with_turns(2, words=2).history()
+        assert history == "User: question 0\nAssistant: answer0 answer0\n\nUser: question 1\nAssistant: answer1 answer1"
+
+    def test_history_stays_within_budget(self):
+        session = session_with_turns(50)
+        session.summary = "word " * 200
+        history = session.history()
+        assert estimate_tokens(history) <= settings.chat_history_token_budget + 10  # + joiners and label
+        assert history.endswith("answer49")
+        assert "question 45" not in history
+
+    def test_summary_comes_first(self):
+        session = session_with_turns(1, words=1)
+        session.summary = "user asked about invoices"
+        assert session.history().startswith("Summary of the earlier conversation: user asked about invoices\n\nUser: question 0")
+
+
+class TestCompaction:
+    """Test folding old turns into the summary"""
+
+    def test_oldest_turns_are_folded(self, monkeypatch):
+        calls = []
+
+        async def fake_summarize(summary, turns):
+            calls.append((summary, [q for q, _, _ in turns]))
+            return "summary of " + ", ".join(q for q, _, _ in turns)
+
+        monkeypatch.setattr(cs, "_summarize", fake_summarize)
+        session = session_with_turns(6)
+        assert session.needs_compaction()
+        asyncio.run(compact(session))
+        folded = calls[0][1]
+        assert folded == [f"question {i}" for i in range(len(folded))]
+        assert [q for q, _, _ in session.turns] == [f"question {i}" for i in range(len(folded), 6)]
+        assert session.summary.startswith("summary of question 0")
+        assert not session.needs_compaction()
+
+    def test_failed_summary_keeps_turns(self, monkeypatch):
+        async def failing(summary, turns):
+            raise RuntimeError("ollama down")
+
+        monkeypatch.setattr(cs, "_summarize", failing)
+        session = session_with_turns(6)
+        asyncio.run(compact(session))
+        assert len(session.turns) == 6 and session.summary == ""
+        assert not session.compacting
+
+    def test_stored_turns_are_capped(self):
+        session = session_with_turns(20, words=1)
+        assert len(session.turns) == cs.MAX_STORED_TURNS_FACTOR * settings.chat_max_recent_turns
+        assert session.turns[-1][0] == "question 19"
+
+
+class TestSessionStore:
+    """Test LRU and idle eviction"""
+
+    def test_least_recently_used_session_is_evicted(self):
+        store = SessionStore(max_sessions=2, idle_seconds=60)
+        first, second = store.create(), store.create()
+        assert store.get(first.id) is first  # first is now the most recent
+        store.create()
+        assert store.get(second.id) is None
+        assert store.get(first.id) is first
+
+    def test_idle_sessions_expire(self, monkeypatch):
+        store = SessionStore(max_sessions=10, idle_seconds=60)
+        session = store.create()
+        now = cs.time.monotonic()
+        monkeypatch.setattr(cs.time, "monotonic", lambda: now + 61)
+        assert store.get(session.id) is None
+        assert len(store) == 0
+
+    def test_recording_a_turn_compacts_in_the_background(self, monkeypatch):
+        async def fake_summarize(summary, turns):
+            return "summary"
+
+        monkeypatch.setattr(cs, "_summarize", fake_summarize)
+        store = SessionStore(max_sessions=10, idle_seconds=60)
+
+        async def run():
+            session = store.create()
+            for i in range(6):
+                store.record_turn(session, f"question {i}", "long answer " * 10)
+            await asyncio.gather(*store._tasks)
+            return session
+
+        session = asyncio.run(run())
+        assert session.summary == "summary"
+        assert not session.needs_compaction()
+
+
+class TestSessionOwner:
+    """Test that a session is only visible to the principal that created it"""
+
+    def test_other_principal_sees_no_session(self):
+        store = SessionStore(max_sessions=10, idle_seconds=60)
+        session = store.create("user:1")
+        assert store.get(session.id, "user:2") is None
+        assert not store.delete(session.id, "user:2")
+        assert store.get(session.id, "user:1") is session
+        assert store.delete(session.id, "user:1")
+        assert len(store) == 0
+
+    def test_endpoints_return_404_to_other_principals(self, monkeypatch):
+        from fastapi import HTTPException
+
+        from app.api import chat
+        from app.schemas import QueryRequest
+
+        async def no_limit(principal, cost=1):
+            pass
+
+        store = SessionStore(max_sessions=10, idle_seconds=60)
+        monkeypatch.setattr(chat, "chat_sessions", store)
+        monkeypatch.setattr(chat, "check_request", no_limit)
+        session_id = asyncio.run(chat.create_session("user:1")).session_id
+
+        calls = [
+            chat.get_session(session_id, "ip:10.0.0.2"),
+            chat.delete_session(session_id, "user:2"),
+            chat.query_docs(QueryRequest(query="q", session_id=session_id), None, "user:2", None),
+        ]
+        for call in calls:
+            with pytest.raises(HTTPException) as e:
+                asyncio.run(call)
+            assert e.value.status_code == 404
+        assert asyncio.run(chat.get_session(session_id, "user:1")).session_id == session_id
@@ -0,0 +1,88 @@
+"""
+Test cases for compressed, separately stored document text
+"""
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+
+from app.database import move_inline_content
+from app.models import Base, Document, DocumentContent, User
+from app.services import text_compression
+from app.services.text_compression import compress_text, decompress_text
+
+LONG_TEXT = "The quarterly report covers revenue, churn and hiring. " * 200
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(User(id=1, name="A", email="a@example.com", password="x"))
+        db.commit()
+    return engine
+
+
+class TestCompression:
+    """Test the codec-prefixed text encoding"""
+
+    def test_zlib_round_trip(self):
+        data = compress_text(LONG_TEXT, "zlib")
+        assert data[:1] == text_compression.ZLIB and len(data) < len(LONG_TEXT) / 10
+        assert decompress_text(data) == LONG_TEXT
+
+    @pytest.mark.skipif(not text_compression.ZSTD_AVAILABLE, reason="zstandard not installed")
+    def test_zstd_round_trip(self):
+        data = compress_text(LONG_TEXT, "zstd")
+        assert data[:1] == text_compression.ZSTD
+        assert decompress_text(data) == LONG_TEXT
+
+    def test_short_text_is_stored_raw(self):
+        data = compress_text("naïve café", "zlib")
+        assert data[:1] == text_compression.RAW
+        assert decompress_text(data) == "naïve café"
+
+    def test_unknown_codec_is_rejected(self):
+        with pytest.raises(ValueError):
+            compress_text(LONG_TEXT, "lz4")
+        with pytest.raises(ValueError):
+            decompress_text(b"\x7fdata")
+
+
+class TestDocumentContent:
+    """Test the document_contents table"""
+
+    def test_text_is_stored_with_its_document(self, engine):
+        with Session(engine) as db:
+            db.add(Document(user_id=1, filename="a.txt", blob_url="local://a", content=DocumentContent.from_text(LONG_TEXT)))
+            db.commit()
+        with Session(engine) as db:
+            content = db.scalars(select(DocumentContent)).one()
+            assert content.text == LONG_TEXT
+            assert len(content.data) < len(LONG_TEXT)
+
+    def test_loading_documents_never_loads_text(self, engine):
+        assert "content" not in Document.__table__.columns
+        with Session(engine) as db:
+            db.add(Document(user_id=1, filename="a.txt", blob_url="local://a", content=DocumentContent.from_text(LONG_TEXT)))
+            db.commit()
+        with Session(engine) as db:
+            doc = db.scalars(select(Document)).one()
+            with pytest.raises(InvalidRequestError):
+                doc.content
+
+
+class TestMigration:
+    """Test moving the old inline column into document_contents"""
+
+    def test_inline_content_is_moved_and_column_dropped(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE documents ADD COLUMN content TEXT"))
+            conn.execute(text("INSERT INTO documents (id, user_id, filename, blob_url, content) VALUES (1, 1, 'a', 'u', :t), (2, 1, 'b', 'u', NULL)"), {"t": LONG_TEXT})
+            move_inline_content(conn)
+            move_inline_content(conn)  # idempotent
+            assert "content" not in {column["name"] for column in inspect(conn).get_columns("documents")}
+        with Session(engine) as db:
+            assert [(c.document_id, c.text) for c in db.scalars(select(DocumentContent))] == [(1, LONG_TEXT)]
@@ -0,0 +1,129 @@
+"""
+Test cases for the keyset-paginated document listing
+"""
+
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.crud import document_scope_query, documents_page_query, glob_to_like, list_documents
+from app.models import Document, User
+from app.schemas import QueryRequest
+
+
+def compile_sql(query) -> str:
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(query)
+        return FakeResult(self.rows)
+
+
+class Row:
+    def __init__(self, id):
+        self.id = id
+
+
+class TestPageQuery:
+    """Test the SQL behind GET /documents"""
+
+    def test_first_page(self):
+        sql = compile_sql(documents_page_query(user_id=7, limit=50))
+        assert "documents.user_id = 7" in sql
+        assert "ORDER BY documents.id DESC" in sql
+        assert "LIMIT 51" in sql
+        assert "OFFSET" not in sql
+
+    def test_cursor_is_a_keyset_condition(self):
+        sql = compile_sql(documents_page_query(user_id=7, limit=50, before_id=1234))
+        assert "documents.id < 1234" in sql
+        assert "OFFSET" not in sql
+
+    def test_content_is_never_selected(self):
+        sql = compile_sql(documents_page_query(user_id=7, limit=50))
+        assert "documents.content" not in sql
+        assert "documents.title" in sql
+
+    def test_backed_by_composite_index(self):
+        indexes = {index.name: [column.name for column in index.columns] for index in Document.__table__.indexes}
+        assert indexes["ix_documents_user_id_id"] == ["user_id", "id"]
+
+
+class TestListDocuments:
+    """Test next-cursor handling"""
+
+    def test_next_cursor_when_more_rows(self):
+        session = FakeSession([Row(i) for i in (9, 8, 7)])
+        rows, cursor = asyncio.run(list_documents(session, user_id=1, limit=2))
+        assert [row.id for row in rows] == [9, 8]
+        assert cursor == 8
+
+    def test_last_page_has_no_cursor(self):
+        session = FakeSession([Row(i) for i in (2, 1)])
+        rows, cursor = asyncio.run(list_documents(session, user_id=1, limit=2, before_id=3))
+        assert [row.id for row in rows] == [2, 1]
+        assert cursor is None
+
+
+class TestQueryScope:
+    """Test resolving QueryRequest filters to document ids"""
+
+    def test_globs_become_escaped_like_patterns(self):
+        assert glob_to_like("report_*.pdf") == "report\\_%.pdf"
+        assert glob_to_like("100%?.txt") == "100\\%_.txt"
+
+    def test_all_filters_are_combined(self):
+        query = document_scope_query(
+            document_ids=[1, 2],
+            filename_patterns=["*.pdf", "notes*"],
+            uploaded_after=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            uploaded_before=datetime(2024, 2, 1, tzinfo=timezone.utc),
+        )
+        sql = compile_sql(query)
+        assert sql.startswith("SELECT documents.id")
+        assert "documents.id IN (1, 2)" in sql
+        assert sql.count("documents.filename ILIKE") == 2 and " OR " in sql
+        params = list(query.compile(dialect=postgresql.dialect()).params.values())
+        assert "%.pdf" in params and "notes%" in params
+        assert "documents.uploaded_at >= '2024-01-01 00:00:00+00:00'" in sql
+        assert "documents.uploaded_at < '2024-02-01 00:00:00+00:00'" in sql
+
+    def test_scope_can_be_limited_to_one_owner(self):
+        sql = compile_sql(document_scope_query(filename_patterns=["*.pdf"], user_id=7))
+        assert "documents.user_id = 7" in sql
+
+    def test_signed_in_callers_only_match_their_own_documents(self, monkeypatch):
+        from app.api import chat
+
+        resolved = []
+
+        async def resolve(db, **scope):
+            resolved.append(scope)
+            return [1]
+
+        monkeypatch.setattr(chat, "resolve_document_scope", resolve)
+        request = QueryRequest(query="q", filename_patterns=["*.pdf"])
+        scope, ids = asyncio.run(chat._document_scope(None, request, User(id=7, email="a@example.com")))
+        assert resolved == [{"filename_patterns": ["*.pdf"], "user_id": 7}] and scope == resolved[0] and ids == [1]
+        asyncio.run(chat._document_scope(None, request, None))  # anonymous questions search every document
+        assert resolved[1] == {"filename_patterns": ["*.pdf"]}
+        assert asyncio.run(chat._document_scope(None, QueryRequest(query="q"), User(id=7))) == ({}, None)
+
+    def test_date_filter_is_indexed(self):
+        indexes = {index.name: [column.name for column in index.columns] for index in Document.__table__.indexes}
+        assert indexes["ix_documents_uploaded_at"] == ["uploaded_at"]
@@ -0,0 +1,66 @@
+"""
+Test cases for the pooled, two-lane embedding client
+"""
+
+import threading
+
+import pytest
+
+from app.services import embedding_pool as ep
+from app.services.embedding_pool import PooledOllamaEmbeddings
+
+
+class FakeEmbedder:
+    """Records /api/embed calls instead of talking to Ollama"""
+
+    def __init__(self):
+        self.calls = []
+        self.threads = []
+
+    def __call__(self, base_url, texts):
+        self.calls.append(list(texts))
+        self.threads.append(threading.current_thread().name)
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class TestPooledOllamaEmbeddings:
+    """Test batching and lane separation"""
+
+    def test_documents_are_embedded_in_batches_in_order(self, monkeypatch):
+        fake = FakeEmbedder()
+        monkeypatch.setattr(ep, "_embed_on", fake)
+        texts = [f"chunk {i}" * (i + 1) for i in range(10)]
+
+        vectors = PooledOllamaEmbeddings(batch_size=4).embed_documents(texts)
+
+        assert [len(c) for c in fake.calls] == [4, 4, 2]
+        assert vectors == [[float(len("passage: " + t)), 1.0] for t in texts]
+        assert all(name.startswith("embed-ingest") for name in fake.threads)
+
+    def test_queries_bypass_the_ingest_lane(self, monkeypatch):
+        fake = FakeEmbedder()
+        monkeypatch.setattr(ep, "_embed_on", fake)
+
+        PooledOllamaEmbeddings().embed_query("what is fastapi?")
+
+        assert fake.calls == [["query: what is fastapi?"]]
+        assert fake.threads == [threading.current_thread().name]
+
+    def test_query_batches_use_one_call(self, monkeypatch):
+        fake = FakeEmbedder()
+        monkeypatch.setattr(ep, "_embed_on", fake)
+
+        vectors = PooledOllamaEmbeddings().embed_queries(["a", "b", "c"])
+
+        assert len(fake.calls) == 1
+        assert len(vectors) == 3
+
+    def test_empty_input(self, monkeypatch):
+        monkeypatch.setattr(ep, "_embed_on", FakeEmbedder())
+        assert PooledOllamaEmbeddings().embed_documents([]) == []
+
+    def test_vectors_are_truncated_when_configured(self, monkeypatch):
+        monkeypatch.setattr(ep, "_embed_on", lambda url, texts: [[3.0, 4.0, 12.0] for _ in texts])
+        monkeypatch.setattr(ep.settings, "embedding_dimensions", 2)
+        assert PooledOllamaEmbeddings().embed_documents(["a"])[0] == pytest.approx([0.6, 0.8])
+        assert PooledOllamaEmbeddings().embed_query("a") == pytest.approx([0.6, 0.8])
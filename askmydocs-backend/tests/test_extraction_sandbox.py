@@ -0,0 +1,99 @@
+"""
+Test cases for pluggable extractors and sandboxed extraction with resource limits
+"""
+
+import os
+import signal
+import time
+
+import pytest
+
+from app.services import extraction
+from app.services.extraction_sandbox import RLIMITS_AVAILABLE, extract_sandboxed
+
+
+# Misbehaving "formats"; module-level so the sandbox workers can import them.
+@extraction.register_extractor("spin")
+def spin(path):
+    yield "page one"
+    while True:
+        pass
+
+
+@extraction.register_extractor("hog")
+def hog(path):
+    yield "page one"
+    yield str(len(bytearray(8 * 2**30)))
+
+
+@extraction.register_extractor("slow")
+def slow(path):
+    yield "page one"
+    time.sleep(60)
+
+
+@extraction.register_extractor("crash")
+def crash(path):
+    yield "page one"
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+@extraction.register_extractor("broken")
+def broken(path):
+    raise ValueError("not a document")
+    yield
+
+
+def touch(tmp_path, name, text=""):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+class TestExtractors:
+    """Test the extractor registry"""
+
+    def test_html_text_without_scripts(self, tmp_path):
+        path = touch(tmp_path, "page.html", "<html><script>var x;</script><h1>Title</h1><p>Body text</p></html>")
+        assert extraction.extract_text(path, "html") == "Title\nBody text"
+
+    def test_registered_format_is_supported(self):
+        assert extraction.is_supported("report.SPIN")
+        assert not extraction.is_supported("image.png")
+
+
+class TestSandbox:
+    """Test limits, partial salvage and failure reporting"""
+
+    def test_text_file(self, tmp_path):
+        result = extract_sandboxed(touch(tmp_path, "notes.md", "# hello"))
+        assert (result.text, result.complete, result.error) == ("# hello", True, None)
+
+    def test_unsupported_file_has_no_text(self, tmp_path):
+        result = extract_sandboxed(touch(tmp_path, "image.png", "binary"))
+        assert result.text == "" and result.complete
+
+    @pytest.mark.skipif(not RLIMITS_AVAILABLE, reason="no rlimits on this platform")
+    def test_cpu_limit_keeps_partial_text(self, tmp_path):
+        result = extract_sandboxed(touch(tmp_path, "doc.spin"), cpu_seconds=1, timeout=30)
+        assert (result.text, result.complete, result.error) == ("page one", False, "CPU time limit exceeded")
+
+    @pytest.mark.skipif(not RLIMITS_AVAILABLE, reason="no rlimits on this platform")
+    def test_memory_limit_keeps_partial_text(self, tmp_path):
+        result = extract_sandboxed(touch(tmp_path, "doc.hog"), memory_mb=512)
+        assert (result.text, result.complete, result.error) == ("page one", False, "memory limit exceeded")
+
+    def test_wall_clock_limit(self, tmp_path):
+        start = time.monotonic()
+        result = extract_sandboxed(touch(tmp_path, "doc.slow"), timeout=1)
+        assert time.monotonic() - start < 10
+        assert result.text == "page one" and not result.complete
+        assert result.error.startswith("timed out")
+
+    def test_killed_worker_is_reported(self, tmp_path):
+        result = extract_sandboxed(touch(tmp_path, "doc.crash"))
+        assert result.text == "page one" and "SIGKILL" in result.error
+
+    def test_extractor_exception_is_reported(self, tmp_path):
+        result = extract_sandboxed(touch(tmp_path, "doc.broken"))
+        assert (result.text, result.complete, result.error) == ("", False, "ValueError: not a document")
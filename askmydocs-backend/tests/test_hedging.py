@@ -0,0 +1,133 @@
+"""
+Test cases for hedged LLM requests
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from app.services import hedging, ollama_client
+from app.services.metrics import metrics
+
+
+def stream(pieces, first_token_after=0.0, fail=None, log=None, name=None):
+    async def generate():
+        try:
+            await asyncio.sleep(first_token_after)
+            if fail:
+                raise fail
+            for piece in pieces:
+                yield piece
+                await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(name)
+            raise
+    return generate
+
+
+class TestHedgedGenerate:
+    """Test when a hedge is sent, who wins and that the loser is cancelled"""
+
+    def setup_method(self):
+        metrics.reset()
+
+    def test_fast_primary_sends_no_hedge(self):
+        result = asyncio.run(hedging.hedged_generate(
+            ("ollama", stream(["4", "2"])), ("openai", stream(["no"])), delay=0.5,
+        ))
+        assert result == ("42", "ollama")
+        assert metrics.get("llm_hedge_requests_total") == 1
+        assert metrics.get("llm_hedges_total", backend="openai") == 0
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        cancelled = []
+        result = asyncio.run(hedging.hedged_generate(
+            ("ollama", stream(["slow"], first_token_after=5, log=cancelled, name="ollama")),
+            ("openai", stream(["fast"])),
+            delay=0.05,
+        ))
+        assert result == ("fast", "openai")
+        assert cancelled == ["ollama"]
+        assert metrics.get("llm_hedges_total", backend="openai") == 1
+        assert metrics.get("llm_hedge_wins_total", winner="alternate", backend="openai") == 1
+
+    def test_primary_can_still_win_after_hedging(self):
+        cancelled = []
+        result = asyncio.run(hedging.hedged_generate(
+            ("ollama", stream(["primary"], first_token_after=0.1)),
+            ("openai", stream(["alternate"], first_token_after=5, log=cancelled, name="openai")),
+            delay=0.05,
+        ))
+        assert result == ("primary", "ollama")
+        assert cancelled == ["openai"]
+        assert metrics.get("llm_hedge_wins_total", winner="primary", backend="ollama") == 1
+
+    def test_failed_primary_hedges_immediately(self):
+        async def run():
+            start = asyncio.get_running_loop().time()
+            result = await hedging.hedged_generate(
+                ("ollama", stream([], fail=ConnectionError("down"))), ("openai", stream(["ok"])), delay=5,
+            )
+            return result, asyncio.get_running_loop().time() - start
+
+        result, elapsed = asyncio.run(run())
+        assert result == ("ok", "openai") and elapsed < 1
+
+    def test_without_alternate_waits_for_primary(self):
+        result = asyncio.run(hedging.hedged_generate(("ollama", stream(["late"], first_token_after=0.1)), None, delay=0.01))
+        assert result == ("late", "ollama")
+        assert metrics.get("llm_hedges_total", backend="openai") == 0
+
+    def test_both_failing_raises(self):
+        async def run():
+            return await hedging.hedged_generate(
+                ("ollama", stream([], fail=ConnectionError("down"))),
+                ("openai", stream([], fail=RuntimeError("also down"))),
+                delay=0.01,
+            )
+
+        try:
+            asyncio.run(run())
+        except RuntimeError as e:
+            assert str(e) == "also down"
+        else:
+            raise AssertionError("expected the alternate's error")
+
+
+class TestAlternateBackend:
+    """Test which alternate backend can be hedged to"""
+
+    def test_openai_needs_an_api_key(self, monkeypatch):
+        monkeypatch.setattr(hedging.settings, "llm_hedge_backend", "openai")
+        monkeypatch.setattr(hedging.settings, "openai_api_key", "sk-dummy-key")
+        assert hedging.alternate_backend() is None
+        monkeypatch.setattr(hedging.settings, "openai_api_key", "sk-real")
+        assert hedging.alternate_backend() == "openai"
+
+    def test_ollama_needs_a_second_endpoint(self, monkeypatch):
+        monkeypatch.setattr(hedging.settings, "llm_hedge_backend", "ollama")
+        monkeypatch.setattr(hedging.generation_pool, "endpoints", hedging.generation_pool.endpoints[:1])
+        assert hedging.alternate_backend() is None
+
+
+class TestStreamGenerate:
+    """Test the streaming /api/generate call"""
+
+    def test_yields_pieces_and_records_prompt_tokens(self, monkeypatch):
+        metrics.reset()
+        lines = [{"response": "4"}, {"response": "2"}, {"response": "", "done": True, "prompt_eval_count": 7}]
+
+        def handler(request):
+            assert json.loads(request.content)["stream"] is True
+            return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+
+        client = httpx.AsyncClient
+        monkeypatch.setattr(httpx, "AsyncClient", lambda **kw: client(transport=httpx.MockTransport(handler), **kw))
+
+        async def collect():
+            return [piece async for piece in ollama_client.stream_generate("http://ollama:11434", "Q?")]
+
+        assert asyncio.run(collect()) == ["4", "2"]
+        assert metrics.get("llm_prompt_eval_tokens_total", backend="ollama") == 7
@@ -0,0 +1,217 @@
+"""
+Test cases for vector index stats and online compaction
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import User
+from app.routers.auth_router import get_admin_user
+from app.services import index_maintenance
+from app.services import quantization as q
+from app.services.chroma_store import ChromaVectorStore
+from app.services.numpy_store import NumpyVectorStore
+from tests.test_vector_store import KeywordEmbeddings, clustered, write_during_copy
+
+
+def fill(store, rows=3000, docs=30):
+    vectors = clustered(rows)
+    ids = [str(i) for i in range(rows)]
+    store.add_embeddings(ids, vectors.tolist(), [{"doc_id": i % docs} for i in range(rows)], ids)
+    return vectors
+
+
+class TestNumpyCompaction:
+    """Test compacting the NumPy store"""
+
+    def test_deleted_rows_are_dropped_and_results_kept(self, tmp_path):
+        store = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings())
+        vectors = fill(store)
+        store.delete([str(i) for i in range(0, 3000, 2)])
+        queries = clustered(20, seed=11).tolist()
+        before = [[(d.id, round(s, 5)) for d, s in hits] for hits in store.search_by_vectors(queries, k=5)]
+        size_before = store.disk_bytes()
+
+        assert store.compact() == 1500
+        assert store.count() == 1500
+        assert store.disk_bytes() < size_before
+        assert [[(d.id, round(s, 5)) for d, s in hits] for hits in store.search_by_vectors(queries, k=5)] == before
+
+        store.add_embeddings(["new"], [vectors[1].tolist()], [{"doc_id": 99}], ["new"])
+        assert {d.id for d, _ in store.search_by_vectors([vectors[1].tolist()], k=2)[0]} == {"1", "new"}
+        store.close()
+        reopened = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings())
+        assert reopened.count() == 1501
+        assert [[(d.id, round(s, 5)) for d, s in hits] for hits in reopened.search_by_vectors(queries, k=5)] == before
+        reopened.close()
+
+    def test_quantized_store_with_ivf_index(self, tmp_path):
+        store = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings(), quantization=q.INT8, ann="ivf", nlist=16, nprobe=16, ann_min_rows=10**6)
+        fill(store)
+        store.rebuild_index(wait=True)
+        store.delete([str(i) for i in range(1000)])
+        queries = clustered(10, seed=12).tolist()
+        before = [[d.id for d, _ in hits] for hits in store.search_by_vectors(queries, k=5)]
+        store.compact(vacuum=True)
+        assert store.index_status()["built"]
+        assert [[d.id for d, _ in hits] for hits in store.search_by_vectors(queries, k=5)] == before
+        store.close()
+
+    def test_searches_during_compaction_see_consistent_rows(self, tmp_path):
+        store = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings())
+        vectors = fill(store, rows=20000)
+        store.delete([str(i) for i in range(0, 20000, 3)])
+        kept = [i for i in range(20000) if i % 3][:50]
+        compaction = threading.Thread(target=store.compact)
+        compaction.start()
+        while compaction.is_alive():
+            hits = store.search_by_vectors(vectors[kept].tolist(), k=1)
+            assert [h[0][0].id for h in hits] == [str(i) for i in kept]
+        compaction.join()
+        store.close()
+
+    def test_nothing_to_compact(self, tmp_path):
+        store = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings())
+        assert store.compact() == 0
+        fill(store, rows=100)
+        assert store.compact() == 0
+        store.close()
+
+    def test_chunks_are_counted_and_deleted_by_document(self, tmp_path):
+        store = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings())
+        fill(store, rows=300, docs=3)
+        assert store.doc_chunk_counts() == {0: 100, 1: 100, 2: 100}
+        assert store.delete_documents([1, 7]) == 100
+        assert store.doc_chunk_counts() == {0: 100, 2: 100}
+        store.close()
+
+
+class TestChromaCompaction:
+    """Test compacting the Chroma collection"""
+
+    def test_collection_is_rewritten(self, tmp_path):
+        store = ChromaVectorStore(persist_directory=str(tmp_path / "chroma"), embedding_function=KeywordEmbeddings())
+        vectors = fill(store, rows=500, docs=5)
+        assert store.delete_documents([0, 1]) == 200
+        assert store.doc_chunk_counts() == {2: 100, 3: 100, 4: 100}
+        queries = vectors[2:5].tolist()
+        before = [[d.id for d, _ in hits] for hits in store.search_by_vectors(queries, k=3)]
+        store.compact(vacuum=True)
+        assert store.count() == 300
+        assert [[d.id for d, _ in hits] for hits in store.search_by_vectors(queries, k=3)] == before
+        assert store.disk_bytes() > 0
+
+    def test_uploads_during_compaction_are_kept(self, tmp_path):
+        store = ChromaVectorStore(persist_directory=str(tmp_path / "chroma"), embedding_function=KeywordEmbeddings())
+        store.add_texts([f"python docker {i}" for i in range(50)], [{"doc_id": i % 5} for i in range(50)])
+        upload = lambda: store.add_texts(["vector search"], [{"doc_id": 7}], ["late"])
+        writer, outcome = write_during_copy(store, upload)
+        store.compact()
+        writer.join()
+        assert outcome == {"ids": ["late"]}
+        assert store.count() == 51
+        assert store._collection.get(ids=["late"])["ids"] == ["late"]
+
+    def test_search_on_the_dropped_collection_is_retried(self, tmp_path):
+        store = ChromaVectorStore(persist_directory=str(tmp_path / "chroma"), embedding_function=KeywordEmbeddings())
+        vectors = fill(store, rows=300, docs=3)
+        old = store._collection
+
+        class CompactedMidSearch:
+            """The old collection, dropped by a compaction after a search picked it"""
+
+            def __getattr__(self, name):
+                return getattr(old, name)
+
+            def query(self, **kwargs):
+                store.compact()
+                return old.query(**kwargs)
+
+        store._collection = CompactedMidSearch()
+        hits = store.search_by_vectors(vectors[:2].tolist(), k=3)
+        assert [[d.id for d, _ in h][0] for h in hits] == ["0", "1"]
+        assert store._collection is not old and store.count() == 300
+
+    @pytest.mark.parametrize("renamed", [0, 1, 2])
+    def test_interrupted_rewrite_is_recovered_on_open(self, tmp_path, renamed):
+        from chromadb.api.client import SharedSystemClient
+
+        directory = str(tmp_path / "chroma")
+        store = ChromaVectorStore(persist_directory=directory, embedding_function=KeywordEmbeddings())
+        fill(store, rows=200, docs=4)
+        old, client = store._collection, store._client
+        copy = old.get(include=["embeddings", "documents", "metadatas"])
+        staging = client.create_collection(f"{old.name}_rewrite")
+        # stopped mid-copy (0), after the old collection was renamed away (1), or just before dropping it (2)
+        rows = 50 if renamed == 0 else 200
+        staging.add(ids=copy["ids"][:rows], embeddings=copy["embeddings"][:rows], metadatas=copy["metadatas"][:rows])
+        if renamed:
+            old.modify(name=f"{old.name}_replaced")
+        if renamed == 2:
+            staging.modify(name="langchain")
+        del store, old, staging
+        SharedSystemClient.clear_system_cache()
+
+        reopened = ChromaVectorStore(persist_directory=directory, embedding_function=KeywordEmbeddings())
+        assert reopened._collection_names() == ["langchain"]
+        assert reopened.count() == 200
+        assert reopened.doc_chunk_counts() == {0: 50, 1: 50, 2: 50, 3: 50}
+        SharedSystemClient.clear_system_cache()
+
+
+class TestIndexStats:
+    """Test the stats and compaction service"""
+
+    @pytest.fixture
+    def store(self, tmp_path, monkeypatch):
+        store = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings())
+        fill(store, rows=60, docs=6)  # documents 0-5, 10 chunks each
+        store.add_embeddings(["legacy chunk"], clustered(1, seed=13).tolist(), ids=["legacy"])
+
+        async def owners(db, doc_ids):
+            return {doc_id: {0: 1, 1: 1, 2: 2}[doc_id] for doc_id in doc_ids if doc_id <= 2}
+
+        async def newest(db):
+            return 4  # document 5 is still being ingested
+
+        monkeypatch.setattr(index_maintenance, "document_owners", owners)
+        monkeypatch.setattr(index_maintenance, "max_document_id", newest)
+        yield store
+        store.close()
+
+    def test_stats(self, store):
+        stats = asyncio.run(index_maintenance.index_stats(None, store, top=2))
+        assert stats["chunks"] == 61 and stats["documents"] == 3
+        assert stats["orphaned_documents"] == 2 and stats["orphaned_chunks"] == 20
+        assert stats["untracked_chunks"] == 1
+        assert stats["users"] == [{"user_id": 1, "documents": 2, "chunks": 20}, {"user_id": 2, "documents": 1, "chunks": 10}]
+        assert [d["doc_id"] for d in stats["largest_documents"]] == [0, 1]
+        assert stats["disk_bytes"] > 0
+
+    def test_compaction_removes_orphans_but_not_pending_documents(self, store):
+        result = asyncio.run(index_maintenance.compact_index(None, store, remove_orphans=True))
+        assert result["orphaned_chunks_removed"] == 20
+        assert result["dropped_entries"] == 20
+        assert sorted(k for k in store.doc_chunk_counts() if k is not None) == [0, 1, 2, 5]
+
+    def test_orphans_are_kept_by_default(self, store):
+        asyncio.run(index_maintenance.compact_index(None, store))
+        assert store.count() == 61
+
+
+class TestAdminAccess:
+    """Test that admin endpoints are limited to ADMIN_EMAILS"""
+
+    def test_listed_user_is_admin(self, monkeypatch):
+        monkeypatch.setattr(index_maintenance.settings, "admin_emails", "ops@example.com, Admin@Example.com")
+        user = User(id=1, email="admin@example.com")
+        assert asyncio.run(get_admin_user(user)) is user
+
+    def test_other_users_are_forbidden(self, monkeypatch):
+        monkeypatch.setattr(index_maintenance.settings, "admin_emails", "")
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(get_admin_user(User(id=2, email="user@example.com")))
+        assert exc.value.status_code == 403
@@ -0,0 +1,124 @@
+"""
+Test cases for the Ollama model warm-up / keep-alive manager
+"""
+
+import asyncio
+
+from app.services import model_manager as mm
+from app.services import prompts
+from app.services.model_manager import ModelManager, ModelState, GENERATION, EMBEDDING
+
+
+class FakeOllama:
+    """Stands in for app.services.ollama_client"""
+
+    def __init__(self, fail=(), fail_urls=()):
+        self.fail = set(fail)
+        self.fail_urls = set(fail_urls)
+        self.resident = set()
+        self.loads = []
+        self.primed = []
+
+    async def load_generation_model(self, base_url, model, keep_alive):
+        self._load(model, keep_alive, base_url)
+
+    async def load_embedding_model(self, base_url, model, keep_alive):
+        self._load(model, keep_alive, base_url)
+
+    def _load(self, model, keep_alive, base_url=None):
+        self.loads.append((model, keep_alive))
+        if model in self.fail or base_url in self.fail_urls:
+            raise RuntimeError(f"cannot load {model}")
+        self.resident.add(f"{model}:latest")
+
+    async def prime_prompt_prefix(self, base_url, model, system, keep_alive):
+        self.primed.append((model, system))
+
+    async def list_running_models(self, base_url):
+        return list(self.resident)
+
+    normalize_model_name = staticmethod(mm.ollama_client.normalize_model_name)
+
+
+def make_manager():
+    return ModelManager(
+        [
+            ModelState("llama3", GENERATION, "http://ollama:11434"),
+            ModelState("nomic-embed-text", EMBEDDING, "http://ollama:11434"),
+        ],
+        keep_alive="30m",
+        interval=300,
+    )
+
+
+class TestModelManager:
+    """Test model warm-up and readiness reporting"""
+
+    def test_not_ready_before_warmup(self):
+        manager = make_manager()
+        assert not manager.is_ready()
+        assert manager.status()["ready"] is False
+
+    def test_refresh_loads_all_models(self, monkeypatch):
+        fake = FakeOllama()
+        monkeypatch.setattr(mm, "ollama_client", fake)
+        manager = make_manager()
+
+        asyncio.run(manager.refresh())
+
+        assert manager.is_ready()
+        assert sorted(m for m, _ in fake.loads) == ["llama3", "nomic-embed-text"]
+        assert all(keep_alive == "30m" for _, keep_alive in fake.loads)
+
+    def test_prompt_prefix_is_primed_once_per_load(self, monkeypatch):
+        fake = FakeOllama()
+        monkeypatch.setattr(mm, "ollama_client", fake)
+        manager = make_manager()
+
+        asyncio.run(manager.refresh())
+        asyncio.run(manager.refresh())
+
+        assert fake.primed == [("llama3", prompts.GROUNDED_INSTRUCTIONS)]
+
+    def test_failed_load_keeps_instance_unready(self, monkeypatch):
+        monkeypatch.setattr(mm, "ollama_client", FakeOllama(fail={"llama3"}))
+        manager = make_manager()
+
+        asyncio.run(manager.refresh())
+
+        assert not manager.is_ready()
+        llama = manager.status()["models"][0]
+        assert llama["loaded"] is False
+        assert "cannot load llama3" in llama["last_error"]
+
+    def test_evicted_model_is_marked_cold(self, monkeypatch):
+        fake = FakeOllama()
+        monkeypatch.setattr(mm, "ollama_client", fake)
+        manager = make_manager()
+        asyncio.run(manager.refresh())
+
+        fake.resident.discard("llama3:latest")
+        asyncio.run(manager.check_resident())
+
+        assert not manager.is_ready()
+
+    def test_disabled_manager_is_always_ready(self):
+        manager = make_manager()
+        manager.enabled = False
+        assert manager.is_ready()
+
+    def test_one_warm_endpoint_per_kind_is_enough(self, monkeypatch):
+        monkeypatch.setattr(mm, "ollama_client", FakeOllama(fail_urls={"http://ollama-2:11434"}))
+        urls = ["http://ollama-1:11434", "http://ollama-2:11434"]
+        manager = ModelManager(
+            [ModelState("llama3", GENERATION, url) for url in urls] + [ModelState("nomic-embed-text", EMBEDDING, url) for url in urls],
+            keep_alive="30m",
+            interval=300,
+        )
+
+        asyncio.run(manager.refresh())
+
+        status = manager.status()
+        assert manager.is_ready() and status["degraded"] is True
+        assert {(c["kind"], c["base_url"]) for c in status["cold_endpoints"]} == {(GENERATION, urls[1]), (EMBEDDING, urls[1])}
+        assert "cannot load" in status["cold_endpoints"][0]["last_error"]
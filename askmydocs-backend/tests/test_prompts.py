@@ -0,0 +1,59 @@
+"""
+Test cases for the prompt registry and prefix-friendly Ollama generation
+"""
+
+import json
+import string
+
+import httpx
+
+from app.services import ollama_client, prompts
+from app.services.metrics import metrics
+
+
+def placeholders(text):
+    return {name for _, name, _, _ in string.Formatter().parse(text) if name}
+
+
+class TestPromptRegistry:
+    """Test that the static part of every prompt is a stable prefix"""
+
+    def test_system_parts_have_no_placeholders(self):
+        for name, prompt in prompts.PROMPTS.items():
+            assert placeholders(prompt.system) == set(), name
+
+    def test_grounded_prompts_share_the_instruction_prefix(self):
+        assert prompts.RAG.system == prompts.GROUNDED_INSTRUCTIONS
+        assert prompts.CONVERSATION.system.startswith(prompts.GROUNDED_INSTRUCTIONS)
+
+    def test_per_request_values_only_in_the_template(self):
+        assert placeholders(prompts.RAG.template) == {"context", "question"}
+        assert placeholders(prompts.CONVERSATION.template) == {"history", "context", "question"}
+
+    def test_braces_in_documents_are_left_alone(self):
+        text = prompts.RAG.render(context='{"json": true}', question="what is {x}?")
+        assert '{"json": true}' in text and text.endswith("Question: what is {x}?")
+
+
+class TestGenerate:
+    """Test the /api/generate call"""
+
+    def setup_method(self):
+        metrics.reset()
+
+    def test_system_prompt_is_sent_separately(self, monkeypatch):
+        sent = []
+
+        def handler(request):
+            sent.append(json.loads(request.content))
+            return httpx.Response(200, json={
+                "response": "42", "prompt_eval_count": 12, "prompt_eval_duration": 30_000_000, "total_duration": 90_000_000,
+            })
+
+        monkeypatch.setattr(ollama_client, "_generate_client", httpx.Client(transport=httpx.MockTransport(handler)))
+        result = ollama_client.generate("http://ollama:11434", "Question: ?", system=prompts.RAG.system, model="llama3", keep_alive="30m")
+
+        assert result == ollama_client.Generation("42", 12, 0.03, 0.09)
+        assert sent[0]["system"] == prompts.RAG.system and sent[0]["prompt"] == "Question: ?"
+        assert sent[0]["stream"] is False and sent[0]["options"] == {"temperature": 0}
+        assert metrics.get("llm_prompt_eval_tokens_total", backend="ollama") == 12
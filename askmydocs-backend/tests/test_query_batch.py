@@ -0,0 +1,111 @@
+"""
+Test cases for batch question answering
+"""
+
+import asyncio
+
+from langchain_core.documents import Document
+
+from app import utils
+from app.config import settings
+from app.services.admission import AdmissionRejected
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_queries(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+class FakeStore:
+    def __init__(self):
+        self.embeddings = FakeEmbeddings()
+        self.searches = []
+
+    def search_by_vectors(self, vectors, k=4, filter=None):
+        self.searches.append((vectors, k, filter))
+        return [[(Document(page_content=f"chunk for {v[0]:g}", metadata={"doc_id": 1, "filename": "a.txt"}), 0.9)] for v in vectors]
+
+
+def collect(stream):
+    async def run():
+        return [item async for item in stream]
+    return asyncio.run(run())
+
+
+class TestRetrieveBatch:
+    """Test that a batch is embedded and searched in one call each"""
+
+    def test_one_embedding_call_and_one_search(self, monkeypatch):
+        store = FakeStore()
+        monkeypatch.setattr(utils, "get_vector_store", lambda: store)
+        hits = asyncio.run(utils.retrieve_batch(["a", "bb", "ccc"], document_ids=[1, 2]))
+        assert store.embeddings.calls == [["a", "bb", "ccc"]]
+        assert store.searches == [([[1.0], [2.0], [3.0]], settings.retrieval_candidates, {"doc_id": {"$in": [1, 2]}})]
+        assert [h[0][0].page_content for h in hits] == ["chunk for 1", "chunk for 2", "chunk for 3"]
+
+    def test_empty_scope_skips_the_search(self, monkeypatch):
+        monkeypatch.setattr(utils, "get_vector_store", lambda: None)
+        assert asyncio.run(utils.retrieve_batch(["a", "b"], document_ids=[])) == [[], []]
+
+
+class TestAnswerBatch:
+    """Test bounded concurrency and streaming order"""
+
+    def hits(self, count):
+        return [[(Document(page_content=f"c{i}", metadata={"doc_id": i, "filename": f"{i}.txt"}), 0.5)] for i in range(count)]
+
+    def test_answers_stream_in_completion_order(self, monkeypatch):
+        delays = [0.05, 0.01, 0.03]
+
+        async def fake_generate(query, docs, scores=None):
+            await asyncio.sleep(delays[int(query)])
+            return f"answer {query}", utils.source_documents(docs, scores), "fake"
+
+        monkeypatch.setattr(utils, "generate_answer", fake_generate)
+        results = collect(utils.answer_batch(["0", "1", "2"], self.hits(3), concurrency=3))
+        assert [i for i, _ in results] == [1, 2, 0]
+        assert results[0][1][0] == "answer 1"
+        assert results[0][1][1][0].relevance_score == 0.5
+
+    def test_concurrency_is_bounded(self, monkeypatch):
+        active, peak = 0, 0
+
+        async def fake_generate(query, docs, scores=None):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return "ok", [], "fake"
+
+        monkeypatch.setattr(utils, "generate_answer", fake_generate)
+        results = collect(utils.answer_batch([str(i) for i in range(10)], self.hits(10), concurrency=3))
+        assert len(results) == 10 and peak == 3
+
+    def test_rejected_question_is_retried(self, monkeypatch):
+        attempts = []
+
+        async def fake_generate(query, docs, scores=None):
+            attempts.append(query)
+            if len(attempts) == 1:
+                raise AdmissionRejected("ollama", "queue full", 429, retry_after=0)
+            return "ok", [], "fake"
+
+        monkeypatch.setattr(utils, "generate_answer", fake_generate)
+        assert collect(utils.answer_batch(["q"], self.hits(1), concurrency=1)) == [(0, ("ok", [], "fake"))]
+        assert attempts == ["q", "q"]
+
+    def test_failure_is_reported_per_question(self, monkeypatch):
+        async def fake_generate(query, docs, scores=None):
+            if query == "bad":
+                raise RuntimeError("ollama down")
+            return "ok", [], "fake"
+
+        monkeypatch.setattr(utils, "generate_answer", fake_generate)
+        results = dict(collect(utils.answer_batch(["good", "bad"], self.hits(2), concurrency=2)))
+        assert results[0] == ("ok", [], "fake")
+        assert results[1] == ("Error: ollama down", [], "error")
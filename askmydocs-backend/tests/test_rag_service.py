@@ -0,0 +1,46 @@
+"""
+Test cases for the RetrievalQA-style answer path
+"""
+
+import pytest
+import requests
+from langchain_core.documents import Document
+from langchain_core.language_models.fake import FakeListLLM
+
+from app.services import rag_service
+from app.services.backend_pool import BackendPool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = BackendPool("test", ["http://ollama-0:11434", "http://ollama-1:11434"], failure_threshold=1)
+    monkeypatch.setattr(rag_service, "generation_pool", pool)
+    return pool
+
+
+class TestAnswerQuestion:
+    """Test that only the LLM call runs on the generation pool"""
+
+    def test_retrieval_runs_once_outside_the_pool(self, pool, monkeypatch):
+        retrievals, prompts = [], []
+
+        class RecordingLLM(FakeListLLM):
+            def _call(self, prompt, *args, **kwargs):
+                prompts.append(prompt)
+                return super()._call(prompt, *args, **kwargs)
+
+        monkeypatch.setattr(rag_service, "retrieve", lambda q: retrievals.append(q) or [Document(page_content="Q3 revenue was 5M")])
+        monkeypatch.setattr(rag_service, "Ollama", lambda **kwargs: RecordingLLM(responses=["5M"]))
+
+        assert rag_service.answer_question("What was Q3 revenue?") == "5M"
+        assert retrievals == ["What was Q3 revenue?"]
+        assert "Q3 revenue was 5M" in prompts[0] and "What was Q3 revenue?" in prompts[0]
+
+    def test_retrieval_errors_do_not_eject_generation_endpoints(self, pool, monkeypatch):
+        def unreachable(question):
+            raise requests.exceptions.ConnectionError("embedding endpoint down")
+
+        monkeypatch.setattr(rag_service, "retrieve", unreachable)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            rag_service.answer_question("anything")
+        assert all(ep.healthy and ep.total_requests == 0 for ep in pool.endpoints)
@@ -0,0 +1,113 @@
+"""
+Test cases for per-user token-bucket rate limits and usage
+"""
+
+import asyncio
+
+import pytest
+
+from app.services import rate_limit
+from app.services.rate_limit import InMemoryRateLimiter, Limit, RateLimited
+
+
+@pytest.fixture(autouse=True)
+def limiter(monkeypatch):
+    limiter = InMemoryRateLimiter()
+    monkeypatch.setattr(rate_limit, "_limiter", limiter)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_requests_per_minute", 60.0)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_request_burst", 3)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_tokens_per_minute", 600.0)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_token_burst", 100)
+    return limiter
+
+
+class TestTokenBucket:
+    """Test taking, refilling and debt"""
+
+    def test_burst_then_refill(self, monkeypatch):
+        clock = [1000.0]
+        monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+        limiter, limit = InMemoryRateLimiter(), Limit("requests", rate=1.0, capacity=2)
+        take = lambda: asyncio.run(limiter.take("user:1", limit, 1))[0]
+        assert [take(), take(), take()] == [True, True, False]
+        clock[0] += 1.0
+        assert take() and not take()
+
+    def test_refill_is_capped_at_burst(self, monkeypatch):
+        clock = [1000.0]
+        monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+        limiter, limit = InMemoryRateLimiter(), Limit("requests", rate=1.0, capacity=2)
+        asyncio.run(limiter.take("user:1", limit, 2))
+        clock[0] += 100
+        assert asyncio.run(limiter.take("user:1", limit, 0))[1] == 2
+
+    def test_forced_take_goes_into_debt(self):
+        limiter, limit = InMemoryRateLimiter(), Limit("tokens", rate=10.0, capacity=100)
+        assert asyncio.run(limiter.take("user:1", limit, 250, force=True)) == (True, pytest.approx(-150, abs=1))
+        assert asyncio.run(limiter.take("user:1", limit, 0))[0] is False
+
+    def test_retry_after(self):
+        limit = Limit("tokens", rate=10.0, capacity=100)
+        assert rate_limit.retry_after(-150, 0, limit) == 15
+        assert rate_limit.retry_after(0.95, 1, limit) == 1
+
+
+class TestLimits:
+    """Test request checks, token charges and per-user usage"""
+
+    def test_requests_over_burst_are_refused(self):
+        for _ in range(3):
+            asyncio.run(rate_limit.check_request("user:1"))
+        with pytest.raises(RateLimited) as exc:
+            asyncio.run(rate_limit.check_request("user:1"))
+        assert exc.value.limit.name == "requests" and exc.value.retry_after == 1
+
+    def test_users_are_limited_separately(self):
+        asyncio.run(rate_limit.check_request("user:1", 3))
+        asyncio.run(rate_limit.check_request("user:2", 3))
+
+    def test_batch_larger_than_burst_is_too_large(self):
+        from fastapi import HTTPException
+
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(rate_limit.check_request("user:1", 4))
+        assert exc.value.status_code == 413 and "at most 3 requests" in exc.value.detail
+        report = asyncio.run(rate_limit.usage_report("user:1"))
+        assert report["limits"]["requests"]["available"] == pytest.approx(3, abs=0.1)
+        asyncio.run(rate_limit.check_request("user:1", 3))  # a full burst is still allowed
+
+    def test_generated_tokens_in_debt_refuse_questions(self):
+        asyncio.run(rate_limit.check_request("user:1"))
+        asyncio.run(rate_limit.charge_tokens("user:1", 160))
+        with pytest.raises(RateLimited) as exc:
+            asyncio.run(rate_limit.check_request("user:1"))
+        assert exc.value.limit.name == "tokens" and 5 <= exc.value.retry_after <= 7
+
+    def test_refused_call_spends_no_request(self):
+        asyncio.run(rate_limit.charge_tokens("user:1", 500))
+        with pytest.raises(RateLimited):
+            asyncio.run(rate_limit.check_request("user:1"))
+        report = asyncio.run(rate_limit.usage_report("user:1"))
+        assert report["limits"]["requests"]["available"] == pytest.approx(3, abs=0.1)
+
+    def test_usage_report(self):
+        asyncio.run(rate_limit.check_request("user:1", 2))
+        asyncio.run(rate_limit.charge_tokens("user:1", 40))
+        with pytest.raises(RateLimited):
+            asyncio.run(rate_limit.check_request("user:1", 2))
+        report = asyncio.run(rate_limit.usage_report("user:1"))
+        assert (report["requests"], report["generated_tokens"], report["rejected"]) == (2, 40, 1)
+        assert report["limits"]["tokens"]["burst"] == 100 and report["limits"]["requests"]["per_minute"] == 60
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(rate_limit.settings, "rate_limit_enabled", False)
+        for _ in range(10):
+            asyncio.run(rate_limit.check_request("user:1"))
+
+    def test_principal(self):
+        class User:
+            id = 7
+
+        assert rate_limit.principal_for(User()) == "user:7"
+        assert rate_limit.principal_for(None) == "ip:unknown"
@@ -0,0 +1,159 @@
+"""
+Test cases for request deadlines, dependency timeouts and circuit breakers
+"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+from app import utils
+from app.services import resilience
+from app.services.admission import AdmissionRejected
+from app.services.resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, DependencyTimeout
+
+
+def fail(breaker, error=ConnectionError("down")):
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+
+class TestDeadline:
+    """Test that timeouts shrink to the time left on the deadline"""
+
+    def test_no_deadline_uses_dependency_timeout(self, monkeypatch):
+        monkeypatch.setattr(resilience.settings, "ollama_timeout_seconds", 120.0)
+        assert resilience.remaining() is None
+        assert resilience.timeout_for("ollama") == 120.0
+
+    def test_deadline_caps_timeout(self, monkeypatch):
+        monkeypatch.setattr(resilience.settings, "ollama_timeout_seconds", 120.0)
+        with resilience.deadline(5):
+            assert 4 < resilience.timeout_for("ollama") <= 5
+        assert resilience.remaining() is None
+
+    def test_inner_deadline_cannot_extend_outer(self):
+        with resilience.deadline(1):
+            with resilience.deadline(60):
+                assert resilience.remaining() <= 1
+
+    def test_expired_deadline_skips_the_call(self):
+        with resilience.deadline(0):
+            with pytest.raises(DeadlineExceeded):
+                resilience.timeout_for("ollama")
+
+    def test_deadline_reaches_worker_threads(self):
+        async def run():
+            with resilience.deadline(5):
+                return await asyncio.to_thread(resilience.remaining)
+
+        assert 4 < asyncio.run(run()) <= 5
+
+
+class TestGuarded:
+    """Test timeouts and breaker bookkeeping around a call"""
+
+    def setup_method(self):
+        resilience._breakers.clear()
+
+    def test_dependency_timeout(self, monkeypatch):
+        monkeypatch.setattr(resilience.settings, "vector_store_timeout_seconds", 0.05)
+        with pytest.raises(DependencyTimeout):
+            asyncio.run(resilience.guarded("vector_store", lambda: asyncio.sleep(5)))
+        assert resilience.get_breaker("vector_store").consecutive_failures == 1
+
+    def test_deadline_is_not_the_dependency_fault(self, monkeypatch):
+        monkeypatch.setattr(resilience.settings, "vector_store_timeout_seconds", 30.0)
+
+        async def run():
+            with resilience.deadline(0.05):
+                await resilience.guarded("vector_store", lambda: asyncio.sleep(5))
+
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(run())
+        assert resilience.get_breaker("vector_store").consecutive_failures == 0
+
+
+class TestCircuitBreaker:
+    """Test open, half-open and closed transitions"""
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("ollama", failure_threshold=2, reset_seconds=30)
+        fail(breaker)
+        assert breaker.state == resilience.CLOSED
+        fail(breaker)
+        assert breaker.state == resilience.OPEN
+        with pytest.raises(CircuitOpen) as exc:
+            breaker.allow()
+        assert 1 <= exc.value.retry_after <= 30
+
+    def test_success_resets_the_count(self):
+        breaker = CircuitBreaker("ollama", failure_threshold=2, reset_seconds=30)
+        fail(breaker)
+        with breaker.guard():
+            pass
+        fail(breaker)
+        assert breaker.state == resilience.CLOSED
+
+    def test_overload_is_not_a_failure(self):
+        breaker = CircuitBreaker("ollama", failure_threshold=1, reset_seconds=30)
+        fail(breaker, AdmissionRejected("ollama", "queue_full", 429, 5))
+        assert breaker.state == resilience.CLOSED
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker("ollama", failure_threshold=1, reset_seconds=0.05)
+        fail(breaker)
+        time.sleep(0.06)
+        assert breaker.state == resilience.HALF_OPEN
+        breaker.allow()  # the probe
+        with pytest.raises(CircuitOpen):
+            breaker.allow()
+        breaker.record_success()
+        assert breaker.state == resilience.CLOSED
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker("ollama", failure_threshold=3, reset_seconds=0.05)
+        for _ in range(3):
+            fail(breaker)
+        time.sleep(0.06)
+        fail(breaker)
+        assert breaker.state == resilience.OPEN
+
+
+class TestFailover:
+    """Test that generation falls over to OpenAI while Ollama is unavailable"""
+
+    def setup_method(self):
+        resilience._breakers.clear()
+
+    def test_open_circuit_fails_over(self, monkeypatch):
+        calls = []
+
+        async def openai_answer(text, system):
+            calls.append(text)
+            return "from openai", "openai-gpt-3.5-turbo"
+
+        monkeypatch.setattr(utils, "openai_answer", openai_answer)
+        monkeypatch.setattr(utils, "alternate_backend", lambda: "openai")
+        monkeypatch.setattr(utils.settings, "llm_hedging", False)
+        breaker = resilience.get_breaker("ollama")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        doc = Document(page_content="The answer is 42.", metadata={"filename": "a.txt"})
+        answer, sources, llm_used = asyncio.run(utils.generate_answer("What is the answer?", [doc]))
+        assert (answer, llm_used) == ("from openai", "openai-gpt-3.5-turbo")
+        assert len(calls) == 1 and [s.filename for s in sources] == ["a.txt"]
+
+    def test_without_alternate_the_error_surfaces(self, monkeypatch):
+        monkeypatch.setattr(utils, "alternate_backend", lambda: None)
+        monkeypatch.setattr(utils.settings, "llm_hedging", False)
+        breaker = resilience.get_breaker("ollama")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        doc = Document(page_content="text", metadata={})
+        with pytest.raises(CircuitOpen):
+            asyncio.run(utils.generate_answer("q", [doc]))
@@ -0,0 +1,83 @@
+"""
+Test cases for adaptive top-k retrieval
+"""
+
+from langchain_core.documents import Document
+
+from app.services import retrieval
+from app.services.metrics import metrics
+
+
+def hits(*scores, chars=40):
+    return [(Document(page_content="x" * chars, metadata={"doc_id": i}), s) for i, s in enumerate(scores)]
+
+
+def ids(selected):
+    return [doc.metadata["doc_id"] for doc, _ in selected]
+
+
+class TestSelectHits:
+    """Test margin, k bounds and the token budget"""
+
+    def test_keeps_hits_within_margin(self):
+        selected = retrieval.select_hits(hits(0.9, 0.88, 0.85, 0.6, 0.59), margin=0.1, min_k=1, max_k=8, token_budget=1000)
+        assert ids(selected) == [0, 1, 2]
+
+    def test_min_k_ignores_margin(self):
+        selected = retrieval.select_hits(hits(0.9, 0.3, 0.2), margin=0.05, min_k=2, max_k=8, token_budget=1000)
+        assert ids(selected) == [0, 1]
+
+    def test_max_k_caps_close_scores(self):
+        selected = retrieval.select_hits(hits(*[0.9] * 10), margin=0.1, min_k=1, max_k=4, token_budget=1000)
+        assert len(selected) == 4
+
+    def test_token_budget(self):
+        # 40 chars ~ 10 tokens each
+        selected = retrieval.select_hits(hits(0.9, 0.9, 0.9, 0.9), margin=0.1, min_k=4, max_k=8, token_budget=25)
+        assert ids(selected) == [0, 1]
+
+    def test_best_hit_kept_over_budget(self):
+        selected = retrieval.select_hits(hits(0.9, 0.9, chars=400), margin=0.1, min_k=1, max_k=8, token_budget=10)
+        assert ids(selected) == [0]
+
+    def test_no_hits(self):
+        assert retrieval.select_hits([]) == []
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [1.0]
+
+
+class FakeStore:
+    def __init__(self, scores):
+        self.embeddings = FakeEmbeddings()
+        self.scores = scores
+        self.searches = []
+
+    def search_by_vectors(self, vectors, k=4, filter=None):
+        self.searches.append((k, filter))
+        return [hits(*self.scores[:k]) for _ in vectors]
+
+
+class TestAdaptiveSearch:
+    """Test over-fetching, selection and recorded sizes"""
+
+    def test_over_fetches_then_selects(self, monkeypatch):
+        monkeypatch.setattr(retrieval.settings, "retrieval_candidates", 6)
+        monkeypatch.setattr(retrieval.settings, "retrieval_score_margin", 0.05)
+        monkeypatch.setattr(retrieval.settings, "retrieval_min_k", 1)
+        store = FakeStore([0.9, 0.87, 0.5, 0.4, 0.3, 0.2, 0.1])
+        selected = retrieval.adaptive_search(store, "question", {"doc_id": 1})
+        assert store.searches == [(6, {"doc_id": 1})]
+        assert ids(selected) == [0, 1]
+
+    def test_records_sizes(self, monkeypatch):
+        recorded = []
+        monkeypatch.setattr(metrics, "observe", lambda name, value, **labels: recorded.append((name, value)))
+        retrieval.record(20, hits(0.9, 0.8))
+        assert recorded == [("retrieval_candidates", 20), ("retrieval_k", 2), ("retrieval_context_tokens", 20)]
+
+    def test_retriever_returns_documents(self):
+        retriever = retrieval.AdaptiveRetriever(vectorstore=FakeStore([0.9, 0.89]))
+        assert [doc.page_content for doc in retriever.invoke("question")] == ["x" * 40] * 2
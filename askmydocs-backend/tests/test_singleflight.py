@@ -0,0 +1,92 @@
+"""
+Test cases for single-flight coalescing of identical in-flight queries
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.metrics import metrics
+from app.services.singleflight import SingleFlight, normalize_query, query_key
+
+
+class TestQueryKey:
+    """Test query normalization"""
+
+    def test_whitespace_and_case_are_ignored(self):
+        assert normalize_query("  What is   FastAPI?\n") == "what is fastapi?"
+        assert query_key("What is FastAPI?", "ollama") == query_key("what is  fastapi?", "Ollama")
+
+    def test_model_and_scope_are_part_of_the_key(self):
+        assert query_key("q", "ollama") != query_key("q", "openai")
+        assert query_key("q", "ollama", {"document_ids": [1]}) != query_key("q", "ollama", {"document_ids": [2]})
+
+
+class TestSingleFlight:
+    """Test sharing one computation between concurrent callers"""
+
+    def setup_method(self):
+        metrics.reset()
+
+    def test_concurrent_identical_calls_share_one_computation(self):
+        calls = []
+
+        async def compute(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            return value * 2
+
+        async def run():
+            flight = SingleFlight("test")
+            return await asyncio.gather(*(flight.do("k", compute, 21) for _ in range(5)))
+
+        results = asyncio.run(run())
+
+        assert results == [42] * 5
+        assert calls == [21]
+        assert metrics.get("singleflight_requests_total", flight="test") == 5
+        assert metrics.get("singleflight_coalesced_total", flight="test") == 4
+
+    def test_sequential_calls_are_not_coalesced(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return "ok"
+
+        async def run():
+            flight = SingleFlight("test")
+            await flight.do("k", compute)
+            await flight.do("k", compute)
+
+        asyncio.run(run())
+        assert len(calls) == 2
+
+    def test_errors_are_shared_with_waiters(self):
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def run():
+            flight = SingleFlight("test")
+            return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, ValueError) for r in results)
+
+    def test_cancelled_caller_does_not_cancel_the_others(self):
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run():
+            flight = SingleFlight("test")
+            first = asyncio.ensure_future(flight.do("k", compute))
+            second = asyncio.ensure_future(flight.do("k", compute))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await second
+
+        assert asyncio.run(run()) == "done"
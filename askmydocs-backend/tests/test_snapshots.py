@@ -0,0 +1,196 @@
+"""
+Test cases for vector store snapshots and restore
+"""
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from app.services import index_maintenance, snapshots
+from app.services.chroma_store import ChromaVectorStore
+from app.services.numpy_store import NumpyVectorStore
+from tests.test_index_maintenance import fill
+from tests.test_vector_store import KeywordEmbeddings, clustered
+
+
+@pytest.fixture(autouse=True)
+def snapshot_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots.settings, "vector_snapshot_dir", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(snapshots.settings, "vector_snapshot_keep", 5)
+    monkeypatch.setattr(snapshots.settings, "vector_restore_snapshot", "")
+    monkeypatch.setattr(snapshots.settings, "embedding_dimensions", 0)
+    monkeypatch.setattr(snapshots.settings, "ollama_model", "nomic-embed-text")
+
+
+def numpy_store(path):
+    return NumpyVectorStore(str(path), KeywordEmbeddings())
+
+
+def ids(store, queries):
+    return [[d.id for d, _ in hits] for hits in store.search_by_vectors(queries, k=3)]
+
+
+class TestNumpySnapshots:
+    """Test snapshotting and restoring the NumPy store"""
+
+    def test_restore_undoes_later_writes(self, tmp_path):
+        directory = tmp_path / "idx"
+        store = numpy_store(directory)
+        vectors = fill(store, rows=500, docs=5)
+        queries = vectors[:4].tolist()
+        before = ids(store, queries)
+
+        manifest = snapshots.create_snapshot(store, "numpy", str(directory))
+        assert manifest["chunks"] == 500 and manifest["dimensions"] == 32
+        assert manifest["embedding_model"] == "nomic-embed-text"
+        store.delete_documents([0])
+        store.add_embeddings(["new"], clustered(1, seed=21).tolist(), [{"doc_id": 9}], ["new"])
+        store.close()
+
+        snapshots.restore_snapshot(manifest["id"], "numpy", str(directory))
+        restored = numpy_store(directory)
+        assert restored.count() == 500
+        assert ids(restored, queries) == before
+        restored.close()
+        assert numpy_store(f"{directory}.before-{manifest['id']}").count() == 401
+
+    def test_snapshot_opens_as_a_store(self, tmp_path):
+        store = numpy_store(tmp_path / "idx")
+        vectors = fill(store, rows=200)
+        manifest = snapshots.create_snapshot(store, "numpy", str(tmp_path / "idx"))
+        assert ids(store, vectors[:2].tolist())[0][0] == "0"
+        store.close()
+        copy = numpy_store(tmp_path / "snapshots" / manifest["id"] / "store")
+        assert copy.count() == 200
+        copy.close()
+
+    def test_unchanged_files_are_linked_to_the_previous_snapshot(self, tmp_path):
+        directory = tmp_path / "idx"
+        store = numpy_store(directory)
+        fill(store, rows=100)
+        first = snapshots.create_snapshot(store, "numpy", str(directory))
+        second = snapshots.create_snapshot(store, "numpy", str(directory))
+        store.close()
+        path = tmp_path / "snapshots" / "{}" / "store" / "vectors.npy"
+        assert os.path.samefile(str(path).format(first["id"]), str(path).format(second["id"]))
+        # SQLite files are always copied through the backup API
+        sqlite = tmp_path / "snapshots" / "{}" / "store" / "chunks.sqlite3"
+        assert not os.path.samefile(str(sqlite).format(first["id"]), str(sqlite).format(second["id"]))
+
+    def test_old_snapshots_are_pruned(self, tmp_path):
+        store = numpy_store(tmp_path / "idx")
+        fill(store, rows=50)
+        made = [snapshots.create_snapshot(store, "numpy", str(tmp_path / "idx"), keep=2)["id"] for _ in range(3)]
+        store.close()
+        assert [m["id"] for m in snapshots.list_snapshots()] == made[:0:-1]
+
+
+class TestChromaSnapshots:
+    """Test snapshotting and restoring the Chroma store"""
+
+    def test_restore_round_trip(self, tmp_path):
+        from chromadb.api.client import SharedSystemClient
+
+        directory = tmp_path / "chroma"
+        store = ChromaVectorStore(persist_directory=str(directory), embedding_function=KeywordEmbeddings())
+        vectors = fill(store, rows=300, docs=3)
+        queries = vectors[:3].tolist()
+        before = ids(store, queries)
+        manifest = snapshots.create_snapshot(store, "chroma", str(directory))
+        assert manifest["chunks"] == 300 and manifest["dimensions"] == 32
+        store.delete_documents([0, 1])
+        del store
+        SharedSystemClient.clear_system_cache()
+
+        snapshots.restore_snapshot(manifest["id"], "chroma", str(directory))
+        restored = ChromaVectorStore(persist_directory=str(directory), embedding_function=KeywordEmbeddings())
+        assert restored.count() == 300
+        assert ids(restored, queries) == before
+        SharedSystemClient.clear_system_cache()
+
+    def test_uploads_during_a_snapshot_wait_for_it(self, tmp_path, monkeypatch):
+        from chromadb.api.client import SharedSystemClient
+
+        directory = tmp_path / "chroma"
+        store = ChromaVectorStore(persist_directory=str(directory), embedding_function=KeywordEmbeddings())
+        store.add_texts([f"python docker {i}" for i in range(200)], [{"doc_id": i % 4} for i in range(200)])
+        upload = threading.Thread(target=store.add_texts, args=(["vector search"] * 50, [{"doc_id": 9}] * 50))
+        backup_sqlite = snapshots.backup_sqlite
+
+        def backup_while_uploading(src, dst):
+            upload.start()
+            upload.join(0.2)  # blocked by the write pause
+            assert upload.is_alive()
+            backup_sqlite(src, dst)
+
+        monkeypatch.setattr(snapshots, "backup_sqlite", backup_while_uploading)
+        manifest = snapshots.create_snapshot(store, "chroma", str(directory))
+        upload.join()
+        assert manifest["chunks"] == 200 and store.count() == 250
+        del store
+        SharedSystemClient.clear_system_cache()
+
+        snapshots.restore_snapshot(manifest["id"], "chroma", str(directory))
+        restored = ChromaVectorStore(persist_directory=str(directory), embedding_function=KeywordEmbeddings())
+        assert restored.count() == 200
+        assert restored.doc_chunk_counts() == {0: 50, 1: 50, 2: 50, 3: 50}
+        hits = restored.search_by_vectors(KeywordEmbeddings().embed_documents(["python docker 7"]), k=200)[0]
+        assert len(hits) == 200
+        SharedSystemClient.clear_system_cache()
+
+
+class TestRestoreChecks:
+    """Test that mismatched snapshots are refused and startup restores once"""
+
+    @pytest.fixture
+    def snapshot(self, tmp_path):
+        store = numpy_store(tmp_path / "idx")
+        fill(store, rows=100)
+        manifest = snapshots.create_snapshot(store, "numpy", str(tmp_path / "idx"))
+        store.close()
+        return manifest
+
+    def test_other_embedding_model_is_refused(self, tmp_path, snapshot, monkeypatch):
+        monkeypatch.setattr(snapshots.settings, "ollama_model", "mxbai-embed-large")
+        with pytest.raises(snapshots.SnapshotMismatch, match="mxbai-embed-large"):
+            snapshots.restore_snapshot(snapshot["id"], "numpy", str(tmp_path / "idx"))
+
+    def test_other_dimensions_are_refused(self, tmp_path, snapshot, monkeypatch):
+        monkeypatch.setattr(snapshots.settings, "embedding_dimensions", 16)
+        with pytest.raises(snapshots.SnapshotMismatch, match="32-dim"):
+            snapshots.restore_snapshot(snapshot["id"], "numpy", str(tmp_path / "idx"))
+
+    def test_live_store_dimensions_are_checked(self, tmp_path, snapshot):
+        store = numpy_store(tmp_path / "other")
+        store.add_embeddings(["x"], [[1.0] * 8], ids=["x"])
+        store.close()
+        with pytest.raises(snapshots.SnapshotMismatch):
+            snapshots.restore_snapshot(snapshot["id"], "numpy", str(tmp_path / "other"))
+
+    def test_other_backend_is_refused(self, tmp_path, snapshot):
+        with pytest.raises(snapshots.SnapshotMismatch, match="numpy backend"):
+            snapshots.restore_snapshot(snapshot["id"], "chroma", str(tmp_path / "chroma"))
+
+    def test_unknown_snapshot(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            snapshots.restore_snapshot("nope", "numpy", str(tmp_path / "idx"))
+
+    def test_startup_restores_once(self, tmp_path, snapshot, monkeypatch):
+        monkeypatch.setattr(snapshots.settings, "vector_store_backend", "numpy")
+        monkeypatch.setattr(snapshots.settings, "vector_index_dir", str(tmp_path / "idx"))
+        monkeypatch.setattr(snapshots.settings, "vector_restore_snapshot", snapshot["id"])
+        assert snapshots.restore_at_startup()["id"] == snapshot["id"]
+        assert snapshots.restored_from() == snapshot["id"]
+        assert snapshots.restore_at_startup() is None
+        assert not os.path.exists(f"{tmp_path / 'idx'}.restoring")
+
+    def test_snapshot_through_index_maintenance(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(snapshots.settings, "vector_store_backend", "numpy")
+        monkeypatch.setattr(snapshots.settings, "vector_index_dir", str(tmp_path / "idx"))
+        store = numpy_store(tmp_path / "idx")
+        fill(store, rows=50)
+        result = asyncio.run(index_maintenance.snapshot_index(store))
+        assert result["chunks"] == 50 and "files" not in result
+        store.close()
@@ -0,0 +1,54 @@
+"""
+Test cases for extracting the files of a batch upload
+"""
+
+import zipfile
+
+import pytest
+
+from app.routers.upload_router import TooManyFiles, _extract_upload
+
+
+def make_zip(path, files):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, text in files.items():
+            archive.writestr(name, text)
+    return str(path)
+
+
+class TestExtractUpload:
+    """Test plain files, archives and limits"""
+
+    def test_plain_file_is_extracted(self, tmp_path):
+        path = tmp_path / "notes.txt"
+        path.write_text("hello batch")
+        [result] = _extract_upload(str(path), "notes.txt", str(tmp_path), limit=10)
+        assert (result.name, result.filename, result.member, result.text, result.error) == ("notes.txt", "notes.txt", None, "hello batch", None)
+
+    def test_archive_members_are_extracted_and_removed(self, tmp_path):
+        scratch = tmp_path / "scratch"
+        scratch.mkdir()
+        path = make_zip(tmp_path / "docs.zip", {"a.txt": "alpha", "sub/b.md": "beta", "logo.png": "binary"})
+        results = _extract_upload(path, "docs.zip", str(scratch), limit=10)
+        assert [(r.name, r.filename, r.member, r.text) for r in results] == [
+            ("docs.zip/a.txt", "a.txt", "a.txt", "alpha"),
+            ("docs.zip/sub/b.md", "b.md", "sub/b.md", "beta"),
+        ]
+        assert list(scratch.iterdir()) == []
+
+    def test_broken_member_fails_alone(self, tmp_path):
+        path = make_zip(tmp_path / "docs.zip", {"a.txt": "alpha", "broken.pdf": "not a pdf"})
+        results = {r.name: r for r in _extract_upload(path, "docs.zip", str(tmp_path), limit=10)}
+        assert results["docs.zip/a.txt"].error is None
+        assert results["docs.zip/broken.pdf"].error
+
+    def test_unreadable_archive_is_reported(self, tmp_path):
+        path = tmp_path / "docs.zip"
+        path.write_bytes(b"not a zip")
+        [result] = _extract_upload(str(path), "docs.zip", str(tmp_path), limit=10)
+        assert result.text is None and "unreadable archive" in result.error
+
+    def test_member_limit(self, tmp_path):
+        path = make_zip(tmp_path / "docs.zip", {f"{i}.txt": "x" for i in range(5)})
+        with pytest.raises(TooManyFiles):
+            _extract_upload(path, "docs.zip", str(tmp_path), limit=3)
@@ -0,0 +1,412 @@
+"""
+Test cases for the local NumPy vector store and its quantized modes
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services import quantization as q
+from app.services import vector_store
+from app.services.chroma_store import ChromaVectorStore
+from app.services.numpy_store import NumpyVectorStore
+
+
+class KeywordEmbeddings(Embeddings):
+    """Deterministic embeddings: one dimension per vocabulary word"""
+
+    VOCAB = ["python", "fastapi", "machine", "learning", "docker", "database", "vector", "search"]
+
+    def _embed(self, text):
+        words = text.lower().split()
+        return [float(words.count(w)) + 0.01 for w in self.VOCAB]
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def write_during_copy(chroma, write):
+    """Start `write` in a thread once `chroma` has copied its collection; returns (thread, outcome)."""
+    copy_pages, outcome = chroma._pages, {}
+
+    def run():
+        try:
+            outcome["ids"] = write()
+        except Exception as e:
+            outcome["error"] = e
+
+    writer = threading.Thread(target=run)
+
+    def pages(include):
+        yield from copy_pages(include)
+        # every chunk is copied, the switch hasn't happened: the riskiest moment for a write
+        writer.start()
+        writer.join(0.2)  # the write waits for the rewrite to finish
+
+    chroma._pages = pages
+    return writer, outcome
+
+
+TEXTS = [
+    "python python programming",
+    "fastapi fastapi web framework",
+    "machine learning learning models",
+    "docker containers docker",
+    "database tables",
+]
+
+
+@pytest.fixture(params=q.MODES)
+def store(request, tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "index"), KeywordEmbeddings(), quantization=request.param)
+    store.add_texts(TEXTS, metadatas=[{"doc_id": i} for i in range(len(TEXTS))], ids=[f"{i}_0" for i in range(len(TEXTS))])
+    yield store
+    store.close()
+
+
+class TestNumpyVectorStore:
+    """Test add, search, upsert, delete and persistence"""
+
+    def test_nearest_chunk_is_returned_first(self, store):
+        docs = store.similarity_search("what is fastapi", k=2)
+        assert docs[0].page_content == TEXTS[1]
+        assert docs[0].metadata == {"doc_id": 1}
+
+    def test_scores_are_sorted_cosine_similarities(self, store):
+        results = store.similarity_search_with_score("machine learning", k=5)
+        scores = [s for _, s in results]
+        assert scores == sorted(scores, reverse=True)
+        assert -1.0 <= scores[-1] <= scores[0] <= 1.0 + 1e-6
+
+    def test_upsert_overwrites_existing_id(self, store):
+        store.add_texts(["vector search vector"], ids=["0_0"])
+        assert store.count() == len(TEXTS)
+        assert store.similarity_search("vector search", k=1)[0].id == "0_0"
+
+    def test_deleted_chunks_are_not_returned(self, store):
+        store.delete(["1_0"])
+        ids = [d.id for d in store.similarity_search("fastapi", k=5)]
+        assert "1_0" not in ids
+        assert store.count() == len(TEXTS) - 1
+
+    def test_store_survives_reopen(self, store):
+        path, mode = store.persist_directory, store.quantization
+        store.close()
+        reopened = NumpyVectorStore(path, KeywordEmbeddings(), quantization=mode)
+        assert reopened.count() == len(TEXTS)
+        assert reopened.similarity_search("docker", k=1)[0].page_content == TEXTS[3]
+        reopened.close()
+
+    def test_growth_keeps_existing_rows(self, tmp_path):
+        store = NumpyVectorStore(str(tmp_path / "grow"), KeywordEmbeddings(), quantization=q.INT8)
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(3000, 8)).astype(np.float32)
+        store.add_embeddings([f"t{i}" for i in range(3000)], vectors.tolist(), ids=[str(i) for i in range(3000)])
+        hit = store.similarity_search_by_vector(vectors[1234].tolist(), k=1)[0]
+        assert hit.id == "1234"
+        store.close()
+
+
+    def test_batched_search_matches_single_queries(self, store):
+        queries = ["python", "docker", "machine learning"]
+        vectors = KeywordEmbeddings().embed_documents(queries)
+        batched = store.search_by_vectors(vectors, k=2)
+        single = [store.similarity_search_by_vector_with_score(v, k=2) for v in vectors]
+        assert [[d.id for d, _ in hits] for hits in batched] == [[d.id for d, _ in hits] for hits in single]
+
+    def test_row_flags_are_rebuilt_if_missing(self, store):
+        path, mode = store.persist_directory, store.quantization
+        store.delete(["2_0"])
+        store.close()
+        (Path(path) / "alive.npy").unlink()
+        reopened = NumpyVectorStore(path, KeywordEmbeddings(), quantization=mode)
+        assert reopened.count() == len(TEXTS) - 1
+        assert "2_0" not in [d.id for d in reopened.similarity_search("machine learning", k=5)]
+        reopened.close()
+
+
+class TestMetadataFilters:
+    """Test doc_id pre-filtering"""
+
+    def test_search_is_restricted_to_allowed_documents(self, store):
+        docs = store.similarity_search("fastapi docker", k=5, filter={"doc_id": {"$in": [3, 4]}})
+        assert [d.metadata["doc_id"] for d in docs] == [3, 4]
+
+    def test_single_document_filter(self, store):
+        docs = store.similarity_search("python", k=5, filter={"doc_id": 2})
+        assert [d.id for d in docs] == ["2_0"]
+
+    def test_filter_matching_nothing(self, store):
+        assert store.similarity_search("python", k=5, filter={"doc_id": {"$in": [99]}}) == []
+
+    def test_deleted_chunks_are_filtered_out(self, store):
+        store.delete(["3_0"])
+        assert [d.id for d in store.similarity_search("docker", k=5, filter={"doc_id": {"$in": [3, 4]}})] == ["4_0"]
+
+    def test_unsupported_filter_is_rejected(self, store):
+        with pytest.raises(NotImplementedError):
+            store.similarity_search("python", filter={"filename": "a.pdf"})
+
+    def test_old_stores_are_backfilled(self, store):
+        path, mode = store.persist_directory, store.quantization
+        store.close()
+        db = sqlite3.connect(str(Path(path) / "chunks.sqlite3"))
+        db.executescript("DROP INDEX ix_chunks_doc_id; ALTER TABLE chunks DROP COLUMN doc_id;")
+        db.close()
+        reopened = NumpyVectorStore(path, KeywordEmbeddings(), quantization=mode)
+        assert [d.id for d in reopened.similarity_search("python", k=5, filter={"doc_id": {"$in": [1]}})] == ["1_0"]
+        reopened.close()
+
+    def test_chroma_applies_the_same_filter(self, tmp_path):
+        embeddings = KeywordEmbeddings()
+        chroma = ChromaVectorStore(persist_directory=str(tmp_path / "chroma"), embedding_function=embeddings)
+        chroma.add_embeddings(TEXTS, embeddings.embed_documents(TEXTS), [{"doc_id": i} for i in range(len(TEXTS))], [f"{i}_0" for i in range(len(TEXTS))])
+        hits = chroma.search_by_vectors(embeddings.embed_documents(["docker"]), k=5, filter={"doc_id": {"$in": [0, 4]}})[0]
+        assert sorted(d.metadata["doc_id"] for d, _ in hits) == [0, 4]
+
+
+class TestVectorStoreBackends:
+    """Test that both backends answer through the same interface"""
+
+    def test_chroma_backend_matches_numpy_backend(self, tmp_path):
+        embeddings = KeywordEmbeddings()
+        ids = [f"{i}_0" for i in range(len(TEXTS))]
+        chroma = ChromaVectorStore(persist_directory=str(tmp_path / "chroma"), embedding_function=embeddings)
+        local = NumpyVectorStore(str(tmp_path / "numpy"), embeddings)
+        for store in (chroma, local):
+            store.add_embeddings(TEXTS, embeddings.embed_documents(TEXTS), [{"doc_id": i} for i in range(len(TEXTS))], ids)
+
+        query = embeddings.embed_documents(["docker docker"])
+        assert chroma.count() == local.count() == len(TEXTS)
+        assert chroma.search_by_vectors(query, k=1)[0][0][0].id == local.search_by_vectors(query, k=1)[0][0][0].id == "3_0"
+
+    def test_factory_returns_one_instance_per_backend(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(vector_store, "_stores", {})
+        first = vector_store.get_vector_store(str(tmp_path / "idx"), backend="numpy")
+        assert isinstance(first, NumpyVectorStore)
+        assert vector_store.get_vector_store(str(tmp_path / "idx"), backend="numpy") is first
+
+    def test_unknown_backend_is_rejected(self):
+        with pytest.raises(ValueError):
+            vector_store.get_vector_store(backend="faiss")
+
+
+class TestQuantization:
+    """Test quantized search against exact float32 search"""
+
+    def test_int8_round_trip_error_is_small(self):
+        rng = np.random.default_rng(1)
+        vectors = q.normalize(rng.normal(size=(100, 64)))
+        codes, scales = q.quantize(vectors, q.INT8)
+        assert codes.dtype == np.int8
+        assert np.abs(q.dequantize(codes, scales) - vectors).max() < 0.01
+
+    def test_top_k_matches_full_sort(self):
+        values = np.random.default_rng(2).normal(size=1000)
+        assert list(q.top_k(values, 10)) == list(np.argsort(-values)[:10])
+
+    @pytest.mark.parametrize("mode", [q.FLOAT16, q.INT8])
+    def test_rescored_search_matches_exact(self, mode, tmp_path):
+        rng = np.random.default_rng(3)
+        vectors = rng.normal(size=(2000, 32)).astype(np.float32)
+        queries = rng.normal(size=(20, 32)).astype(np.float32)
+        exact = NumpyVectorStore(str(tmp_path / "exact"), KeywordEmbeddings())
+        quantized = NumpyVectorStore(str(tmp_path / mode), KeywordEmbeddings(), quantization=mode)
+        for store in (exact, quantized):
+            store.add_embeddings([str(i) for i in range(2000)], vectors.tolist(), ids=[str(i) for i in range(2000)])
+
+        for query in queries:
+            expected = [d.id for d in exact.similarity_search_by_vector(query.tolist(), k=5)]
+            got = [d.id for d in quantized.similarity_search_by_vector(query.tolist(), k=5)]
+            assert got == expected
+
+
+def clustered(rows, dim=32, clusters=20, seed=4):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, size=rows)] + 0.5 * rng.normal(size=(rows, dim))).astype(np.float32)
+
+
+class TestIVFIndex:
+    """Test the IVF approximate index of the NumPy store"""
+
+    @pytest.fixture
+    def stores(self, tmp_path):
+        vectors = clustered(3000)
+        ids = [str(i) for i in range(len(vectors))]
+        exact = NumpyVectorStore(str(tmp_path / "exact"), KeywordEmbeddings())
+        approx = NumpyVectorStore(str(tmp_path / "ivf"), KeywordEmbeddings(), ann="ivf", nlist=32, nprobe=4, ann_min_rows=10**6)
+        for store in (exact, approx):
+            store.add_embeddings(ids, vectors.tolist(), ids=ids)
+        approx.rebuild_index(wait=True)
+        yield exact, approx
+        exact.close()
+        approx.close()
+
+    def test_index_is_built_over_all_rows(self, stores):
+        _, approx = stores
+        status = approx.index_status()
+        assert status["built"] and status["nlist"] == 32
+        assert status["built_rows"] == 3000
+
+    def test_recall_against_exact_search(self, stores):
+        exact, approx = stores
+        queries = clustered(50, seed=5)
+        expected = exact.search_by_vectors(queries.tolist(), k=5)
+        got = approx.search_by_vectors(queries.tolist(), k=5)
+        recall = np.mean([len({d.id for d, _ in g} & {d.id for d, _ in e}) / 5 for g, e in zip(got, expected)])
+        assert recall >= 0.8
+
+    def test_probing_every_list_is_exact(self, stores):
+        exact, approx = stores
+        approx.nprobe = 32
+        queries = clustered(10, seed=6).tolist()
+        assert [[d.id for d, _ in hits] for hits in approx.search_by_vectors(queries, k=5)] == \
+            [[d.id for d, _ in hits] for hits in exact.search_by_vectors(queries, k=5)]
+
+    def test_new_rows_are_searchable_before_a_rebuild(self, stores):
+        _, approx = stores
+        vector = np.zeros(32, dtype=np.float32)
+        vector[0] = 1.0
+        approx.add_embeddings(["new chunk"], [vector.tolist()], ids=["new"])
+        assert approx.search_by_vectors([vector.tolist()], k=1)[0][0][0].id == "new"
+
+    def test_deleted_and_overwritten_rows_are_dropped(self, stores):
+        _, approx = stores
+        query = clustered(1, seed=7)[0].tolist()
+        first = approx.search_by_vectors([query], k=1)[0][0][0].id
+        approx.delete([first])
+        assert first not in [d.id for d, _ in approx.search_by_vectors([query], k=5)[0]]
+        assert approx.index_status()["stale_rows"] == 1
+        approx.rebuild_index(wait=True)
+        assert approx.index_status()["stale_rows"] == 0
+        assert approx.index_status()["built_rows"] == 2999
+
+    def test_index_survives_reopen(self, stores, tmp_path):
+        _, approx = stores
+        query = clustered(1, seed=8)[0].tolist()
+        before = [d.id for d, _ in approx.search_by_vectors([query], k=5)[0]]
+        approx.close()
+        reopened = NumpyVectorStore(str(tmp_path / "ivf"), KeywordEmbeddings(), ann="ivf", nlist=32, nprobe=4, ann_min_rows=10**6)
+        assert reopened.index_status()["built"]
+        assert [d.id for d, _ in reopened.search_by_vectors([query], k=5)[0]] == before
+        reopened.close()
+
+    def test_index_is_built_in_the_background_once_large_enough(self, tmp_path):
+        store = NumpyVectorStore(str(tmp_path / "auto"), KeywordEmbeddings(), ann="ivf", nlist=8, ann_min_rows=500)
+        vectors = clustered(600)
+        store.add_embeddings([str(i) for i in range(400)], vectors[:400].tolist(), ids=[str(i) for i in range(400)])
+        assert not store.index_status()["built"] and not store.index_status()["rebuilding"]
+        store.add_embeddings([str(i) for i in range(400, 600)], vectors[400:].tolist(), ids=[str(i) for i in range(400, 600)])
+        store.close()  # waits for the background build
+        reopened = NumpyVectorStore(str(tmp_path / "auto"), KeywordEmbeddings(), ann="ivf", nlist=8, ann_min_rows=500)
+        assert reopened.index_status()["built_rows"] == 600
+        reopened.close()
+
+
+class TestReducedDimensions:
+    """Test truncating stored embeddings to fewer dimensions"""
+
+    def test_truncate_keeps_prefix_at_unit_length(self):
+        vectors = np.random.default_rng(9).normal(size=(10, 64))
+        reduced = q.truncate(vectors, 16)
+        assert reduced.shape == (10, 16)
+        assert np.allclose(np.linalg.norm(reduced, axis=1), 1.0)
+        assert np.allclose(reduced * np.linalg.norm(vectors[:, :16], axis=1, keepdims=True), vectors[:, :16])
+
+    def test_numpy_store_is_reduced_in_place(self, store, tmp_path):
+        store.reduce_dimensions(4)
+        assert store.dimensions() == 4
+        query = q.truncate(np.asarray(KeywordEmbeddings().embed_documents(["fastapi fastapi"])), 4).tolist()
+        assert store.search_by_vectors(query, k=1)[0][0][0].id == "1_0"
+        store.close()
+        reopened = NumpyVectorStore(str(tmp_path / "index"), KeywordEmbeddings(), quantization=store.quantization)
+        assert reopened.dimensions() == 4
+        assert reopened.search_by_vectors(query, k=1)[0][0][0].id == "1_0"
+        reopened.close()
+
+    def test_growing_is_refused(self, store):
+        with pytest.raises(ValueError):
+            store.reduce_dimensions(16)
+
+    def test_ivf_index_is_retrained(self, tmp_path):
+        vectors = clustered(1000)
+        ids = [str(i) for i in range(len(vectors))]
+        store = NumpyVectorStore(str(tmp_path / "ivf"), KeywordEmbeddings(), ann="ivf", nlist=16, ann_min_rows=500)
+        store.add_embeddings(ids, vectors.tolist(), ids=ids)
+        store.rebuild_index(wait=True)
+        store.reduce_dimensions(16)
+        store.rebuild_index(wait=True)
+        status = store.index_status()
+        assert status["built"] and status["built_rows"] == 1000
+        query = q.truncate(vectors[:1], 16).tolist()
+        assert store.search_by_vectors(query, k=1)[0][0][0].id == "0"
+        store.close()
+
+    def test_chroma_collection_is_rebuilt(self, tmp_path):
+        embeddings = KeywordEmbeddings()
+        chroma = ChromaVectorStore(persist_directory=str(tmp_path / "chroma"), embedding_function=embeddings)
+        chroma.add_embeddings(TEXTS, embeddings.embed_documents(TEXTS), [{"doc_id": i} for i in range(len(TEXTS))], [f"{i}_0" for i in range(len(TEXTS))])
+        chroma.reduce_dimensions(4)
+        assert chroma.dimensions() == 4 and chroma.count() == len(TEXTS)
+        query = q.truncate(np.asarray(embeddings.embed_documents(["machine learning"])), 4).tolist()
+        doc, _ = chroma.search_by_vectors(query, k=1)[0][0]
+        assert doc.id == "2_0" and doc.metadata == {"doc_id": 2}
+
+    def test_chroma_writes_during_the_copy_are_not_lost(self, tmp_path):
+        embeddings = KeywordEmbeddings()
+        chroma = ChromaVectorStore(persist_directory=str(tmp_path / "chroma"), embedding_function=embeddings)
+        chroma.add_embeddings(TEXTS, embeddings.embed_documents(TEXTS), ids=[f"{i}_0" for i in range(len(TEXTS))])
+        writer, outcome = write_during_copy(chroma, lambda: chroma.add_texts(["vector search"], [{"doc_id": 9}], ["late"]))
+        chroma.reduce_dimensions(4)
+        writer.join()
+        # the upload waited for the switch, then was refused loudly: it has the old size
+        assert "dimension" in str(outcome["error"])
+        assert chroma.count() == len(TEXTS) and chroma.dimensions() == 4
+
+    def test_unnormalized_chroma_store_is_refused_until_normalized(self, tmp_path, monkeypatch):
+        from app.cli import normalize_embeddings
+
+        embeddings = KeywordEmbeddings()
+        chroma = ChromaVectorStore(persist_directory=str(tmp_path / "chroma"), embedding_function=embeddings)
+        raw = (np.asarray(embeddings.embed_documents(TEXTS)) * 7).tolist()  # like /api/embeddings: not unit-length
+        chroma.add_embeddings(TEXTS, raw, ids=[f"{i}_0" for i in range(len(TEXTS))])
+        assert chroma.has_unnormalized_vectors()
+        with pytest.raises(ValueError, match="normalize_embeddings"):
+            vector_store.check_normalized(chroma)
+
+        monkeypatch.setattr(vector_store.settings, "chroma_persist_dir", str(tmp_path / "chroma"))
+        assert normalize_embeddings.main([]) == 0
+        chroma = ChromaVectorStore(persist_directory=str(tmp_path / "chroma"), embedding_function=embeddings)
+        assert not chroma.has_unnormalized_vectors()
+        vector_store.check_normalized(chroma)
+        assert chroma.count() == len(TEXTS)
+        query = q.normalize(np.asarray(embeddings.embed_documents(["docker docker"]))).tolist()
+        assert chroma.search_by_vectors(query, k=1)[0][0][0].id == "3_0"
+
+    def test_mismatched_store_is_refused_at_startup(self, tmp_path, monkeypatch):
+        local = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings())
+        local.add_texts(TEXTS, ids=[f"{i}_0" for i in range(len(TEXTS))])
+        local.close()
+        monkeypatch.setattr(vector_store, "_stores", {})
+        monkeypatch.setattr(vector_store.settings, "embedding_dimensions", 4)
+        with pytest.raises(ValueError, match="reduce_dimensions --dims 4"):
+            vector_store.get_vector_store(str(tmp_path / "idx"), backend="numpy")
+
+    def test_cli_converts_the_store(self, tmp_path):
+        from app.cli import reduce_dimensions
+
+        local = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings())
+        local.add_texts(TEXTS, ids=[f"{i}_0" for i in range(len(TEXTS))])
+        local.close()
+        assert reduce_dimensions.main(["--dims", "4", "--backend", "numpy", "--persist-dir", str(tmp_path / "idx")]) == 0
+        reopened = NumpyVectorStore(str(tmp_path / "idx"), KeywordEmbeddings())
+        assert reopened.dimensions() == 4 and reopened.count() == len(TEXTS)
+        reopened.close()